@@ -1,3 +1,4 @@
+import copy
 import logging
 
 import pytest
@@ -28,3 +29,46 @@ def test_DiscoveryInterface(catalog, tags, httpx_client_single_async):
     ds = catalog['dataset'][0]
     assert k == '/'.join([str(ds['c_vintage'])] + ds['c_dataset'])
     assert v.tags == tags['tags']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('bulk', [False, True])
+@pytest.mark.parametrize('dedup', [False, True])
+async def test_persistent_index(tmp_path, bulk, dedup, httpx_client_single_async):
+    fts_args = {'dbname': str(tmp_path / 'index.db'), 'mode': 'open', 'bulk': bulk}
+    dedup_args = {'path': str(tmp_path / 'variables.json')} if dedup else None
+    # Build the index, then reopen it.
+    for _ in range(2):
+        cl = await AsyncDiscoveryInterface.create('', httpx_client_single_async,
+                                                  fts_args=fts_args,
+                                                  dedup_args=dedup_args)
+        assert len(cl.datasets) == 1
+        assert cl.index.dataset_ids() == set(cl.datasets)
+        assert cl.variableindex.dataset_ids() == set(cl.datasets)
+
+
+@pytest.mark.asyncio
+async def test_persistent_index_removes_datasets(tmp_path, catalog,
+                                                 httpx_client_single_async):
+    fts_args = {'dbname': str(tmp_path / 'index.db'), 'mode': 'open'}
+    dedup_args = {'path': str(tmp_path / 'variables.json')}
+    dataset = catalog['dataset'][0]
+    renamed = copy.deepcopy(dataset)
+    for distribution in renamed['distribution']:
+        distribution['accessURL'] += '/renamed'
+    catalog['dataset'] = [dataset, renamed]
+    cl = await AsyncDiscoveryInterface.create('', httpx_client_single_async,
+                                              fts_args=fts_args,
+                                              dedup_args=dedup_args)
+    assert len(cl.datasets) == 2
+    assert cl.variableindex.dataset_ids() == set(cl.datasets)
+
+    # The renamed dataset is no longer published.
+    catalog['dataset'] = [dataset]
+    cl = await AsyncDiscoveryInterface.create('', httpx_client_single_async,
+                                              fts_args=fts_args,
+                                              dedup_args=dedup_args)
+    assert len(cl.datasets) == 1
+    assert cl.index.dataset_ids() == set(cl.datasets)
+    assert cl.variableindex.dataset_ids() == set(cl.datasets)
+    assert list(cl.search(dataset['title'].split()[1])['dataset_id']) == list(cl.datasets)
@@ -4,6 +4,7 @@ from importlib.resources import files
 import httpx
 import pytest
 
+from uscensus.incremental import model, wrappers
 from uscensus.util.webcache import make_client
 
 _logger = logging.getLogger(__name__)
@@ -58,6 +59,11 @@ class FakeHttpxTransportAsync(FakeHttpxTransport, httpx.AsyncBaseTransport):
     pass
 
 
+@pytest.fixture
+def udata_variables():
+    return read_file('variables')
+
+
 @pytest.fixture
 def udata_httpx_client_sync(request, sync_cache):
     transport = FakeHttpxTransportSync(read_file('apr'),
@@ -77,4 +83,24 @@ def udata_httpx_client_async(request, async_cache):
                                         read_file('groups'),
                                         read_file('variables'),
                                         read_file(request.param))
-    return make_client(cache=async_cache, transport=transport, sync=True)
+    return make_client(cache=async_cache, transport=transport, sync=False)
+
+
+def _make_dataset(title, vintage, variables=(), groups=(), levels=(), tags=()):
+    ds = wrappers.Dataset(model.Dataset(title=title, c_vintage=vintage,
+                                        identifier=f'{title} {vintage}'), None)
+    ds.__dict__['variables'] = {
+        name: model.Variable(label=name) for name in variables}
+    ds.__dict__['groups'] = {
+        name: wrappers.Group(model.Group(name=name, description=name, variables=''), None)
+        for name in groups}
+    ds.__dict__['geography'] = wrappers.Geography(
+        levels={name: [model.GeographyLevel(name=name)] for name in levels})
+    ds.__dict__['tags'] = list(tags)
+    return ds
+
+
+@pytest.fixture
+def make_dataset():
+    """Build offline Datasets with their linked metadata pre-cached."""
+    return _make_dataset
@@ -0,0 +1,41 @@
+import math
+
+import pandas as pd
+import pytest
+
+from uscensus.incremental import aggregate
+
+
+def _tracts():
+    return pd.DataFrame({
+        'NAME': ['T1', 'T2', 'T3', 'T4'],
+        'B01001_001E': [100, 200, 300, -666666666],
+        'B01001_001M': [30, 40, -555555555, 12],
+        'B01001_001EA': ['', '', '', '*'],
+        'state': ['01', '01', '01', '02'],
+        'county': ['001', '001', '003', '001'],
+        'tract': ['000100', '000200', '000100', '000100'],
+    })
+
+
+def test_aggregate_geography():
+    df = aggregate.aggregate_geography(_tracts(), 'county')
+    assert list(df.columns) == ['B01001_001E', 'B01001_001M', 'state', 'county']
+    assert df[['state', 'county']].values.tolist() == \
+        [['01', '001'], ['01', '003'], ['02', '001']]
+    assert df['B01001_001E'].iloc[:2].tolist() == [300, 300]
+    assert math.isnan(df['B01001_001E'].iloc[2])
+    assert df['B01001_001M'].tolist() == [50, 0, 12]
+
+
+def test_rollup_geography():
+    levels = aggregate.rollup_geography(_tracts(), ['state', 'county'],
+                                        fields=['B01001_001E', 'B01001_001M'])
+    assert levels['county'].equals(
+        aggregate.aggregate_geography(_tracts(), 'county'))
+    state = levels['state']
+    assert list(state.columns) == ['B01001_001E', 'B01001_001M', 'state']
+    assert state['B01001_001E'].iloc[0] == 600
+    assert state['B01001_001M'].iloc[0] == 50
+    with pytest.raises(ValueError, match='Unknown geography'):
+        aggregate.rollup_geography(_tracts(), ['place'])
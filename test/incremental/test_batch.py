@@ -0,0 +1,94 @@
+import pytest
+
+from uscensus.incremental import batch, query, wrappers
+
+STATES = ('01', '02', '04', '05', '06')
+
+
+def _compiled_queries(client):
+    catalog = wrappers.Catalog.get_catalog(client,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    compiled = query.QueryBuilder(
+        catalog.dataset[0],
+    ).set_fields(
+        'A_LFSR', 'A_MARITL', 'A_FNLWGT',
+    ).add_predicate(
+        'A_HGA', 12,
+    ).set_geo_for(
+        'state', STATES[0],
+    ).compile()
+    return [compiled.bind([state]) for state in STATES]
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-untabulated',),
+                         indirect=True)
+def test_run_queries(udata_httpx_client_sync):
+    queries = _compiled_queries(udata_httpx_client_sync)
+    results = list(batch.run_queries(iter(queries), concurrency=2))
+    assert sorted(q.params['for'] for q, _ in results) == \
+        [f'state:{state}' for state in STATES]
+    for _, df in results:
+        assert list(df.columns) == ['A_LFSR', 'A_MARITL', 'A_FNLWGT', 'A_HGA']
+        assert df['A_FNLWGT'].dtype.kind == 'f'
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-untabulated',),
+                         indirect=True)
+def test_run_queries_exceptions(udata_httpx_client_sync):
+    queries = _compiled_queries(udata_httpx_client_sync)
+    catalog = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    # Tabulations need rows or columns.
+    bad = query.TabulationQueryBuilder(catalog.dataset[0])
+
+    with pytest.raises(ValueError):
+        list(batch.run_queries([*queries, bad], concurrency=2))
+
+    results = dict(batch.run_queries([*queries, bad], concurrency=2,
+                                     return_exceptions=True))
+    assert isinstance(results[bad], ValueError)
+    assert len(results) == len(queries) + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('udata_httpx_client_async',
+                         ('query-results-untabulated',),
+                         indirect=True)
+async def test_arun_queries(udata_httpx_client_async):
+    catalog = await wrappers.Catalog.aget_catalog(
+        udata_httpx_client_async, catalog_subpath='data/1989/cps/basic/apr')
+    await catalog.aprefetch(fields=('variables', 'groups', 'geography'))
+    ds = catalog.dataset[0]
+    builders = [
+        query.QueryBuilder(
+            ds,
+        ).set_fields(
+            'A_LFSR', 'A_FNLWGT',
+        ).set_geo_for(
+            'state', state,
+        )
+        for state in STATES
+    ]
+    results = [result async for result in batch.arun_queries(builders, concurrency=2)]
+    assert {id(q) for q, _ in results} == {id(b) for b in builders}
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-untabulated',),
+                         indirect=True)
+def test_write_queries_parquet(udata_httpx_client_sync, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from uscensus.incremental.parquet import ParquetSink
+
+    queries = _compiled_queries(udata_httpx_client_sync)
+    path = str(tmp_path / 'results.parquet')
+    with ParquetSink(path) as sink:
+        count = batch.write_queries(queries, sink, concurrency=2)
+    assert count == len(queries)
+
+    table = pq.read_table(path)
+    one = queries[0].query()
+    assert table.num_rows == len(one) * len(queries)
+    assert table.column_names == list(one.columns)
@@ -0,0 +1,97 @@
+import re
+
+import pytest
+
+from uscensus.incremental import filters, model
+from uscensus.incremental.catalogindex import CatalogIndex
+
+
+@pytest.fixture
+def datasets(make_dataset):
+    return [
+        make_dataset('ACS 5-Year Detailed Tables', 2021,
+                     variables=['B19013_001E', 'B01001_001E'], groups=['B19013'],
+                     levels=['state', 'county', 'tract'], tags=['income']),
+        make_dataset('ACS 5-Year Detailed Tables', 2022,
+                     variables=['B19013_001E', 'B01001_001E'], groups=['B19013'],
+                     levels=['state', 'county', 'tract'], tags=['income']),
+        make_dataset('ACS 1-Year Detailed Tables', 2022,
+                     variables=['B19013_001E'], groups=['B19013'],
+                     levels=['state', 'county'], tags=['income']),
+        make_dataset('Planning Database', 2022,
+                     variables=['Tot_Population_CEN_2010'],
+                     levels=['tract'], tags=['planning']),
+    ]
+
+
+def test_index_matches_scan(datasets):
+    index = CatalogIndex(datasets)
+    kwargs = {'vintages': [2022], 'variable': 'B19013_001E', 'geography': 'tract'}
+    expected = filters.filter_datasets(datasets, **kwargs)
+    assert filters.filter_datasets(datasets, index=index, **kwargs) == expected
+    assert expected == [datasets[1]]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'variable': 'B19013'},
+    {'variable': 'Total population'},
+    {'group': 'B190'},
+    {'tags': 'inc'},
+    {'title': 'etailed'},
+    {'title': '5-Year'},
+    {'geography': 'tract'},
+    {'variable': re.compile('_00[0-9]E$'), 'tags': lambda tag: tag != 'income'},
+    {'vintages': [2022], 'variable': 'Total population'},
+    {'variable': 'B01001_001E', 'exact': True},
+    {'variable': 'B01001', 'exact': True},
+    {'vintages': [2022], 'variable': 'B19013_*', 'exact': True},
+    {'group': 'B1901*', 'tags': 'income', 'exact': True},
+    {'tags': 'inc', 'exact': True},
+])
+def test_index_results_equal_scan(datasets, kwargs):
+    datasets[3].variables['Tot_Population_CEN_2010'] = model.Variable(
+        label='Total population')
+    index = CatalogIndex(datasets)
+    assert (filters.filter_datasets(datasets, index=index, **kwargs) ==
+            filters.filter_datasets(datasets, **kwargs))
+
+
+def test_index_prefix_and_pattern(datasets):
+    index = CatalogIndex(datasets)
+    assert index.select(index.match('variable', 'B01001_*', exact=True)) == datasets[:2]
+    assert index.select(index.match('group', re.compile('B19'))) == datasets[:3]
+    assert index.select(index.match('geography', re.compile('tr.*'))) == [
+        datasets[0], datasets[1], datasets[3]]
+    # Only the candidates are examined.
+    assert index.select(index.match('variable', 'B19013', candidates={1, 3})) == [
+        datasets[1]]
+    assert index.match('variable', 'Tot', candidates={3}) == {3}
+    assert index.match('variable', 'B19013', candidates={3}) == set()
+
+
+def test_index_title_narrows_then_scans(datasets):
+    index = CatalogIndex(datasets, facets=('vintage', 'title'))
+    assert filters.filter_datasets(
+        datasets, index=index, title='1-Year Detailed') == [datasets[2]]
+    # Unindexed facets fall back to scanning.
+    assert filters.filter_datasets(
+        datasets, index=index, vintages=[2022], tags='planning') == [datasets[3]]
+
+
+def test_index_respects_input_datasets(datasets, make_dataset):
+    index = CatalogIndex(datasets)
+    assert filters.filter_datasets(
+        datasets[2:], index=index, variable='B19013_001E') == [datasets[2]]
+    # Datasets are matched by identifier, e.g. from another catalog,
+    # and kept in the order given.
+    others = [make_dataset('ACS 5-Year Detailed Tables', vintage)
+              for vintage in (2022, 2021)]
+    assert filters.filter_datasets(
+        others, index=index, variable='B19013_001E') == others
+
+
+def test_index_rejects_unknown_facet(datasets):
+    with pytest.raises(ValueError):
+        CatalogIndex(datasets, facets=('bogus',))
+    with pytest.raises(KeyError):
+        CatalogIndex(datasets, facets=('vintage',)).lookup('variable', 'x')
@@ -0,0 +1,50 @@
+import re
+
+from uscensus.incremental import filters, model, wrappers
+
+
+def make_unfetched_dataset(title, vintage):
+    # Touching any linked document of this dataset would fail, since
+    # it has no client.
+    return wrappers.Dataset(model.Dataset(title=title, c_vintage=vintage,
+                                          c_variablesLink='https://invalid/v.json'),
+                            None)
+
+
+def test_filter_datasets_skips_expensive_predicates(make_dataset):
+    datasets = [
+        make_unfetched_dataset('ACS 5-Year', 2019),
+        make_dataset('ACS 5-Year', 2022, variables=['B19013_001E']),
+        make_dataset('ACS 5-Year', 2022, variables=['B01001_001E']),
+    ]
+    assert filters.filter_datasets(
+        datasets, variable='B19013', vintages=[2022]) == [datasets[1]]
+
+
+def test_compile_filters_orders_by_cost():
+    plan = filters.compile_filters(variable='B19013', tags='income',
+                                   vintages=[2022], title='ACS')
+    assert [part.name for part in plan.parts] == [
+        'vintages', 'title', 'tags', 'variable']
+
+
+def test_filter_composition(make_dataset):
+    datasets = [
+        make_dataset('ACS 5-Year', 2021, tags=['income']),
+        make_dataset('ACS 1-Year', 2022, tags=['income']),
+        make_dataset('Planning Database', 2022, tags=['planning']),
+    ]
+    acs = filters.title_filter(re.compile('^ACS'))
+    income = filters.tags_filter('income')
+    recent = filters.vintages_filter([2022])
+    assert list((acs & recent).filter(datasets)) == [datasets[1]]
+    assert list((~acs | ~income).filter(datasets)) == [datasets[2]]
+    assert list((recent & ~income).filter(datasets)) == [datasets[2]]
+    assert list(filters.AllOf().filter(datasets)) == datasets
+    assert list(filters.AnyOf().filter(datasets)) == []
+
+
+def test_filter_datasets_is_lazy(make_dataset):
+    datasets = (make_dataset('ACS', vintage) for vintage in range(2010, 2020))
+    gen = filters.filter_datasets_vintages(datasets, [2011])
+    assert next(gen).c_vintage == 2011
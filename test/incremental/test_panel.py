@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+from uscensus.incremental import panel, wrappers
+
+FIELDS = ('A_LFSR', 'A_FNLWGT')
+
+
+def _vintages(client, catalog):
+    # The sample catalog has one dataset; present it as two vintages.
+    ds = catalog.dataset[0]
+    return {
+        vintage: wrappers.Dataset(ds._model.model_copy(update={'c_vintage': vintage}),
+                                  client)
+        for vintage in (1989, 1990)
+    }
+
+
+def test_resolve_vintages(make_dataset):
+    datasets = [make_dataset('ACS 5-Year', 2019),
+                make_dataset('ACS 1-Year', 2019),
+                make_dataset('ACS 5-Year', 2020)]
+    resolved = panel.resolve_vintages(datasets, [2019, 2020], title='5-Year')
+    assert resolved == {2019: datasets[0], 2020: datasets[2]}
+    with pytest.raises(ValueError, match='Several datasets'):
+        panel.resolve_vintages(datasets, [2019])
+    with pytest.raises(ValueError, match='No dataset'):
+        panel.resolve_vintages(datasets, [2021])
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-untabulated',),
+                         indirect=True)
+def test_panel_query(udata_httpx_client_sync):
+    catalog = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    datasets = _vintages(udata_httpx_client_sync, catalog)
+    df = panel.panel_query(datasets, FIELDS, geo_for='state',
+                           predicates={'A_HGA': [12]}, concurrency=2)
+    assert list(df.columns) == ['vintage', 'A_LFSR', 'A_FNLWGT',
+                                'A_MARITL', 'A_HGA']
+    assert df['vintage'].unique().tolist() == [1989, 1990]
+    assert df['A_FNLWGT'].dtype.kind == 'f'
+
+    with pytest.raises(ValueError, match='not available'):
+        panel.panel_query(datasets, ('A_LFSR', 'NOPE'))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('udata_httpx_client_async',
+                         ('query-results-untabulated',),
+                         indirect=True)
+async def test_apanel_query(udata_httpx_client_async):
+    catalog = await wrappers.Catalog.aget_catalog(
+        udata_httpx_client_async, catalog_subpath='data/1989/cps/basic/apr')
+    datasets = _vintages(udata_httpx_client_async, catalog)
+    df = await panel.apanel_query(datasets, FIELDS, geo_for='state')
+    assert df['vintage'].unique().tolist() == [1989, 1990]
+
+
+def test_combine_wide():
+    frames = {
+        2019: pd.DataFrame({'B01001_001E': [1, 2], 'state': ['01', '02']}),
+        2020: pd.DataFrame({'B01001_001E': ['3', 'x'], 'state': ['01', '02']}),
+        2021: pd.DataFrame({'state': ['01']}),
+    }
+    df = panel._combine(frames, ['B01001_001E'], 'wide')
+    assert df.index.tolist() == ['01', '02']
+    assert df[('B01001_001E', 2020)].tolist()[0] == 3
+    assert df.dtypes.map(lambda dtype: dtype.kind).tolist() == ['f', 'f', 'f']
+
+
+def test_combine_wide_without_geography():
+    frames = {2019: pd.DataFrame({'B01001_001E': [1]}),
+              2020: pd.DataFrame({'B01001_001E': [2]})}
+    df = panel._combine(frames, ['B01001_001E'], 'wide')
+    assert df.columns.tolist() == [('B01001_001E', 2019), ('B01001_001E', 2020)]
+    assert df.iloc[0].tolist() == [1, 2]
+    assert df.dtypes.map(lambda dtype: dtype.kind).tolist() == ['i', 'i']
+
+
+def test_combine_wide_duplicates():
+    frames = {2019: pd.DataFrame({'B01001_001E': [1, 2], 'state': ['01', '01']})}
+    with pytest.raises(ValueError, match='shape="long"'):
+        panel._combine(frames, ['B01001_001E'], 'wide')
+
+
+def test_panel_query_rejects_return_exceptions():
+    with pytest.raises(ValueError, match='return_exceptions'):
+        panel.panel_query({}, FIELDS, return_exceptions=True)
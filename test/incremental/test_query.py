@@ -263,6 +263,34 @@ def test_udata_query_builder_weighted(udata_httpx_client_sync):
     assert df.index.names == tqb.rows
 
 
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted-norows',),
+                         indirect=True)
+def test_udata_query_builder_tidy(udata_httpx_client_sync):
+    catalog = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    ds = catalog.dataset[0]
+    tqb = query.TabulationQueryBuilder(
+        ds,
+    ).set_weight(
+        'A_FNLWGT',
+    ).set_cols(
+        'A_MARITL', 'A_LFSR',
+    ).add_predicate(
+        'A_HGA', 12,
+    )
+    df = tqb.query()
+    assert (df.dtypes == 'int64').all()
+    assert df[('4', '3')].iloc[0] == 49049
+
+    tidy = tqb.set_tidy().query()
+    assert list(tidy.columns) == ['A_MARITL', 'A_LFSR', query.TIDY_VALUE]
+    assert len(tidy) == df.size
+    assert tidy[query.TIDY_VALUE].dtype == 'int64'
+    cell = tidy[(tidy['A_MARITL'] == '4') & (tidy['A_LFSR'] == '3')]
+    assert cell[query.TIDY_VALUE].tolist() == [49049]
+
+
 @pytest.mark.parametrize('udata_httpx_client_sync',
                          ('query-results-tabulated-unweighted',),
                          indirect=True)
@@ -540,3 +568,44 @@ def test_udata_query_builder_recode_col_ok(udata_httpx_client_sync):
         'RECODED_VAR',
     )
     assert tqb.cols == ['RECODED_VAR']
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_udata_compiled_query(udata_httpx_client_sync):
+    catalog = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    ds = catalog.dataset[0]
+    tqb = query.TabulationQueryBuilder(
+        ds,
+    ).set_weight(
+        'A_FNLWGT',
+    ).set_rows(
+        'A_MARITL',
+    ).set_cols(
+        'A_LFSR',
+    ).set_geo_for(
+        'state', '01',
+    )
+    compiled = tqb.compile()
+    assert compiled.params['for'] == 'state:01'
+    assert compiled.params['tabulate'] == 'weight(A_FNLWGT)'
+
+    # Later builder changes don't affect the compiled query.
+    tqb.set_rows('A_HGA')
+    rebound = compiled.bind(['06'])
+    assert rebound.params['for'] == 'state:06'
+    assert compiled.params['for'] == 'state:01'
+    assert {k: v for k, v in rebound.params.items() if k != 'for'} == \
+        {k: v for k, v in compiled.params.items() if k != 'for'}
+
+    df = rebound.query()
+    assert df.index.names == ['A_MARITL']
+    assert df.columns.names == ['A_LFSR']
+
+    # A change of shape is validated again.
+    with pytest.raises(ValueError, match='Unexpected "in" geography'):
+        compiled.bind(geo_in={'county': ['001']})
+    with pytest.raises(ValueError, match='wildcard'):
+        compiled.bind(['*', '06'])
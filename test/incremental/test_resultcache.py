@@ -0,0 +1,156 @@
+import pandas as pd
+import pytest
+
+from uscensus.incremental import query, wrappers
+from uscensus.incremental.resultcache import (
+    RecodeResultCache,
+    ResultCache,
+    SubsetResultCache,
+)
+
+
+def _builder(client):
+    catalog = wrappers.Catalog.get_catalog(client,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    return query.TabulationQueryBuilder(
+        catalog.dataset[0],
+    ).set_weight(
+        'A_FNLWGT',
+    ).set_rows(
+        'A_MARITL',
+    ).set_cols(
+        'A_LFSR',
+    ).set_geo_for(
+        'state', '06',
+    )
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_result_cache(udata_httpx_client_sync, tmp_path):
+    cache = ResultCache(tmp_path)
+    tqb = _builder(udata_httpx_client_sync)
+    assert cache.get(tqb) is None
+
+    df = tqb.query(cache=cache)
+    cached = cache.get(tqb)
+    assert cached is not None
+    assert cached.equals(df)
+    assert cached.columns.names == df.columns.names
+    assert cached.index.names == df.index.names
+
+    # Different geography, different entry.
+    assert cache.get(tqb.compile().bind(['01'])) is None
+
+    # The tidy form shares the crosstab's entry.
+    tidy = cache.get(tqb.set_tidy())
+    assert list(tidy.columns) == ['A_MARITL', 'A_LFSR', query.TIDY_VALUE]
+    assert len(tidy) == df.size
+    other = ResultCache(tmp_path / 'other')
+    assert tqb.query(cache=other).equals(tidy)
+    assert other.get(tqb.set_tidy(False)).equals(df)
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_result_cache_key(udata_httpx_client_sync):
+    compiled = _builder(udata_httpx_client_sync).compile()
+    assert ResultCache.key(compiled) == ResultCache.key(compiled.bind(['06']))
+    assert ResultCache.key(compiled) != ResultCache.key(compiled.bind(['01']))
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-untabulated',),
+                         indirect=True)
+def test_result_cache_equivalent_queries(udata_httpx_client_sync, tmp_path):
+    cache = ResultCache(tmp_path)
+    catalog = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    ds = catalog.dataset[0]
+
+    first = query.QueryBuilder(ds).set_fields('A_FNLWGT', 'A_LFSR').compile()
+    df = first.query(cache=cache)
+    assert list(df.columns[:2]) == ['A_FNLWGT', 'A_LFSR']
+
+    # The same fields in another order share the entry, and come back
+    # in the requested order.
+    second = query.QueryBuilder(ds).set_fields('A_LFSR', 'A_FNLWGT').compile()
+    assert second.params == first.params
+    cached = cache.get(second)
+    assert cached is not None
+    assert list(cached.columns[:2]) == ['A_LFSR', 'A_FNLWGT']
+    assert cached['A_FNLWGT'].equals(df['A_FNLWGT'])
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-untabulated',),
+                         indirect=True)
+def test_subset_result_cache(udata_httpx_client_sync, tmp_path):
+    catalog = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                           catalog_subpath='data/1989/cps/basic/apr')
+    ds = catalog.dataset[0]
+
+    def compiled(*fields, states=('*',)):
+        return query.QueryBuilder(
+            ds,
+        ).set_fields(
+            *fields,
+        ).set_geo_for(
+            'state', *states,
+        ).compile()
+
+    cache = SubsetResultCache(tmp_path)
+    superset = pd.DataFrame({
+        'A_FNLWGT': [1.5, 2.5, 3.5],
+        'A_LFSR': ['1', '7', '1'],
+        'A_MARITL': ['1', '4', '5'],
+        'state': ['01', '06', '06'],
+    })
+    cache.put(compiled('A_FNLWGT', 'A_LFSR', 'A_MARITL'), superset)
+
+    subset = cache.get(compiled('A_LFSR', 'A_FNLWGT', states=('06',)))
+    assert subset is not None
+    assert list(subset.columns) == ['A_LFSR', 'A_FNLWGT', 'state']
+    assert subset['A_FNLWGT'].tolist() == [2.5, 3.5]
+
+    # Results are found again by a new cache on the same directory.
+    cache = SubsetResultCache(tmp_path)
+    subset = cache.get(compiled('A_MARITL', 'A_FNLWGT', states=('01', '06')))
+    assert subset is not None
+    assert len(subset) == 3
+
+    # Not covered: another field, or a different predicate.
+    assert cache.get(compiled('A_HGA', 'A_FNLWGT', states=('06',))) is None
+    with_predicate = query.QueryBuilder(ds).set_fields(
+        'A_LFSR', 'A_FNLWGT').set_geo_for('state', '06').add_predicate('A_HGA', 12)
+    assert cache.get(with_predicate) is None
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_recode_result_cache(udata_httpx_client_sync, tmp_path):
+    cache = RecodeResultCache(tmp_path)
+    tqb = _builder(udata_httpx_client_sync)
+    df = tqb.query(cache=cache)
+
+    recoded = tqb.add_recode(
+        'LFSR_RC', 'A_LFSR', ['1', '2'], [query.RecodeRange(mn=3, mx=4)],
+    ).set_cols(
+        'LFSR_RC',
+    )
+    retabulated = cache.get(recoded)
+    assert retabulated is not None
+    assert retabulated.columns.names == ['LFSR_RC']
+    assert retabulated.index.names == ['A_MARITL']
+    assert list(retabulated.columns) == [('1',), ('2',)]
+    expected = pd.DataFrame({
+        ('1',): df[[('1',), ('2',)]].sum(axis=1),
+        ('2',): df[[('3',), ('4',)]].sum(axis=1),
+    }).sort_index()
+    assert (retabulated.to_numpy() == expected.to_numpy()).all()
+
+    # Averages can't be re-tabulated.
+    assert cache.get(recoded.set_avg('A_AGE')) is None
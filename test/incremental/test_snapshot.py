@@ -0,0 +1,50 @@
+import pytest
+
+from uscensus.incremental import snapshot, wrappers
+from uscensus.util.errors import CensusError
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_snapshot_roundtrip(udata_httpx_client_sync, tmp_path):
+    cat = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                       catalog_subpath='data/1989/cps/basic/apr')
+    path = str(tmp_path / 'catalog.snap')
+    snapshot.export_snapshot(cat, path, fields=('variables', 'groups', 'geography'),
+                             completions=True)
+
+    # No client: everything must come from the snapshot.
+    loaded = snapshot.load_snapshot(path, None)
+    ds, orig = loaded.dataset[0], cat.dataset[0]
+    assert loaded.describedBy == cat.describedBy
+    assert ds._model == orig._model
+    assert ds.variables == orig.variables
+    assert ds.variables['A_FNLWGT'].isWeight == orig.variables['A_FNLWGT'].isWeight
+    assert ds.groups == {}
+    assert ds.geography.levels == orig.geography.levels
+    assert ds.geography.has_default == orig.geography.has_default
+    assert ds.geography._model == orig.geography._model
+    assert ds.completions.to_dict() == orig.completions.to_dict()
+    assert [completion.name for completion in ds.completions.complete('A_FNLW')] == \
+        ['A_FNLWGT']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+async def test_snapshot_async_access(udata_httpx_client_sync, tmp_path):
+    cat = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                       catalog_subpath='data/1989/cps/basic/apr')
+    path = str(tmp_path / 'catalog.snap')
+    snapshot.export_snapshot(cat, path, datasets=cat.dataset, fields=('variables',))
+    loaded = snapshot.load_snapshot(path, None)
+    assert (await loaded.dataset[0].avariables).keys() == cat.dataset[0].variables.keys()
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'not-a-snapshot'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(CensusError):
+        snapshot.load_snapshot(str(path), None)
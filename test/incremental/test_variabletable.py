@@ -0,0 +1,40 @@
+import pytest
+
+from uscensus.incremental import model, wrappers
+from uscensus.incremental.variabletable import VariablePool, VariableTable
+
+
+def test_variable_table(udata_variables):
+    raw = model.Variables.model_validate_json(udata_variables).variables
+    table = VariableTable.from_json(udata_variables)
+    assert len(table) == len(raw)
+    assert list(table) == list(raw)
+    assert dict(table.items()) == raw
+    assert 'nonexistent' not in table
+    assert table.column('label') == tuple(v.label for v in raw.values())
+    with pytest.raises(KeyError):
+        table.column('nonexistent')
+
+
+def test_variable_pool_shares_values(udata_variables):
+    pool = VariablePool()
+    first = VariableTable.from_json(udata_variables, pool)
+    second = VariableTable.from_json(udata_variables, pool, validate=False)
+    assert first.column('values') == second.column('values')
+    for field in ('values', 'label'):
+        for a, b in zip(first.column(field), second.column(field), strict=True):
+            assert a is b
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_catalog_variable_pool(udata_httpx_client_sync):
+    pool = VariablePool()
+    cat = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                       catalog_subpath='data/1989/cps/basic/apr',
+                                       variable_pool=pool)
+    ds = cat.dataset[0]
+    assert isinstance(ds.variables, VariableTable)
+    assert ds.variables.pool is pool
+    assert ds.variables['A_FNLWGT'].isWeight
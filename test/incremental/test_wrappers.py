@@ -1,8 +1,9 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
-from uscensus.incremental import wrappers
+from uscensus.incremental import model, wrappers
 
 
 def test_catalog(catalog, groups, one_group, variables, httpx_client_single_sync):
@@ -51,3 +52,68 @@ async def test_catalog_async(catalog, groups, one_group, variables, httpx_client
     assert group.description == raw_group['description']
     wrapped_group_variables = await group.avariables
     assert len(wrapped_group_variables) == len(one_group['variables'])
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_catalog_prefetch(udata_httpx_client_sync):
+    cat = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                       catalog_subpath='data/1989/cps/basic/apr')
+    cat.prefetch(fields=('variables', 'groups', 'geography'), concurrency=4)
+    ds = cat.dataset[0]
+    assert 'A_AGE' in ds.__dict__['variables']
+    assert 'state' in ds.__dict__['geography'].levels
+    assert ds.__dict__['groups'] == {}
+    assert 'tags' not in ds.__dict__
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('udata_httpx_client_async',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+async def test_catalog_aprefetch(udata_httpx_client_async):
+    cat = await wrappers.Catalog.aget_catalog(udata_httpx_client_async,
+                                              catalog_subpath='data/1989/cps/basic/apr')
+    await cat.aprefetch(fields=('variables', 'geography'), concurrency=4)
+    ds = cat.dataset[0]
+    # Both the sync and async caches are warm.
+    assert 'A_AGE' in ds.variables
+    assert 'A_AGE' in await ds.avariables
+    assert 'state' in ds.geography.levels
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_catalog_prefetch_bad_field(udata_httpx_client_sync):
+    cat = wrappers.Catalog.get_catalog(udata_httpx_client_sync,
+                                       catalog_subpath='data/1989/cps/basic/apr')
+    with pytest.raises(ValueError):
+        cat.prefetch(fields=('examples',))
+
+
+@pytest.mark.parametrize('udata_httpx_client_sync',
+                         ('query-results-tabulated-weighted',),
+                         indirect=True)
+def test_catalog_no_validate(udata_httpx_client_sync):
+    kwargs = {'catalog_subpath': 'data/1989/cps/basic/apr'}
+    validated = wrappers.Catalog.get_catalog(udata_httpx_client_sync, **kwargs)
+    trusted = wrappers.Catalog.get_catalog(udata_httpx_client_sync, validate=False,
+                                           **kwargs)
+    ds = trusted.dataset[0]
+    # Plain fields are read without building the dataset model.
+    assert ds.title == validated.dataset[0].title
+    assert ds.c_vintage == 1989
+    assert '_model' not in ds.__dict__
+    # Concurrent first accesses (e.g. from prefetch threads) share one model.
+    with ThreadPoolExecutor(4) as executor:
+        models = list(executor.map(lambda _: ds._model, range(8)))
+    assert all(built is ds._model for built in models)
+    assert ds._model == validated.dataset[0]._model
+    # The raw entry is dropped once the model replaces it.
+    assert '_raw' not in ds.__dict__
+    assert ds.title == validated.dataset[0].title
+    assert isinstance(ds.variables, model.LazyModelMap)
+    assert ds.variables == validated.dataset[0].variables
+    assert ds.geography.levels == validated.dataset[0].geography.levels
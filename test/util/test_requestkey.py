@@ -0,0 +1,35 @@
+from uscensus.util.requestkey import (
+    canonical_params,
+    canonical_url,
+    request_key,
+)
+
+
+def test_canonical_url():
+    assert canonical_url('http://API.census.gov/data/2020/acs/acs5') == \
+        'https://api.census.gov/data/2020/acs/acs5'
+    assert canonical_url('https://api.census.gov/data.json') == \
+        'https://api.census.gov/data.json'
+
+
+def test_canonical_params():
+    params = {
+        'key': 'secret',
+        'in': 'state:06 county:037,001',
+        'get': 'NAME,B01001_001E,NAME',
+        'for': 'tract:*',
+    }
+    assert canonical_params(params) == {
+        'for': 'tract:*',
+        'get': 'B01001_001E,NAME',
+        'in': 'county:001,037 state:06',
+    }
+
+
+def test_request_key():
+    url = 'https://api.census.gov/data/2020/acs/acs5'
+    key = request_key(url, {'get': 'NAME,B01001_001E', 'for': 'state:06,01'})
+    assert key == request_key(url.replace('https:', 'http:'),
+                              {'for': 'state:01,06', 'get': 'B01001_001E,NAME',
+                               'key': 'secret'})
+    assert key != request_key(url, {'get': 'NAME', 'for': 'state:06,01'})
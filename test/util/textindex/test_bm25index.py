@@ -0,0 +1,122 @@
+import pytest
+
+from uscensus.util.errors import CensusError
+from uscensus.util.textindex import DatasetFields, FieldSet, VariableFields
+from uscensus.util.textindex.bm25index import Bm25Index
+
+
+def test_Index():
+    index = Bm25Index(FieldSet.DATASET, 'datasets')
+    data = [
+        DatasetFields(dataset_id='id1',
+                      title='title one',
+                      description='description of dataset one',
+                      geographies='',
+                      concepts='',
+                      keywords='key key1',
+                      tags='tag tag1',
+                      variables='var1',
+                      vintage='2015'),
+        DatasetFields(dataset_id='id2',
+                      title='title two',
+                      description='description of dataset two',
+                      geographies='',
+                      concepts='',
+                      keywords='key key2',
+                      tags='tag tag2',
+                      variables='var2',
+                      vintage='2015'),
+    ]
+    with index:
+        index.add(data)
+
+    def dataset_ids(results):
+        return [hit['dataset_id'] for hit in results]
+    assert dataset_ids(index.query('one')) == ['id1']
+    assert sorted(dataset_ids(index.query('title'))) == ['id1', 'id2']
+    assert dataset_ids(index.query('title:two')) == ['id2']
+    assert dataset_ids(index.query('title: two')) == ['id2']
+    assert dataset_ids(index.query('description:one')) == ['id1']
+    assert dataset_ids(index.query('keywords:key1')) == ['id1']
+    assert sorted(dataset_ids(index.query('tags:tag'))) == ['id1', 'id2']
+    assert dataset_ids(index.query('title one')) == ['id1']
+    assert dataset_ids(index.query('key*')) == ['id1', 'id2']
+    assert dataset_ids(index.query('dataset_id:id2')) == ['id2']
+    assert dataset_ids(index.query('dataset_id:id')) == []
+
+
+def _variables(dataset_id, *labels):
+    return [VariableFields(dataset_id=dataset_id,
+                           variable=f'V{pos}',
+                           group='G',
+                           label=label,
+                           concept='concept')
+            for pos, label in enumerate(labels)]
+
+
+def test_search():
+    index = Bm25Index(FieldSet.VARIABLE, 'variables')
+    with index:
+        index.add(_variables('ds1', 'median household income', 'income', 'age'))
+        index.add(_variables('ds1/sub', 'income income'))
+
+    rows = list(index.search('income', columns=['dataset_id', 'variable']))
+    assert len(rows) == 3
+    assert set(rows[0]) == {'score', 'dataset_id', 'variable'}
+    # Shorter labels and more occurrences score higher.
+    assert [row['dataset_id'] for row in rows] == ['ds1/sub', 'ds1', 'ds1']
+    assert rows[1]['variable'] == 'V1'
+    assert list(index.search('income', limit=2, offset=1)) == \
+        list(index.search('income'))[1:]
+
+    assert sorted(row['variable'] for row in index.search('income', dataset_id='ds1')) == \
+        ['V0', 'V1']
+    assert [row['variable'] for row in index.search('', label='household income')] == ['V0']
+    assert [row['variable'] for row in index.search('"income household"')] == ['V0']
+    assert [row['label'] for row in index.search('hous*')] == ['median household income']
+    with pytest.raises(ValueError):
+        list(index.search('income', columns=['score']))
+    with pytest.raises(ValueError):
+        list(index.search('income', unknown='x'))
+    # query takes only field constraints, not search's options.
+    with pytest.raises(ValueError):
+        index.query('income', limit='1')
+
+
+def test_persistent_index(tmp_path):
+    index = Bm25Index(FieldSet.VARIABLE, 'variables', str(tmp_path))
+    with index:
+        assert index.upsert('ds1', _variables('ds1', 'income', 'age'), version='1')
+        assert index.upsert('ds2', _variables('ds2', 'income'), version='1')
+    assert (tmp_path / 'variables.bm25').exists()
+
+    index = Bm25Index(FieldSet.VARIABLE, 'variables', str(tmp_path))
+    assert index.dataset_ids() == {'ds1', 'ds2'}
+    assert index.indexed_version('ds1') == '1'
+    with index:
+        assert not index.upsert('ds1', _variables('ds1', 'other'), version='1')
+        assert index.upsert('ds1', _variables('ds1', 'poverty'), version='2')
+        with pytest.raises(ValueError):
+            index.upsert('ds2', _variables('ds1', 'income'), version='2')
+    assert index.indexed_version('ds1') == '2'
+    assert [row['dataset_id'] for row in index.query('income')] == ['ds2']
+    assert [row['dataset_id'] for row in index.query('poverty')] == ['ds1']
+
+    with index:
+        assert index.delete('ds1')
+        assert not index.delete('ds3')
+        assert index.dataset_ids() == {'ds2'}
+    assert index.indexed_version('ds1') is None
+    assert index.query('poverty') == []
+
+    # A failed update leaves the index as it was.
+    with pytest.raises(RuntimeError), index:
+        index.upsert('ds2', _variables('ds2', 'rent'))
+        raise RuntimeError
+    assert [row['dataset_id'] for row in
+            Bm25Index(FieldSet.VARIABLE, 'variables', str(tmp_path)).query('income')] == ['ds2']
+
+    with pytest.raises(CensusError):
+        index.add(_variables('ds3', 'income'))
+    with pytest.raises(CensusError):
+        Bm25Index(FieldSet.DATASET, 'variables', str(tmp_path))
@@ -0,0 +1,53 @@
+from uscensus.util.textindex import VariableFields
+from uscensus.util.textindex.completionindex import (
+    Completion,
+    CompletionIndex,
+    CompletionStore,
+)
+
+ROWS = [
+    VariableFields('ds', 'B19013_001E',
+                   'B19013', 'Estimate!!Median household income in the past 12 months',
+                   'MEDIAN HOUSEHOLD INCOME'),
+    VariableFields('ds', 'B19013_001M',
+                   'B19013', 'Margin of Error!!Median household income in the past 12 months',
+                   'MEDIAN HOUSEHOLD INCOME'),
+    VariableFields('ds', 'B01001_001E', 'B01001', 'Estimate!!Total:', 'SEX BY AGE'),
+    VariableFields('ds', 'NAME', 'N/A', 'Geographic Area Name', ''),
+]
+
+
+def test_complete():
+    index = CompletionIndex.from_rows(ROWS)
+    assert len(index) == 6
+    assert [completion.name for completion in index.complete('B19013_')] == \
+        ['B19013_001E', 'B19013_001M']
+    assert index.complete('b19013_001m') == [
+        Completion('variable', 'B19013_001M', ROWS[1].label)]
+    # Words inside labels and concepts, across label separators.
+    assert [completion.name for completion in index.complete('household inc')] == \
+        ['B19013', 'B19013_001E', 'B19013_001M']
+    assert [completion.name for completion in index.complete('error median')] == \
+        ['B19013_001M']
+    assert index.complete('income', kinds=['group']) == [
+        Completion('group', 'B19013', 'MEDIAN HOUSEHOLD INCOME')]
+    assert [completion.name for completion in index.complete('Estimate  TOTAL')] == \
+        ['B01001_001E']
+    assert len(index.complete('b', limit=2)) == 2
+    assert index.complete('xyz') == []
+
+    restored = CompletionIndex.from_dict(index.to_dict())
+    assert restored.complete('B19013_') == index.complete('B19013_')
+
+
+def test_store(tmp_path):
+    index = CompletionIndex.from_rows(ROWS)
+    store = CompletionStore(str(tmp_path / 'completions'))
+    assert store.get('2019/acs/acs5', '2020-01-01') is None
+    store.put('2019/acs/acs5', '2020-01-01', index)
+    store.put('2019/acs/acs1', None, index)
+
+    reopened = CompletionStore(str(tmp_path / 'completions'))
+    assert reopened.get('2019/acs/acs5', '2020-01-01').to_dict() == index.to_dict()
+    assert reopened.get('2019/acs/acs5', '2021-01-01') is None
+    assert reopened.get('2019/acs/acs1', None) is None
@@ -0,0 +1,114 @@
+import pytest
+
+from uscensus.util.textindex import DatasetFields, FieldSet, VariableFields, dedupindex
+from uscensus.util.textindex.bm25index import Bm25Index
+from uscensus.util.textindex.dedupindex import DedupVariableIndex
+from uscensus.util.textindex.sqlitefts5index import SqliteFts5Index
+
+
+def _variables(dataset_id, *labels):
+    return [VariableFields(dataset_id=dataset_id,
+                           variable=f'V{pos}',
+                           group='G',
+                           label=label,
+                           concept='concept')
+            for pos, label in enumerate(labels)]
+
+
+def test_dedup():
+    variables = SqliteFts5Index(FieldSet.VARIABLE, 'variables')
+    index = DedupVariableIndex(variables)
+    with index:
+        for vintage in range(2015, 2020):
+            index.upsert(f'acs/{vintage}', _variables(f'acs/{vintage}', 'income', 'age'))
+        index.add(_variables('other', 'income', 'rent'))
+    # V0 'income', V1 'age', and V1 'rent'.
+    assert len(variables.dataset_ids()) == 3
+
+    rows = index.query('income')
+    assert len(rows) == 6
+    assert {row['variable'] for row in rows} == {'V0'}
+    assert min(row['dataset_id'] for row in rows) == 'acs/2015'
+    assert [row['dataset_id'] for row in index.search('income', dataset_id='other')] == \
+        ['other']
+    assert index.query('rent', dataset_id='acs/2015') == []
+    assert len(list(index.search('income', limit=2, offset=5))) == 1
+    assert list(index.search('income', limit=0)) == []
+
+    # Documents no longer in any dataset are dropped.
+    with index:
+        assert index.upsert('other', _variables('other', 'income', 'poverty'))
+    assert index.query('rent') == []
+    assert [row['dataset_id'] for row in index.query('poverty')] == ['other']
+    assert len(variables.dataset_ids()) == 3
+    with index, pytest.raises(ValueError):
+        index.upsert('other', _variables('acs/2015', 'income'))
+    with index, pytest.raises(TypeError):
+        index.add([DatasetFields('ds', 'title', '', '', '', '', '', '', '2020')])
+    # query takes only field constraints, not search's options.
+    with pytest.raises(ValueError):
+        index.query('income', limit='1')
+
+
+def test_search_ranks_only_needed(monkeypatch):
+    monkeypatch.setattr(dedupindex, '_BATCH', 2)
+    variables = SqliteFts5Index(FieldSet.VARIABLE, 'variables')
+    index = DedupVariableIndex(variables)
+    with index:
+        for pos in range(10):
+            index.upsert(f'ds{pos}', [VariableFields(f'ds{pos}', f'V{pos}', 'G',
+                                                     'income', 'concept')])
+    limits = []
+    search = variables.search
+
+    def spy(*args, **kwargs):
+        limits.append(kwargs.get('limit'))
+        return search(*args, **kwargs)
+
+    monkeypatch.setattr(variables, 'search', spy)
+    assert len(list(index.search('income', limit=3))) == 3
+    assert limits == [3]
+    # A dataset's rows are found in batches of increasing size.
+    limits.clear()
+    assert [row['variable'] for row in index.search('income', dataset_id='ds7')] == ['V7']
+    assert limits == [2, 4, 8]
+
+
+def test_persistent_dedup(tmp_path):
+    def open_index():
+        return DedupVariableIndex(Bm25Index(FieldSet.VARIABLE, 'variables', str(tmp_path)),
+                                  str(tmp_path / 'variables.json'))
+
+    index = open_index()
+    with index:
+        assert index.upsert('ds1', _variables('ds1', 'income'), version='1')
+        assert index.upsert('ds2', _variables('ds2', 'income'), version='1')
+
+    index = open_index()
+    assert index.dataset_ids() == {'ds1', 'ds2'}
+    assert sorted(row['dataset_id'] for row in index.query('income')) == ['ds1', 'ds2']
+    with pytest.raises(RuntimeError), index:
+        assert not index.upsert('ds1', _variables('ds1', 'age'), version='1')
+        assert index.upsert('ds1', _variables('ds1', 'age'), version='2')
+        raise RuntimeError
+    assert index.indexed_version('ds1') == '1'
+    assert sorted(row['dataset_id'] for row in index.query('income')) == ['ds1', 'ds2']
+
+    # Documents are dropped with the last dataset containing them.
+    with index:
+        assert index.upsert('ds1', _variables('ds1', 'income', 'age'), version='2')
+        assert index.delete('ds1')
+        assert not index.delete('ds3')
+    index = open_index()
+    assert index.dataset_ids() == {'ds2'}
+    assert index.indexed_version('ds1') is None
+    assert [row['dataset_id'] for row in index.query('income')] == ['ds2']
+    assert index.query('age') == []
+    assert len(index.index.dataset_ids()) == 1
+
+
+def test_persistent_index_requires_path(tmp_path):
+    variables = SqliteFts5Index(FieldSet.VARIABLE, 'variables',
+                                str(tmp_path / 'index.db'), mode='open')
+    with pytest.raises(ValueError):
+        DedupVariableIndex(variables)
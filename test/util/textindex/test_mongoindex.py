@@ -1,5 +1,7 @@
 
-from uscensus.util.textindex import DatasetFields, FieldSet
+import pytest
+
+from uscensus.util.textindex import DatasetFields, FieldSet, VariableFields
 from uscensus.util.textindex.mongoindex import MongoIndex
 
 
@@ -52,3 +54,31 @@ def test_Index():
     assert dataset_ids(index.query('', tags={'$regex': 'tag2'})) == ['id2']
     assert sorted(dataset_ids(index.query('', tags={'$regex': 'tag'}))) == \
         ['id1', 'id2']
+
+
+def test_upsert():
+    def variables(dataset_id, *labels):
+        return [VariableFields(dataset_id=dataset_id,
+                               variable=f'V{pos}',
+                               group='G',
+                               label=label,
+                               concept='concept')
+                for pos, label in enumerate(labels)]
+
+    index = MongoIndex(FieldSet.VARIABLE, 'varindex_upsert', batch_size=2)
+    with index:
+        assert index.upsert('ds1', variables('ds1', 'income', 'age', 'rent'), version='1')
+        assert index.upsert('ds2', variables('ds2', 'income'), version='1')
+
+    # Reopening keeps the documents and the text index.
+    index = MongoIndex(FieldSet.VARIABLE, 'varindex_upsert', mode='open')
+    assert index.dataset_ids() == {'ds1', 'ds2'}
+    assert 'fields_text_index' in index.coll.index_information()
+    with index:
+        assert not index.upsert('ds1', variables('ds1', 'other'), version='1')
+        assert index.upsert('ds1', variables('ds1', 'poverty'), version='2')
+        with pytest.raises(ValueError):
+            index.upsert('ds2', variables('ds1', 'income'))
+    assert index.indexed_version('ds1') == '2'
+    assert [row['dataset_id'] for row in index.query('income')] == ['ds2']
+    assert [row['variable'] for row in index.query('poverty', dataset_id='ds1')] == ['V0']
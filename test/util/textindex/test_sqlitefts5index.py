@@ -1,4 +1,9 @@
-from uscensus.util.textindex import DatasetFields, FieldSet
+import sqlite3
+
+import pytest
+
+from uscensus.util.errors import CensusError
+from uscensus.util.textindex import DatasetFields, FieldSet, VariableFields
 from uscensus.util.textindex.sqlitefts5index import SqliteFts5Index
 
 
@@ -49,3 +54,102 @@ def test_Index():
     assert dataset_ids(index.query('tags:tag2')) == ['id2']
     assert sorted(dataset_ids(index.query('tags:tag'))) == \
         ['id1', 'id2']
+
+
+def _variables(dataset_id, *labels):
+    return [VariableFields(dataset_id=dataset_id,
+                           variable=f'V{pos}',
+                           group='G',
+                           label=label,
+                           concept='concept')
+            for pos, label in enumerate(labels)]
+
+
+def test_persistent_index(tmp_path):
+    dbname = str(tmp_path / 'index.db')
+    index = SqliteFts5Index(FieldSet.VARIABLE, 'variables', dbname)
+    with index:
+        assert index.upsert('ds1', _variables('ds1', 'income', 'age'), version='1')
+        assert index.upsert('ds2', _variables('ds2', 'income'), version='1')
+    index.conn.close()
+
+    index = SqliteFts5Index(FieldSet.VARIABLE, 'variables', dbname, mode='open')
+    assert index.dataset_ids() == {'ds1', 'ds2'}
+    with index:
+        assert not index.upsert('ds1', _variables('ds1', 'other'), version='1')
+        assert index.upsert('ds1', _variables('ds1', 'poverty'), version='2')
+        with pytest.raises(ValueError):
+            index.upsert('ds2', _variables('ds1', 'income'), version='2')
+    assert index.indexed_version('ds1') == '2'
+    assert [row['dataset_id'] for row in index.query('income')] == ['ds2']
+    assert [row['dataset_id'] for row in index.query('poverty')] == ['ds1']
+
+    readonly = SqliteFts5Index(FieldSet.VARIABLE, 'variables', dbname, mode='readonly')
+    assert [row['dataset_id'] for row in readonly.query('poverty')] == ['ds1']
+    with pytest.raises(CensusError):
+        readonly.add(_variables('ds3', 'income'))
+
+    with index:
+        assert index.delete('ds1')
+    assert list(readonly.query('poverty')) == []
+    with pytest.raises(CensusError):
+        SqliteFts5Index(FieldSet.DATASET, 'datasets', dbname, mode='readonly')
+
+
+def test_search():
+    index = SqliteFts5Index(FieldSet.VARIABLE, 'variables')
+    with index:
+        index.add(_variables('ds1', 'median income', "owner's income", 'age'))
+        index.add(_variables('ds2', 'income "total"'))
+
+    rows = list(index.search('income', columns=['dataset_id', 'variable']))
+    assert len(rows) == 3
+    assert set(rows[0]) == {'score', 'dataset_id', 'variable'}
+    assert [row['variable'] for row in index.search('income', limit=1, offset=0)] == \
+        [rows[0]['variable']]
+    assert len(list(index.search('income', limit=2, offset=2))) == 1
+
+    # Quotes in phrases and constraints are escaped.
+    assert [row['label'] for row in index.search("owner's")] == ["owner's income"]
+    assert [row['dataset_id'] for row in index.search('', label='income "total"')] == \
+        ['ds2']
+
+    df = index.search_frame('income', dataset_id='ds1', columns=['variable'])
+    assert list(df.columns) == ['score', 'variable']
+    assert sorted(df['variable']) == ['V0', 'V1']
+    with pytest.raises(ValueError):
+        index.search_frame('income', columns=['score; DROP TABLE variables'])
+
+
+def test_shared_connection(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'index.db')
+    datasets = SqliteFts5Index(FieldSet.DATASET, 'datasets', conn, mode='open')
+    variables = SqliteFts5Index(FieldSet.VARIABLE, 'variables', conn, mode='open')
+    with datasets, variables:
+        variables.upsert('ds1', _variables('ds1', 'income'))
+        datasets.upsert('ds1', [DatasetFields(dataset_id='ds1',
+                                              title='title one',
+                                              description='',
+                                              geographies='',
+                                              concepts='',
+                                              keywords='',
+                                              tags='',
+                                              variables='income',
+                                              vintage='2015')])
+    assert [row['dataset_id'] for row in variables.query('income')] == ['ds1']
+    assert [row['dataset_id'] for row in datasets.query('one')] == ['ds1']
+
+
+def test_bulk_load(tmp_path):
+    dbname = str(tmp_path / 'index.db')
+    index = SqliteFts5Index(FieldSet.VARIABLE, 'variables', dbname, bulk=True)
+    synchronous = index.conn.execute('PRAGMA synchronous;').fetchone()[0]
+    with index:
+        for dataset_id in ('ds1', 'ds2'):
+            index.upsert(dataset_id, _variables(dataset_id, 'income', 'age'))
+    assert index.conn.execute('PRAGMA journal_mode;').fetchone()[0] == 'wal'
+    assert index.conn.execute('PRAGMA synchronous;').fetchone()[0] == synchronous
+    automerge = index.conn.execute(
+        "SELECT v FROM variables_config WHERE k = 'automerge';").fetchone()[0]
+    assert automerge == 16
+    assert sorted(row['dataset_id'] for row in index.search('income')) == ['ds1', 'ds2']
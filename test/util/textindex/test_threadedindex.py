@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+import pytest
+
+from uscensus.util.textindex import FieldSet, ThreadedAsyncTextIndex, VariableFields
+from uscensus.util.textindex.sqlitefts5index import SqliteFts5Index
+
+
+def _variables(dataset_id, threads):
+    for pos, label in enumerate(('income', 'age')):
+        threads.add(threading.current_thread().name)
+        yield VariableFields(dataset_id=dataset_id,
+                             variable=f'V{pos}',
+                             group='G',
+                             label=label,
+                             concept='concept')
+
+
+@pytest.mark.asyncio
+async def test_threaded_index():
+    threads = set()
+    index = ThreadedAsyncTextIndex(SqliteFts5Index(FieldSet.VARIABLE, 'variables'))
+    async with index:
+        await asyncio.gather(*(index.upsert(dataset_id, _variables(dataset_id, threads))
+                               for dataset_id in ('ds1', 'ds2', 'ds3')))
+    assert len(threads) == 1
+    assert threading.current_thread().name not in threads
+
+    rows = await index.search('income', limit=2)
+    assert len(rows) == 2
+    assert rows[0]['label'] == 'income'
+    assert len(await index.query('income')) == 3
+    # The wrapped index is usable directly once written.
+    assert len(list(index.index.search('age'))) == 3
+    index.close()
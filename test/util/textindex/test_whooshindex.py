@@ -1,4 +1,4 @@
-from uscensus.util.textindex import DatasetFields, FieldSet
+from uscensus.util.textindex import DatasetFields, FieldSet, VariableFields
 from uscensus.util.textindex.whooshindex import WhooshIndex
 
 
@@ -49,3 +49,77 @@ def test_Index():
     assert dataset_ids(index.query('tags:tag2')) == ['id2']
     assert sorted(dataset_ids(index.query('tags:tag'))) == \
         ['id1', 'id2']
+
+
+def test_search():
+    index = WhooshIndex(FieldSet.VARIABLE, 'variables', 'label')
+    data = [VariableFields(dataset_id=dataset_id,
+                           variable=f'V{pos}',
+                           group='G',
+                           label=label,
+                           concept='concept')
+            for pos, (dataset_id, label) in enumerate((
+                ('ds1', 'median income'),
+                ('ds1', 'household income'),
+                ('ds2', 'income'),
+                ('ds2', 'age')))]
+    with index:
+        index.add(data)
+
+    rows = list(index.search('income'))
+    assert len(rows) == 3
+    assert 'score' in rows[0]
+    assert list(index.search('income', limit=2, offset=1)) == rows[1:]
+    assert list(index.search('income', limit=0)) == []
+    assert sorted(row['variable']
+                  for row in index.search('income', dataset_id='ds1')) == ['V0', 'V1']
+    assert [row['variable'] for row in index.search('', label='age')] == ['V3']
+
+
+def test_parallel_upsert(tmp_path):
+    def variables(dataset_id, labels):
+        return [VariableFields(dataset_id=dataset_id,
+                               variable=f'V{pos}',
+                               group='G',
+                               label=label,
+                               concept='concept')
+                for pos, label in enumerate(labels)]
+
+    index = WhooshIndex(FieldSet.VARIABLE, 'variables', 'label', str(tmp_path),
+                        procs=2, limitmb=16)
+    with index:
+        for pos in range(20):
+            index.upsert(f'ds{pos}', variables(f'ds{pos}', ['income', 'age']), '1')
+    assert len(list(index.search('income'))) == 20
+
+    # Reopened, unchanged datasets are skipped and changed ones replaced.
+    index = WhooshIndex(FieldSet.VARIABLE, 'variables', 'label', str(tmp_path))
+    assert index.indexed_version('ds0') == '1'
+    with index:
+        assert not index.upsert('ds0', variables('ds0', ['rent']), '1')
+        assert index.upsert('ds1', variables('ds1', ['rent']), '2')
+    assert len(list(index.search('income'))) == 19
+    assert [row['dataset_id'] for row in index.search('rent')] == ['ds1']
+    assert index.indexed_version('ds1') == '2'
+
+    with index:
+        assert index.delete('ds1')
+        assert not index.delete('ds20')
+    assert index.dataset_ids() == {f'ds{pos}' for pos in range(20)} - {'ds1'}
+    assert index.indexed_version('ds1') is None
+    assert list(index.search('rent')) == []
+
+
+def test_upsert_dataset():
+    index = WhooshIndex(FieldSet.DATASET, 'index', 'title')
+
+    def dataset(title):
+        return DatasetFields(dataset_id='id1', title=title, description='',
+                             geographies='', concepts='', keywords='',
+                             tags='', variables='', vintage='2015')
+    with index:
+        index.upsert('id1', [dataset('one')])
+    with index:
+        index.upsert('id1', [dataset('two')])
+    assert list(index.search('one')) == []
+    assert [row['dataset_id'] for row in index.search('two')] == ['id1']
@@ -1,5 +1,7 @@
 import asyncio
 import logging
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import httpx
@@ -7,8 +9,16 @@ import pandas as pd
 
 from uscensus.data.model import AsyncCensusDataEndpoint, CensusDataEndpoint
 from uscensus.util.errors import CensusError
-from uscensus.util.textindex import DatasetFields, FieldSet, TextIndex
-from uscensus.util.textindex.sqlitefts5index import SqliteFts5Index
+from uscensus.util.textindex import (
+    AsyncTextIndex,
+    DatasetFields,
+    FieldSet,
+    TextIndex,
+    ThreadedAsyncTextIndex,
+)
+from uscensus.util.textindex.completionindex import CompletionStore
+from uscensus.util.textindex.dedupindex import DedupVariableIndex
+from uscensus.util.textindex.sqlitefts5index import SqliteFts5Index, connect
 from uscensus.util.webcache import afetch
 
 _logger = logging.getLogger(__name__)
@@ -22,6 +32,7 @@ class AsyncDiscoveryInterface:
 
     """
 
+    completion_store: CompletionStore | None
     datasets: dict[str, AsyncCensusDataEndpoint]
     index: TextIndex
     variableindex: TextIndex
@@ -30,7 +41,11 @@ class AsyncDiscoveryInterface:
     async def create(key: str,
                      client: httpx.AsyncClient,
                      vintage: str | int | None = None,
-                     fts_class: type = SqliteFts5Index) -> 'AsyncDiscoveryInterface':
+                     fts_class: type = SqliteFts5Index,
+                     fts_args: Mapping[str, Any] | None = None,
+                     dedup_args: Mapping[str, Any] | None = None,
+                     completions_path: str | None = None,
+                     ) -> 'AsyncDiscoveryInterface':
         """Load and wrap census datasets.
 
         Prefers cached metadata if present and not stale, otherwise
@@ -43,6 +58,21 @@ class AsyncDiscoveryInterface:
           * vintage: discovery only data sets for this vintage, if present.
           * fts_class: utility class to use for full-text indices. If omitted,
                 SqliteFts5Index will be used.
+          * fts_args: extra keyword arguments for `fts_class`, e.g.
+                `{'dbname': 'index.db', 'mode': 'open'}` to reuse a
+                persistent index, reindexing only changed datasets and
+                removing those no longer discovered.
+                Both indexes are written through one connection to a
+                SqliteFts5Index file; a connection passed in must be
+                opened with `sqlitefts5index.connect`.
+          * dedup_args: if given, index each distinct variable once
+                rather than once per dataset containing it, with a
+                DedupVariableIndex taking these keyword arguments,
+                e.g. `{'path': 'variables.json'}` alongside a
+                persistent index.
+          * completions_path: if given, the directory in which to keep
+                each dataset's variable completions once built, e.g.
+                alongside a persistent index.
 
         """
         self = AsyncDiscoveryInterface()
@@ -59,19 +89,51 @@ class AsyncDiscoveryInterface:
             raise CensusError('Unable to identify datasets from dataset '
                               ' discovery endpoint')
 
-        self.index = fts_class(FieldSet.DATASET, 'datasets')
-        self.variableindex = fts_class(FieldSet.VARIABLE, 'variables')
-        with self.index, self.variableindex:
-            async with asyncio.TaskGroup() as tg:
-                complete = [0]
-                for ds in datasets:
-                    tg.create_task(
-                        self._process_one_dataset(key, client, ds, complete),
-                        name=ds['title'])
+        fts_args = dict(fts_args or {})
+        dbname = fts_args.get('dbname')
+        if (issubclass(fts_class, SqliteFts5Index)
+                and isinstance(dbname, str)
+                and fts_args.get('mode') != 'readonly'):
+            # sqlite allows one writer at a time, so share a connection
+            # that the writer thread can use.
+            fts_args['dbname'] = connect(dbname)
+        self.index = fts_class(FieldSet.DATASET, 'datasets', **fts_args)
+        self.variableindex = fts_class(FieldSet.VARIABLE, 'variables', **fts_args)
+        if dedup_args is not None:
+            self.variableindex = DedupVariableIndex(self.variableindex, **dedup_args)
+        self.completion_store = (None if completions_path is None
+                                 else CompletionStore(completions_path))
+        # Write to the indexes on one writer thread, so that indexing
+        # overlaps with fetching metadata instead of blocking it.
+        with ThreadPoolExecutor(max_workers=1,
+                                thread_name_prefix='textindex') as executor:
+            async with (
+                ThreadedAsyncTextIndex(self.index, executor) as index,
+                ThreadedAsyncTextIndex(self.variableindex, executor) as variableindex,
+            ):
+                async with asyncio.TaskGroup() as tg:
+                    complete = [0]
+                    for ds in datasets:
+                        tg.create_task(
+                            self._process_one_dataset(key, client, ds, complete,
+                                                      index, variableindex),
+                            name=ds['title'])
+                if self.index.persistent:
+                    await self._prune(index)
+                if self.variableindex.persistent:
+                    await self._prune(variableindex)
 
         _logger.info('Done processing datasets')
         return self
 
+    async def _prune(self, index: AsyncTextIndex) -> None:
+        """Remove the datasets that weren't discovered from a
+        persistent index, so that searches don't return them.
+        """
+        for dataset_id in await index.dataset_ids() - self.datasets.keys():
+            _logger.debug(f'Removing dataset {dataset_id} from the index')
+            await index.delete(dataset_id)
+
     @staticmethod
     def _get_ds_id(ds: dict) -> str:
         for distribution in ds.get('distribution') or []:
@@ -87,22 +149,25 @@ class AsyncDiscoveryInterface:
                                    key: str,
                                    client: httpx.AsyncClient,
                                    ds: dict,
-                                   complete: list[int]) -> None:
+                                   complete: list[int],
+                                   index: AsyncTextIndex,
+                                   variableindex: AsyncTextIndex) -> None:
         """Build an AsyncCensuDataEndpoint for the specfied dataset metadata.
 
-        This must be called with self.index and self.variableindex
-        entered.
+        This must be called with `index` and `variableindex`, async
+        views of self.index and self.variableindex, entered.
 
         """
         ds_id = self._get_ds_id(ds)
         _logger.debug(f'Processing dataset {ds_id}')
         try:
             dataset = await AsyncCensusDataEndpoint.create(
-                key, ds, client, self.variableindex)
+                key, ds, client, self.variableindex, writer=variableindex,
+                completions=self.completion_store)
             # TODO: add more indexing; groups, hier by
             #       dataset, geo schemes, by vintage, etc
             self.datasets[dataset.id] = dataset
-            self.index.add([
+            await index.upsert(dataset.id, [
                 DatasetFields(
                     dataset_id=dataset.id,
                     title=dataset.title,
@@ -113,7 +178,8 @@ class AsyncDiscoveryInterface:
                     keywords=' '.join(dataset.keywords),
                     tags=' '.join(dataset.tags),
                     variables=' '.join(dataset.variables['label']),
-                    vintage=dataset.vintage)])
+                    vintage=dataset.vintage)],
+                version=ds.get('modified'))
             _logger.debug('Finished processing metadata for dataset: '
                           f'{dataset.id}')
         except Exception as e:  # noqa: BLE001
@@ -124,7 +190,11 @@ class AsyncDiscoveryInterface:
         if complete[0] % 100 == 0:
             _logger.info(f'Processed {complete[0]} datasets')
 
-    def search(self, query: str) -> pd.DataFrame:
+    def search(self,
+               query: str,
+               *,
+               limit: int | None = None,
+               offset: int = 0) -> pd.DataFrame:
         """Find a list of dataset objects matching the index query.
 
         Index queries default to searching dataset titles, but may also search.
@@ -143,14 +213,17 @@ class AsyncDiscoveryInterface:
         Elaborate queries can be constructed using parenthesized
         subqueries, ANDs, and ORs.
 
+        Only the `limit` best matches after the first `offset` are
+        returned, if given.
+
         """
         if query.find(':') < 0:
             query = f'title: {query}'
 
         cols = ['score', 'dataset_id', 'title', 'description']
         return pd.DataFrame(
-            [tuple(row[col] for col in cols)
-             for row in self.index.query(query)],
+            [tuple(row.get(col) for col in cols)
+             for row in self.index.search(query, limit=limit, offset=offset)],
             columns=cols,
         )
 
@@ -179,7 +252,10 @@ class DiscoveryInterface:
                  key: str,
                  client: httpx.AsyncClient,
                  vintage: str | int | None = None,
-                 fts_class: type = SqliteFts5Index) -> None:
+                 fts_class: type = SqliteFts5Index,
+                 fts_args: Mapping[str, Any] | None = None,
+                 dedup_args: Mapping[str, Any] | None = None,
+                 completions_path: str | None = None) -> None:
         """Load and wrap census datasets.
 
         Prefers cached metadata if present and not stale, otherwise
@@ -192,11 +268,17 @@ class DiscoveryInterface:
           * vintage: discovery only data sets for this vintage, if present.
           * fts_class: utility class to use for full-text indices. If omitted,
                 SqliteFts5Index will be used.
+          * fts_args: extra keyword arguments for `fts_class`.
+          * dedup_args: keyword arguments for a DedupVariableIndex
+                wrapping the variable index, if given.
+          * completions_path: the directory in which to keep variable
+                completions, if given.
 
         """
         _logger.debug('Fetching root metadata')
         self._impl = asyncio.run(
-            AsyncDiscoveryInterface.create(key, client, vintage, fts_class))
+            AsyncDiscoveryInterface.create(key, client, vintage, fts_class, fts_args,
+                                           dedup_args, completions_path))
         self.datasets = {
             key: CensusDataEndpoint(value)
             for key, value in self._impl.datasets.items()
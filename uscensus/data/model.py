@@ -1,11 +1,17 @@
 import asyncio
 import logging
 import re
+from functools import cached_property
 
 import httpx
 import pandas as pd
 
-from uscensus.util.textindex import TextIndex, VariableFields
+from uscensus.util.textindex import AsyncTextIndex, TextIndex, VariableFields
+from uscensus.util.textindex.completionindex import (
+    Completion,
+    CompletionIndex,
+    CompletionStore,
+)
 from uscensus.util.webcache import afetch
 
 _logger = logging.getLogger(__name__)
@@ -15,6 +21,7 @@ class AsyncCensusDataEndpoint:
     """A single census endpoint, with metadata about queryable variables and geography.
     """
 
+    completion_store: CompletionStore | None
     concepts: set[str]
     dataset: tuple
     description: str
@@ -32,13 +39,17 @@ class AsyncCensusDataEndpoint:
     variableindex: TextIndex
     variables: pd.DataFrame
     variables_: dict
+    version: str | None
     vintage: str | None
 
     @staticmethod
     async def create(key: str,
                      ds: dict,
                      session: httpx.AsyncClient,
-                     variableindex: TextIndex):
+                     variableindex: TextIndex,
+                     *,
+                     writer: AsyncTextIndex | None = None,
+                     completions: CompletionStore | None = None):
         """Initialize a Census API endpoint wrapper.
 
         Arguments:
@@ -48,6 +59,11 @@ class AsyncCensusDataEndpoint:
           * cache: cache in which to look up/store metadata.
           * session: httpx.AsyncClient to use for retrieving data.
           * variableindex: the Index in which to store variable data
+          * writer: if given, an async view of `variableindex` (e.g. a
+            ThreadedAsyncTextIndex) through which to add the variables
+            without blocking the event loop.
+          * completions: if given, where to keep the dataset's
+            variable completions once built.
 
         """
         self = AsyncCensusDataEndpoint()
@@ -60,6 +76,8 @@ class AsyncCensusDataEndpoint:
         self.dataset = tuple(ds['c_dataset'])
         # vintage, if dataset is year-specific
         self.vintage = str(ds['c_vintage']) if 'c_vintage' in ds else None
+        # last modification, to tell whether indexes are up to date
+        self.version = ds.get('modified')
         # dataset endpoint URL
         for distribution in ds.get('distribution') or []:
             if distribution.get('format') == 'API':
@@ -98,7 +116,14 @@ class AsyncCensusDataEndpoint:
             ]).T
         # index the variables
         self.variableindex = variableindex
-        self.variableindex.add(self._generateVariableRows())
+        if writer is None:
+            self.variableindex.upsert(self.id, self._generateVariableRows(),
+                                      version=self.version)
+        else:
+            await writer.upsert(self.id, self._generateVariableRows(),
+                                version=self.version)
+        # prefix completions of the variables, built on first use
+        self.completion_store = completions
 
         # keep track of concepts for indexing
         self.concepts = set(self.variables['concept']
@@ -134,21 +159,53 @@ class AsyncCensusDataEndpoint:
             self.groups = pd.DataFrame(self.groups_).T
         return self
 
-    def searchVariables(self, query, **constraints):
+    def searchVariables(self, query, *, limit=None, offset=0, **constraints):
         """Return for variables matching a query string.
 
         Keywords are `variable` (ID), `label` (name) and `concept`
-        (grouping of variables).
+        (grouping of variables). Only the `limit` best matches after
+        the first `offset` are returned, if given.
 
         """
+        cols = ['score', *VariableFields._fields]
         return pd.DataFrame(
-            self.variableindex.query(
-                query,
-                dataset_id=self.id,
-                **constraints),
-            columns=['score', *list(self.variableindex.fields)],
+            [tuple(row.get(col) for col in cols)
+             for row in self.variableindex.search(
+                 query,
+                 limit=limit,
+                 offset=offset,
+                 dataset_id=self.id,
+                 **constraints)],
+            columns=cols,
         ).drop('dataset_id', axis=1)
 
+    @cached_property
+    def completions(self) -> CompletionIndex:
+        """The prefix completions of the variables, built on first
+        access, or loaded from the completion store if it has them for
+        the dataset's version.
+        """
+        store = self.completion_store
+        if store is not None and (
+                index := store.get(self.id, self.version)) is not None:
+            return index
+        index = CompletionIndex.from_rows(self._generateVariableRows())
+        if store is not None:
+            store.put(self.id, self.version, index)
+        return index
+
+    def completeVariables(self, prefix, *, limit=10, kinds=None) -> list[Completion]:
+        """Return variables and groups completing a prefix of a
+        variable ID, group name, label or concept, e.g. as typed.
+
+        Unlike `searchVariables`, this only bisects an in-memory list,
+        built (or loaded from the completion store) on the first call,
+        so it is cheap enough to call on every keystroke. `kinds` may
+        restrict completions to `variable` or `group`.
+
+        """
+        return self.completions.complete(prefix, limit=limit, kinds=kinds)
+
     @staticmethod
     def _geo2str(geo):
         """Format geography dict as string for query."""
@@ -1,13 +1,35 @@
 from __future__ import annotations
 
-from uscensus.incremental.filters import filter_datasets
-from uscensus.incremental.query import QueryBuilder, RecodeRange, TabulationQueryBuilder
+from uscensus.incremental.aggregate import aggregate_geography, rollup_geography
+from uscensus.incremental.batch import arun_queries, run_queries
+from uscensus.incremental.catalogindex import CatalogIndex
+from uscensus.incremental.filters import compile_filters, filter_datasets
+from uscensus.incremental.panel import apanel_query, panel_query, resolve_vintages
+from uscensus.incremental.query import (
+    CompiledQuery,
+    QueryBuilder,
+    RecodeRange,
+    TabulationQueryBuilder,
+)
+from uscensus.incremental.variabletable import VariablePool, VariableTable
 from uscensus.incremental.wrappers import Catalog
 
 __all__ = [
     'Catalog',
+    'CatalogIndex',
+    'CompiledQuery',
     'QueryBuilder',
     'RecodeRange',
     'TabulationQueryBuilder',
+    'VariablePool',
+    'VariableTable',
+    'aggregate_geography',
+    'apanel_query',
+    'arun_queries',
+    'compile_filters',
     'filter_datasets',
+    'panel_query',
+    'resolve_vintages',
+    'rollup_geography',
+    'run_queries',
 ]
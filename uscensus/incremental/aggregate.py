@@ -0,0 +1,160 @@
+"""Roll additive query results up the FIPS geography hierarchy.
+
+A `QueryBuilder` result for fine-grained geographies (e.g. block groups
+in a state) carries the codes of its containing geographies in its
+geography columns (`state`, `county`, `tract`, ...). Summing additive
+count estimates within each containing geography reproduces the
+coarser-level results without further requests. Margins of error,
+identified by the `M` suffix paired with an `E` estimate as in
+`query._base_field`, are combined by root-sum-of-squares, the Census
+Bureau's approximation for sums of estimates.
+"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from uscensus.incremental.query import _base_field
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+_logger = logging.getLogger(__name__)
+
+# Nested geography levels, coarsest first.
+FIPS_HIERARCHY = (
+    'us',
+    'region',
+    'division',
+    'state',
+    'county',
+    'county subdivision',
+    'tract',
+    'block group',
+    'block',
+)
+
+# Values of this or below are annotation codes (e.g. -666666666 for
+# "not computable") rather than values.
+_SENTINEL_LIMIT = -111111111
+# The MOE annotation for controlled estimates, whose error is zero.
+_CONTROLLED_MOE = -555555555
+
+
+def is_moe_field(field: str) -> bool:
+    """Return whether `field` names a margin of error (e.g.
+    `B01001_001M`) paired with an estimate.
+    """
+    return field.endswith('M') and _base_field(field) != field
+
+
+def _is_annotation_field(field: str) -> bool:
+    return field.endswith('A') and len(field) > 1 and field[-2] in 'EM'
+
+
+def _geography_columns(frame: pd.DataFrame,
+                       geography: Sequence[str] | None) -> list[str]:
+    if geography is None:
+        return [level for level in FIPS_HIERARCHY if level in frame.columns]
+    missing = [level for level in geography if level not in frame.columns]
+    if missing:
+        raise ValueError(f'Geography columns not in result: {missing}')
+    return list(geography)
+
+
+def _default_fields(frame: pd.DataFrame, geography: Sequence[str]) -> list[str]:
+    return [column for column in frame.columns
+            if column not in geography and
+            not _is_annotation_field(column) and
+            pd.api.types.is_numeric_dtype(frame[column])]
+
+
+def aggregate_geography(frame: pd.DataFrame,
+                        level: str,
+                        *,
+                        fields: Iterable[str] | None = None,
+                        geography: Sequence[str] | None = None) -> pd.DataFrame:
+    """Aggregate a query result to a coarser geography level.
+
+    Arguments:
+    ---------
+      * frame: a query result with one row per geography and its
+        geography columns.
+      * level: the geography column to aggregate to, e.g. `county`.
+      * fields: the columns to aggregate, which must be additive
+        counts or their margins of error; by default all numeric
+        columns other than geography and annotations. Medians, ratios
+        and percentages can't be aggregated this way.
+      * geography: the result's geography columns, coarsest first;
+        by default those in `FIPS_HIERARCHY`.
+
+    Estimates are summed and margins of error combined by
+    root-sum-of-squares. Controlled margins of error count as zero;
+    a group containing any other annotation code or missing value
+    aggregates to NaN.
+
+    Returns a DataFrame with the fields followed by the geography
+    columns up to `level`, one row per geography at that level.
+
+    """
+    geo_columns = _geography_columns(frame, geography)
+    if level not in geo_columns:
+        raise ValueError(f'Unknown geography level "{level}"')
+    keys = geo_columns[:geo_columns.index(level) + 1]
+    fields = (_default_fields(frame, geo_columns) if fields is None
+              else list(fields))
+    if unknown := [field for field in fields if field not in frame.columns]:
+        raise ValueError(f'Unknown fields: {unknown}')
+    moe_fields = [field for field in fields if is_moe_field(field)]
+    estimate_fields = [field for field in fields if field not in moe_fields]
+
+    values = frame[fields].apply(pd.to_numeric, errors='coerce').astype('float64')
+    if moe_fields:
+        moes = values[moe_fields]
+        moes = moes.mask(moes == _CONTROLLED_MOE, 0.0)
+        values[moe_fields] = moes.mask(moes <= _SENTINEL_LIMIT) ** 2
+    if estimate_fields:
+        estimates = values[estimate_fields]
+        values[estimate_fields] = estimates.mask(estimates <= _SENTINEL_LIMIT)
+
+    grouped_by = [frame[key] for key in keys]
+    sums = values.groupby(grouped_by, sort=False).sum()
+    # Sums skip missing values; make any group containing one NaN.
+    sums = sums.mask(values.isna().groupby(grouped_by, sort=False).any())
+    if moe_fields:
+        sums[moe_fields] = np.sqrt(sums[moe_fields])
+    _logger.debug('Aggregated %d rows to %d %s rows', len(frame), len(sums), level)
+    return sums.reset_index()[[*fields, *keys]]
+
+
+def rollup_geography(frame: pd.DataFrame,
+                     levels: Iterable[str],
+                     *,
+                     fields: Iterable[str] | None = None,
+                     geography: Sequence[str] | None = None) -> dict[str, pd.DataFrame]:
+    """Aggregate a query result to several geography levels at once.
+
+    Each level is aggregated from the previous, finer, one, so the
+    full result is only scanned once. Arguments are as for
+    `aggregate_geography`.
+
+    Returns a mapping of each level to its aggregated DataFrame.
+
+    """
+    geo_columns = _geography_columns(frame, geography)
+    levels = set(levels)
+    if unknown := sorted(levels - set(geo_columns)):
+        raise ValueError(f'Unknown geography levels: {unknown}')
+    fields = (_default_fields(frame, geo_columns) if fields is None
+              else list(fields))
+    ret: dict[str, pd.DataFrame] = {}
+    current = frame
+    # Finest first, so that each level is built from the last.
+    for level in sorted(levels, key=geo_columns.index, reverse=True):
+        keys = geo_columns[:geo_columns.index(level) + 1]
+        current = aggregate_geography(current, level, fields=fields, geography=keys)
+        ret[level] = current
+    return ret
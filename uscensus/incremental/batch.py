@@ -0,0 +1,237 @@
+"""Run many queries with bounded concurrency.
+
+`run_queries` and `arun_queries` take an iterable of query builders or
+compiled queries, keep at most `concurrency` of them in flight, retry
+transient failures, and yield each result as soon as it is ready.
+The input is consumed lazily, so memory stays bounded however many
+queries there are; `write_queries` and `awrite_queries` hand each
+result to a `ResultSink` (e.g. `uscensus.incremental.parquet.ParquetSink`)
+instead of keeping it.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Self
+
+import httpx
+
+from uscensus.incremental.query import CompiledQuery, QueryBuilderBase
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterable, Iterator
+    from types import TracebackType
+
+    import pandas as pd
+
+    from uscensus.incremental.resultcache import ResultCache
+
+_logger = logging.getLogger(__name__)
+
+QueryLike = QueryBuilderBase | CompiledQuery
+
+
+class ResultSink(ABC):
+    """A destination for query results, used as a context manager."""
+
+    @abstractmethod
+    def write(self, query: QueryLike, frame: pd.DataFrame) -> None:
+        """Store the result `frame` of `query`."""
+
+    def close(self) -> None:
+        """Flush and release any resources."""
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self,
+                 exc_type: type[BaseException] | None,
+                 exc_value: BaseException | None,
+                 traceback: TracebackType | None) -> None:
+        self.close()
+
+
+def _compile(query: QueryLike) -> CompiledQuery:
+    return query if isinstance(query, CompiledQuery) else query.compile()
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(e, httpx.HTTPError)
+
+
+def _run_one(query: QueryLike,
+             retries: int,
+             backoff: float,
+             cache: ResultCache | None) -> pd.DataFrame:
+    compiled = _compile(query)
+    attempt = 0
+    while True:
+        try:
+            return compiled.query(cache=cache)
+        except Exception as e:
+            if attempt >= retries or not _is_retryable(e):
+                raise
+            _logger.warning('Retrying %r after error: %s', compiled, e)
+        time.sleep(backoff * 2**attempt)
+        attempt += 1
+
+
+async def _arun_one(query: QueryLike,
+                    retries: int,
+                    backoff: float,
+                    cache: ResultCache | None) -> pd.DataFrame:
+    compiled = _compile(query)
+    attempt = 0
+    while True:
+        try:
+            if isinstance(compiled.client, httpx.AsyncClient):
+                return await compiled.aquery(cache=cache)
+            return await asyncio.to_thread(compiled.query, cache=cache)
+        except Exception as e:
+            if attempt >= retries or not _is_retryable(e):
+                raise
+            _logger.warning('Retrying %r after error: %s', compiled, e)
+        await asyncio.sleep(backoff * 2**attempt)
+        attempt += 1
+
+
+def run_queries(queries: Iterable[QueryLike],
+                *,
+                concurrency: int = 10,
+                retries: int = 2,
+                backoff: float = 1.0,
+                return_exceptions: bool = False,
+                cache: ResultCache | None = None,
+                ) -> Iterator[tuple[QueryLike, pd.DataFrame | Exception]]:
+    """Run `queries` on a pool of `concurrency` threads, yielding
+    `(query, DataFrame)` pairs in completion order.
+
+    Arguments:
+    ---------
+      * queries: query builders or compiled queries; builders are
+        compiled when they are started.
+      * concurrency: the maximum number of queries in flight.
+      * retries: how many times to retry a query failing with a
+        transient (connection, 429 or 5xx) HTTP error.
+      * backoff: the delay before the first retry, in seconds; it
+        doubles with each further retry.
+      * return_exceptions: if True, yield `(query, exception)` for
+        failed queries; otherwise the first failure is raised.
+      * cache: an optional `ResultCache` to serve results from and
+        add them to.
+
+    The retries here stack with those of `webcache.fetch` and
+    `afetch`, which already try each request 3 times with backoff: a
+    query failing with connection errors is sent up to
+    `3 * (retries + 1)` times.
+
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+    pending: dict[Future, QueryLike] = {}
+    query_iter = iter(queries)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while True:
+            while len(pending) < concurrency:
+                if (query := next(query_iter, None)) is None:
+                    break
+                pending[executor.submit(_run_one, query, retries, backoff, cache)] = query
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                query = pending.pop(future)
+                try:
+                    frame = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    _logger.warning('Query %r failed', query, exc_info=e)
+                    yield query, e
+                    continue
+                yield query, frame
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def arun_queries(queries: Iterable[QueryLike],
+                       *,
+                       concurrency: int = 10,
+                       retries: int = 2,
+                       backoff: float = 1.0,
+                       return_exceptions: bool = False,
+                       cache: ResultCache | None = None,
+                       ) -> AsyncIterator[tuple[QueryLike, pd.DataFrame | Exception]]:
+    """Async version of `run_queries`.
+
+    Queries on a synchronous httpx client are run in threads.
+
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+    pending: dict[asyncio.Task, QueryLike] = {}
+    query_iter = iter(queries)
+    try:
+        while True:
+            while len(pending) < concurrency:
+                if (query := next(query_iter, None)) is None:
+                    break
+                task = asyncio.create_task(_arun_one(query, retries, backoff, cache))
+                pending[task] = query
+            if not pending:
+                return
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                query = pending.pop(task)
+                try:
+                    frame = task.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    _logger.warning('Query %r failed', query, exc_info=e)
+                    yield query, e
+                    continue
+                yield query, frame
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def write_queries(queries: Iterable[QueryLike],
+                  sink: ResultSink,
+                  **kwargs: Any) -> int:
+    """Run `queries` as `run_queries` does, writing each result to
+    `sink` as it arrives, and return the number of results written.
+
+    Keyword arguments are passed to `run_queries`; with
+    `return_exceptions=True`, failed queries are logged and skipped.
+
+    """
+    count = 0
+    for query, frame in run_queries(queries, **kwargs):
+        if isinstance(frame, Exception):
+            continue
+        sink.write(query, frame)
+        count += 1
+    return count
+
+
+async def awrite_queries(queries: Iterable[QueryLike],
+                         sink: ResultSink,
+                         **kwargs: Any) -> int:
+    """Async version of `write_queries`."""
+    count = 0
+    async for query, frame in arun_queries(queries, **kwargs):
+        if isinstance(frame, Exception):
+            continue
+        sink.write(query, frame)
+        count += 1
+    return count
@@ -0,0 +1,233 @@
+"""An inverted index over catalog metadata, so that `filter_datasets`
+can resolve common filters by intersecting postings instead of
+scanning (and fetching metadata for) every dataset.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import re
+from typing import TYPE_CHECKING
+
+from uscensus.incremental.filters import _make_filter_eq_fn, _make_filter_fn
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from uscensus.incremental.wrappers import Dataset
+
+_logger = logging.getLogger(__name__)
+
+FACETS = ('vintage', 'title', 'variable', 'group', 'geography', 'tag')
+
+# The facets whose scanning filters also match texts: variable
+# labels, and group descriptions and universes.
+_TEXT_FACETS = ('variable', 'group')
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _contains(token: str) -> Callable[[str], bool]:
+    return lambda key: token in key
+
+
+class CatalogIndex:
+    """Map facet values to the datasets that carry them.
+
+    The index is built once from a list of `wrappers.Dataset`, which
+    fetches each dataset's linked metadata for the facets requested.
+    Subsequent lookups only touch the in-memory postings.
+
+    Facets:
+      * vintage: the dataset's `c_vintage`.
+      * title: lower-cased word tokens of the dataset title.
+      * variable: variable names.
+      * group: group names.
+      * geography: geography level names.
+      * tag: tags.
+
+    The index also keeps the variable labels and the group
+    descriptions and universes, which the scanning `variable` and
+    `group` filters match along with the names, so that `match` can
+    resolve those filters without changing their results.
+
+    Datasets are identified by their catalog `identifier`.
+
+    """
+
+    datasets: list[Dataset]
+    facets: tuple[str, ...]
+
+    def __init__(self,
+                 datasets: Iterable[Dataset],
+                 *,
+                 facets: Iterable[str] = FACETS) -> None:
+        """Build the index.
+
+        Arguments:
+        ---------
+          * datasets: the datasets to index.
+          * facets: the facets to index. Omitting `variable`, `group`,
+            `geography` or `tag` avoids fetching the corresponding
+            linked documents.
+
+        """
+        self.facets = tuple(facets)
+        unknown = set(self.facets) - set(FACETS)
+        if unknown:
+            raise ValueError(f'Unknown facets: {sorted(unknown)}')
+        self.datasets = list(datasets)
+        self._postings: dict[str, dict[str, set[int]]] = {
+            facet: {} for facet in self.facets
+        }
+        # The values the scanning filters match, i.e. the keys and, for
+        # variables and groups, their texts: by value, and by dataset.
+        self._value_postings: dict[str, dict[str, set[int]]] = {
+            facet: {} if facet in _TEXT_FACETS else self._postings[facet]
+            for facet in self.facets
+        }
+        self._values: dict[str, list[tuple[str, ...]]] = {
+            facet: [] for facet in self.facets
+        }
+        for pos, dataset in enumerate(self.datasets):
+            for facet in self.facets:
+                values = tuple(self._facet_keys(facet, dataset))
+                for key in values:
+                    self._postings[facet].setdefault(key, set()).add(pos)
+                if facet in _TEXT_FACETS:
+                    values += tuple(self._facet_texts(facet, dataset))
+                    for value in values:
+                        self._value_postings[facet].setdefault(value, set()).add(pos)
+                self._values[facet].append(values)
+        self._sorted_keys = {
+            facet: sorted(postings)
+            for facet, postings in self._postings.items()
+        }
+        _logger.debug('Indexed %d datasets', len(self.datasets))
+
+    @staticmethod
+    def _facet_keys(facet: str, dataset: Dataset) -> Iterable[str]:
+        if facet == 'vintage':
+            return [] if dataset.c_vintage is None else [str(dataset.c_vintage)]
+        if facet == 'title':
+            return _tokenize(dataset.title)
+        if facet == 'variable':
+            return dataset.variables.keys()
+        if facet == 'group':
+            return dataset.groups.keys()
+        if facet == 'geography':
+            return dataset.geography.levels.keys()
+        return dataset.tags
+
+    @staticmethod
+    def _facet_texts(facet: str, dataset: Dataset) -> Iterable[str]:
+        if facet == 'variable':
+            return [variable.label for variable in dataset.variables.values()]
+        return [text
+                for group in dataset.groups.values()
+                for text in (group.description, group.universe or '')]
+
+    def _check_facet(self, facet: str) -> dict[str, set[int]]:
+        if facet not in self._postings:
+            raise KeyError(f'Facet "{facet}" is not indexed')
+        return self._postings[facet]
+
+    def lookup(self, facet: str, key: str | int) -> set[int]:
+        """Return the positions of datasets with exactly this facet value."""
+        return set(self._check_facet(facet).get(str(key), ()))
+
+    def lookup_prefix(self, facet: str, prefix: str) -> set[int]:
+        """Return the positions of datasets with a facet value
+        starting with `prefix`.
+        """
+        postings = self._check_facet(facet)
+        keys = self._sorted_keys[facet]
+        ret: set[int] = set()
+        for idx in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if not keys[idx].startswith(prefix):
+                break
+            ret |= postings[keys[idx]]
+        return ret
+
+    def _scan(self,
+              facet: str,
+              predicate: Callable[[str], bool],
+              candidates: set[int] | None) -> set[int]:
+        """Return the positions of datasets with a value satisfying
+        `predicate`, applying it once to each distinct value: of the
+        candidates, or of all the datasets if there are fewer.
+        """
+        self._check_facet(facet)
+        postings = self._value_postings[facet]
+        values: Iterable[str] = postings
+        if candidates is not None:
+            forward = self._values[facet]
+            if sum(len(forward[pos]) for pos in candidates) < len(postings):
+                values = {value for pos in candidates for value in forward[pos]}
+        ret: set[int] = set()
+        for value in values:
+            if predicate(value):
+                ret |= postings[value]
+        return ret
+
+    def match(self,
+              facet: str,
+              filter_spec: Callable[[str], bool] | re.Pattern | str,
+              *,
+              exact: bool = False,
+              candidates: set[int] | None = None) -> set[int]:
+        """Resolve a `filter_datasets` filter for a facet, with the
+        semantics of the scanning filter.
+
+        Arguments:
+        ---------
+          * facet: the facet to filter.
+          * filter_spec: the filter, as for `filter_datasets`.
+          * exact: as for `filter_datasets`; strings then match
+            `variable`, `group` and `tag` keys exactly, or by prefix
+            if they end with `*`, which is looked up in the postings.
+            Geography strings always match level names exactly.
+          * candidates: if given, the positions to filter, e.g. those
+            of the datasets of the wanted vintages.
+
+        Other filters are applied to the facet's distinct values
+        (and, for `variable` and `group`, labels, descriptions and
+        universes) instead of to each dataset; for every facet but
+        `title`, the result is exactly the set of datasets the
+        scanning filter accepts.
+
+        For `title`, the result is a superset: a string matches titles
+        with a word containing each of its tokens, and anything else
+        matches all datasets. Callers should still apply the title
+        filter to the result.
+
+        """
+        if facet == 'title':
+            tokens = (_tokenize(filter_spec)
+                      if isinstance(filter_spec, str) else [])
+            ret = (set.intersection(*(self._scan(facet, _contains(token), candidates)
+                                      for token in tokens))
+                   if tokens else set(range(len(self.datasets))))
+        elif isinstance(filter_spec, str) and facet == 'geography':
+            ret = self.lookup(facet, filter_spec)
+        elif isinstance(filter_spec, str) and exact:
+            ret = (self.lookup_prefix(facet, filter_spec[:-1])
+                   if filter_spec.endswith('*')
+                   else self.lookup(facet, filter_spec))
+        elif facet == 'geography':
+            ret = self._scan(facet, _make_filter_eq_fn(filter_spec), candidates)
+        else:
+            ret = self._scan(facet, _make_filter_fn(filter_spec), candidates)
+        return ret if candidates is None else ret & candidates
+
+    def identifiers(self, positions: Iterable[int]) -> set[str]:
+        """Return the identifiers of the datasets at `positions`."""
+        return {self.datasets[pos].identifier for pos in positions}
+
+    def select(self, positions: Iterable[int]) -> list[Dataset]:
+        """Return the datasets at `positions`, in catalog order."""
+        return [self.datasets[pos] for pos in sorted(positions)]
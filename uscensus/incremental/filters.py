@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 import re
+from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from collections.abc import Callable, Generator, Iterable
 
+    from uscensus.incremental.catalogindex import CatalogIndex
     from uscensus.incremental.wrappers import Dataset
 
 
@@ -30,6 +32,13 @@ def _make_filter_eq_fn(
     return filter_spec
 
 
+def _make_filter_name_fn(filter_spec: str) -> Callable[[str], bool]:
+    if filter_spec.endswith('*'):
+        prefix = filter_spec[:-1]
+        return lambda d: d.startswith(prefix)
+    return lambda d: d == filter_spec
+
+
 def filter_datasets(
         datasets: Iterable[Dataset],
         *,
@@ -40,103 +49,371 @@ def filter_datasets(
         group: Callable[[str], bool] | re.Pattern | str = '',
         tags: Callable[[str], bool] | re.Pattern | str = '',
         geography: Callable[[str], bool] | re.Pattern | str = '',
+        exact: bool = False,
+        index: CatalogIndex | None = None,
 ) -> list[Dataset]:
-    if vintages:
-        datasets = list(filter_datasets_vintages(
-            datasets, vintages))
+    """Filter datasets on their metadata.
+
+    The filters are compiled with `compile_filters`, so the cheap
+    checks on catalog fields run before those that fetch linked
+    documents. The `variable`, `group`, `tags` and `geography` filters
+    fetch linked documents for each dataset they examine; use
+    `Catalog.prefetch` or `Catalog.aprefetch` to fetch these
+    concurrently beforehand.
+
+    String filters match substrings, of variable names or labels and
+    of group names, descriptions or universes for `variable` and
+    `group`, but for `geography`, which matches level names exactly.
+    If `exact`, string `variable`, `group` and `tags` filters instead
+    match names (or tags) exactly, or by prefix if they end with `*`,
+    e.g. `variable='B19013_*'`.
+
+    If `index` is given, the filters on facets it covers are resolved
+    with it, and only the remaining filters scan the surviving
+    datasets, which are matched to the indexed ones by `identifier`.
+    Exact string filters are looked up in its postings; others are
+    applied to its distinct values. The results are the same as
+    without the index; see `CatalogIndex.match`.
+
+    """
+    if index is not None:
+        datasets = _filter_datasets_indexed(
+            datasets, index,
+            vintages=vintages,
+            title=title,
+            variable=variable,
+            group=group,
+            tags=tags,
+            geography=geography,
+            exact=exact,
+        )
+        # Drop the filters the index resolved. Title tokens only
+        # narrow the candidates, so the title scan still runs.
+        if 'vintage' in index.facets:
+            vintages = []
+        if 'variable' in index.facets:
+            variable = ''
+        if 'group' in index.facets:
+            group = ''
+        if 'tag' in index.facets:
+            tags = ''
+        if 'geography' in index.facets:
+            geography = ''
+    plan = compile_filters(
+        vintages=vintages,
+        title=title,
+        description=description,
+        variable=variable,
+        group=group,
+        tags=tags,
+        geography=geography,
+        exact=exact,
+    )
+    return list(plan.filter(datasets))
+
+
+def _filter_datasets_indexed(
+        datasets: Iterable[Dataset],
+        index: CatalogIndex,
+        *,
+        vintages: list[int],
+        title: Callable[[str], bool] | re.Pattern | str,
+        variable: Callable[[str], bool] | re.Pattern | str,
+        group: Callable[[str], bool] | re.Pattern | str,
+        tags: Callable[[str], bool] | re.Pattern | str,
+        geography: Callable[[str], bool] | re.Pattern | str,
+        exact: bool,
+) -> list[Dataset]:
+    # Each filter only examines the candidates the previous ones
+    # left, cheapest first.
+    candidates: set[int] | None = None
+    if vintages and 'vintage' in index.facets:
+        candidates = set().union(
+            *(index.lookup('vintage', vintage) for vintage in vintages))
+    for facet, filter_spec in (('title', title),
+                               ('geography', geography),
+                               ('tag', tags),
+                               ('group', group),
+                               ('variable', variable)):
+        if filter_spec and facet in index.facets:
+            candidates = index.match(facet, filter_spec,
+                                     exact=exact, candidates=candidates)
+
+    if candidates is None:
+        return list(datasets)
+    identifiers = index.identifiers(candidates)
+    return [dataset for dataset in datasets if dataset.identifier in identifiers]
+
+
+# ---------------------------------------------------------------------------
+# Composable filter plans
+# ---------------------------------------------------------------------------
+
+# Relative costs of evaluating a predicate on one dataset. Catalog
+# fields are free; the others fetch a linked document, roughly in
+# order of its size.
+COST_CATALOG = 0
+COST_GEOGRAPHY = 10
+COST_TAGS = 10
+COST_GROUPS = 20
+COST_VARIABLES = 30
+
+
+class DatasetFilter(ABC):
+    """A predicate on datasets, composable with `&`, `|` and `~`.
+
+    Conjunctions and disjunctions evaluate their parts cheapest
+    first and short-circuit, so expensive predicates (those that fetch
+    linked documents) only run on datasets that survive cheap ones.
+
+    """
+
+    cost: int
+
+    @abstractmethod
+    def __call__(self, dataset: Dataset) -> bool:
+        """Return whether `dataset` satisfies the filter."""
+
+    def filter(self, datasets: Iterable[Dataset]) -> Generator[Dataset, None, None]:
+        """Lazily yield the datasets satisfying the filter."""
+        for dataset in datasets:
+            if self(dataset):
+                yield dataset
+
+    def __and__(self, other: DatasetFilter) -> DatasetFilter:
+        return AllOf(self, other)
+
+    def __or__(self, other: DatasetFilter) -> DatasetFilter:
+        return AnyOf(self, other)
+
+    def __invert__(self) -> DatasetFilter:
+        return Not(self)
+
+
+class Predicate(DatasetFilter):
+    """A single named predicate with a fixed cost."""
+
+    def __init__(self, name: str, fn: Callable[[Dataset], bool], cost: int) -> None:
+        self.name = name
+        self.fn = fn
+        self.cost = cost
+
+    def __call__(self, dataset: Dataset) -> bool:
+        return self.fn(dataset)
+
+    def __repr__(self) -> str:
+        return f'Predicate({self.name!r}, cost={self.cost})'
+
+
+class AllOf(DatasetFilter):
+    """Conjunction of filters. An empty conjunction matches everything."""
+
+    parts: tuple[DatasetFilter, ...]
+
+    def __init__(self, *parts: DatasetFilter) -> None:
+        flat: list[DatasetFilter] = []
+        for part in parts:
+            flat.extend(part.parts if isinstance(part, AllOf) else [part])
+        self.parts = tuple(sorted(flat, key=lambda part: part.cost))
+        self.cost = sum(part.cost for part in self.parts)
+
+    def __call__(self, dataset: Dataset) -> bool:
+        return all(part(dataset) for part in self.parts)
+
+    def __repr__(self) -> str:
+        return f'AllOf{self.parts!r}'
+
+
+class AnyOf(DatasetFilter):
+    """Disjunction of filters. An empty disjunction matches nothing."""
+
+    parts: tuple[DatasetFilter, ...]
+
+    def __init__(self, *parts: DatasetFilter) -> None:
+        flat: list[DatasetFilter] = []
+        for part in parts:
+            flat.extend(part.parts if isinstance(part, AnyOf) else [part])
+        self.parts = tuple(sorted(flat, key=lambda part: part.cost))
+        self.cost = sum(part.cost for part in self.parts)
+
+    def __call__(self, dataset: Dataset) -> bool:
+        return any(part(dataset) for part in self.parts)
+
+    def __repr__(self) -> str:
+        return f'AnyOf{self.parts!r}'
+
+
+class Not(DatasetFilter):
+    """Negation of a filter."""
+
+    def __init__(self, part: DatasetFilter) -> None:
+        self.part = part
+        self.cost = part.cost
+
+    def __call__(self, dataset: Dataset) -> bool:
+        return not self.part(dataset)
+
+    def __repr__(self) -> str:
+        return f'Not({self.part!r})'
+
+
+def _matches_variables(dataset: Dataset, filter_fn: Callable[[str], bool]) -> bool:
+    return any(filter_fn(variable_name) or filter_fn(variable.label)
+               for variable_name, variable in dataset.variables.items())
+
+
+def _matches_groups(dataset: Dataset, filter_fn: Callable[[str], bool]) -> bool:
+    return any(filter_fn(group_name) or filter_fn(group.description) or
+               filter_fn(group.universe or '')
+               for group_name, group in dataset.groups.items())
+
+
+def _matches_tags(dataset: Dataset, filter_fn: Callable[[str], bool]) -> bool:
+    return any(filter_fn(tag) for tag in dataset.tags)
+
+
+def _matches_geography(dataset: Dataset, filter_fn: Callable[[str], bool]) -> bool:
+    return any(filter_fn(level) for level in dataset.geography.levels)
+
+
+def vintages_filter(vintages: Iterable[int]) -> Predicate:
+    vintage_set = set(vintages)
+    return Predicate('vintages', lambda d: d.c_vintage in vintage_set,
+                     COST_CATALOG)
+
+
+def title_filter(filter_: Callable[[str], bool] | re.Pattern | str) -> Predicate:
+    filter_fn = _make_filter_fn(filter_)
+    return Predicate('title', lambda d: filter_fn(d.title), COST_CATALOG)
+
+
+def description_filter(filter_: Callable[[str], bool] | re.Pattern | str) -> Predicate:
+    filter_fn = _make_filter_fn(filter_)
+    return Predicate('description', lambda d: filter_fn(d.description),
+                     COST_CATALOG)
+
+
+def variables_filter(filter_: Callable[[str], bool] | re.Pattern | str,
+                     *,
+                     exact: bool = False) -> Predicate:
+    if exact and isinstance(filter_, str):
+        if not filter_.endswith('*'):
+            name = filter_
+            return Predicate('variable', lambda d: name in d.variables,
+                             COST_VARIABLES)
+        name_fn = _make_filter_name_fn(filter_)
+        return Predicate('variable', lambda d: any(map(name_fn, d.variables)),
+                         COST_VARIABLES)
+    filter_fn = _make_filter_fn(filter_)
+    return Predicate('variable', lambda d: _matches_variables(d, filter_fn),
+                     COST_VARIABLES)
+
+
+def groups_filter(filter_: Callable[[str], bool] | re.Pattern | str,
+                  *,
+                  exact: bool = False) -> Predicate:
+    if exact and isinstance(filter_, str):
+        name_fn = _make_filter_name_fn(filter_)
+        return Predicate('group', lambda d: any(map(name_fn, d.groups)),
+                         COST_GROUPS)
+    filter_fn = _make_filter_fn(filter_)
+    return Predicate('group', lambda d: _matches_groups(d, filter_fn),
+                     COST_GROUPS)
+
+
+def tags_filter(filter_: Callable[[str], bool] | re.Pattern | str,
+                *,
+                exact: bool = False) -> Predicate:
+    filter_fn = (_make_filter_name_fn(filter_) if exact and isinstance(filter_, str)
+                 else _make_filter_fn(filter_))
+    return Predicate('tags', lambda d: _matches_tags(d, filter_fn), COST_TAGS)
+
+
+def geography_filter(filter_: Callable[[str], bool] | re.Pattern | str) -> Predicate:
+    filter_fn = _make_filter_eq_fn(filter_)
+    return Predicate('geography', lambda d: _matches_geography(d, filter_fn),
+                     COST_GEOGRAPHY)
+
+
+def compile_filters(
+        *,
+        vintages: Iterable[int] = (),
+        title: Callable[[str], bool] | re.Pattern | str = '',
+        description: Callable[[str], bool] | re.Pattern | str = '',
+        variable: Callable[[str], bool] | re.Pattern | str = '',
+        group: Callable[[str], bool] | re.Pattern | str = '',
+        tags: Callable[[str], bool] | re.Pattern | str = '',
+        geography: Callable[[str], bool] | re.Pattern | str = '',
+        exact: bool = False,
+) -> AllOf:
+    """Compile `filter_datasets`-style arguments into a reusable
+    conjunction, ordered cheapest first.
+
+    The result can be combined with other filters, e.g.
+    `compile_filters(vintages=[2022]) & ~tags_filter('housing')`.
+
+    """
+    parts: list[DatasetFilter] = []
+    if vintages := list(vintages):
+        parts.append(vintages_filter(vintages))
     if title:
-        datasets = list(filter_datasets_title(
-            datasets, title))
+        parts.append(title_filter(title))
     if description:
-        datasets = list(filter_datasets_description(
-            datasets, description))
+        parts.append(description_filter(description))
     if variable:
-        datasets = list(filter_datasets_variables(
-            datasets, variable))
+        parts.append(variables_filter(variable, exact=exact))
     if group:
-        datasets = list(filter_datasets_groups(
-            datasets, group))
+        parts.append(groups_filter(group, exact=exact))
     if tags:
-        datasets = list(filter_datasets_tags(
-            datasets, tags))
+        parts.append(tags_filter(tags, exact=exact))
     if geography:
-        datasets = list(filter_datasets_geography(
-            datasets, geography))
-    return list(datasets)
+        parts.append(geography_filter(geography))
+    return AllOf(*parts)
 
 
 def filter_datasets_vintages(
         datasets: Iterable[Dataset],
         vintages: list[int],
 ) -> Generator[Dataset, None, None]:
-    for dataset in datasets:
-        if dataset.c_vintage in vintages:
-            yield dataset
+    return vintages_filter(vintages).filter(datasets)
 
 
 def filter_datasets_title(
         datasets: Iterable[Dataset],
         filter_: Callable[[str], bool] | re.Pattern | str,
 ) -> Generator[Dataset, None, None]:
-    filter_fn = _make_filter_fn(filter_)
-    for dataset in datasets:
-        if filter_fn(dataset.title):
-            yield dataset
+    return title_filter(filter_).filter(datasets)
 
 
 def filter_datasets_description(
         datasets: Iterable[Dataset],
         filter_: Callable[[str], bool] | re.Pattern | str,
 ) -> Generator[Dataset, None, None]:
-    filter_fn = _make_filter_fn(filter_)
-    for dataset in datasets:
-        if filter_fn(dataset.description):
-            yield dataset
+    return description_filter(filter_).filter(datasets)
 
 
 def filter_datasets_variables(
         datasets: Iterable[Dataset],
         filter_: Callable[[str], bool] | re.Pattern | str,
 ) -> Generator[Dataset, None, None]:
-    filter_fn = _make_filter_fn(filter_)
-    for dataset in datasets:
-        for variable_name, variable in dataset.variables.items():
-            if filter_fn(variable_name) or filter_fn(variable.label):
-                yield dataset
-                break
+    return variables_filter(filter_).filter(datasets)
 
 
 def filter_datasets_groups(
         datasets: Iterable[Dataset],
         filter_: Callable[[str], bool] | re.Pattern | str,
 ) -> Generator[Dataset, None, None]:
-    filter_fn = _make_filter_fn(filter_)
-    for dataset in datasets:
-        for group_name, group in dataset.groups.items():
-            if (filter_fn(group_name) or filter_fn(group.description) or
-                    filter_fn(group.universe)):
-                yield dataset
-                break
+    return groups_filter(filter_).filter(datasets)
 
 
 def filter_datasets_tags(
         datasets: Iterable[Dataset],
         filter_: Callable[[str], bool] | re.Pattern | str,
 ) -> Generator[Dataset, None, None]:
-    filter_fn = _make_filter_fn(filter_)
-    for dataset in datasets:
-        for tag in dataset.tags:
-            if filter_fn(tag):
-                yield dataset
-                break
+    return tags_filter(filter_).filter(datasets)
 
 
 def filter_datasets_geography(
         datasets: Iterable[Dataset],
         filter_: Callable[[str], bool] | re.Pattern | str) -> Generator[Dataset, None, None]:
-    filter_fn = _make_filter_eq_fn(filter_)
-    for dataset in datasets:
-        for level in dataset.geography.levels:
-            if filter_fn(level):
-                yield dataset
-                break
+    return geography_filter(filter_).filter(datasets)
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import datetime
+import types
+from collections.abc import Callable, Iterator, Mapping, MutableMapping
 from enum import Enum
-from typing import Annotated
+from functools import cache
+from typing import Annotated, Any, TypeVar, Union, get_args, get_origin
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -160,3 +163,172 @@ class Catalog(USCensusBaseModel):
     conformsTo: str
     describedBy: str
     dataset: list[Dataset]
+
+
+M = TypeVar('M', bound=BaseModel)
+
+Converter = Callable[[Any], Any]
+
+
+# The Census documents encode some numbers and booleans as strings,
+# which validation coerces.
+def _to_int(value: Any) -> int:
+    return value if type(value) is int else int(value)
+
+
+def _to_float(value: Any) -> float:
+    return value if type(value) is float else float(value)
+
+
+def _to_number(value: Any) -> int | float:
+    if type(value) is int or type(value) is float:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _to_bool(value: Any) -> bool:
+    if type(value) is bool:
+        return value
+    if isinstance(value, str):
+        return value.lower() in ('true', '1', 'yes', 'on', 't', 'y')
+    return bool(value)
+
+
+_SCALAR_CONVERTERS: dict[Any, Converter] = {
+    int: _to_int,
+    float: _to_float,
+    bool: _to_bool,
+    int | float: _to_number,
+}
+
+
+def _converter(annotation: Any) -> Converter | None:
+    """Return a function rebuilding a trusted JSON value of type
+    `annotation`, or None if the JSON value can be used as is.
+    """
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is Annotated:
+        return _converter(args[0])
+    if origin is Union or origin is types.UnionType:
+        candidates = [arg for arg in args if arg is not type(None)]
+        if len(candidates) == 1:
+            return _converter(candidates[0])
+        return _SCALAR_CONVERTERS.get(Union[tuple(candidates)])  # noqa: UP007
+    if origin is list:
+        if (item_fn := _converter(args[0])) is None:
+            return None
+        return lambda value: [item_fn(item) for item in value]
+    if origin is dict:
+        if (value_fn := _converter(args[1])) is None:
+            return None
+        return lambda value: {key: value_fn(item) for key, item in value.items()}
+    if not isinstance(annotation, type):
+        return None
+    if annotation in _SCALAR_CONVERTERS:
+        return _SCALAR_CONVERTERS[annotation]
+    if issubclass(annotation, BaseModel):
+        return lambda value: construct(annotation, value)
+    if issubclass(annotation, Enum):
+        return annotation
+    if issubclass(annotation, datetime.datetime):
+        return datetime.datetime.fromisoformat
+    if issubclass(annotation, datetime.date):
+        return datetime.date.fromisoformat
+    return None
+
+
+@cache
+def _construct_plan(cls: type[BaseModel]) -> list[tuple[str, str, Converter | None]]:
+    return [
+        (name, field.alias or name, _converter(field.annotation))
+        for name, field in cls.model_fields.items()
+    ]
+
+
+@cache
+def scalar_fields(cls: type[BaseModel]) -> dict[str, tuple[str, Any, Converter | None]]:
+    """Map the names of `cls` fields holding plain JSON values (strings,
+    numbers, booleans or lists of them) to their JSON key, default and
+    scalar converter, so they can be read from trusted raw data
+    without building the model.
+    """
+    return {
+        name: (alias, cls.model_fields[name].get_default(call_default_factory=True), convert)
+        for name, alias, convert in _construct_plan(cls)
+        if convert is None or convert in _SCALAR_CONVERTERS.values()
+    }
+
+
+def construct(cls: type[M], data: Mapping[str, Any]) -> M:
+    """Build a `cls` instance from trusted data, such as the JSON-mode
+    dump of a previously validated model, without validating it.
+
+    Unlike `BaseModel.model_construct`, this rebuilds nested models,
+    enums and dates.
+
+    """
+    values = {}
+    for name, alias, convert in _construct_plan(cls):
+        if alias in data:
+            value = data[alias]
+        elif name in data:
+            value = data[name]
+        else:
+            continue
+        values[name] = value if convert is None or value is None else convert(value)
+    return cls.model_construct(**values)
+
+
+class LazyModelMap(MutableMapping[str, M]):
+    """A mapping of names to `cls` models that keeps the raw parsed
+    JSON values and builds each model on first access.
+
+    Arguments:
+    ---------
+      * raw: the parsed JSON objects, keyed by name.
+      * cls: the model class of the values.
+      * validate: if False, trust the raw values and build models
+        with `construct` instead of validating them.
+
+    """
+
+    def __init__(self,
+                 raw: Mapping[str, Any],
+                 cls: type[M],
+                 *,
+                 validate: bool = True) -> None:
+        # Values are raw JSON objects until materialized in place,
+        # which preserves the original ordering.
+        self._items: dict[str, Any] = dict(raw)
+        self._cls = cls
+        self._validate = validate
+
+    def __getitem__(self, key: str) -> M:
+        value = self._items[key]
+        if not isinstance(value, BaseModel):
+            value = (self._cls.model_validate(value) if self._validate
+                     else construct(self._cls, value))
+            self._items[key] = value
+        return value
+
+    def __setitem__(self, key: str, value: M) -> None:
+        self._items[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._items[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self._cls.__name__}, {len(self)} items)'
@@ -0,0 +1,221 @@
+"""Query the same variables across several vintages of a dataset.
+
+`panel_query` (and `apanel_query`) resolve one dataset per vintage,
+check that the requested variables exist in each vintage before any
+data is requested, run the per-vintage queries concurrently with
+`uscensus.incremental.batch`, and combine the results into one
+DataFrame, either long (a `vintage` column) or wide (one column per
+field and vintage).
+
+The variables of each vintage are checked against its `variables`
+property, so a catalog warmed with `Catalog.prefetch` or
+`Catalog.aprefetch` needs no further metadata requests.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Literal, cast
+
+import httpx
+import pandas as pd
+
+from uscensus.incremental.batch import arun_queries, run_queries
+from uscensus.incremental.filters import filter_datasets
+from uscensus.incremental.query import QueryBuilder, _base_field
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+
+    from uscensus.incremental.query import CompiledQuery, GeoIn
+    from uscensus.incremental.wrappers import Dataset
+
+_logger = logging.getLogger(__name__)
+
+VINTAGE = 'vintage'
+
+PanelShape = Literal['long', 'wide']
+OnMissing = Literal['raise', 'drop']
+
+
+def resolve_vintages(datasets: Iterable[Dataset],
+                     vintages: Iterable[int],
+                     **filters: Any) -> dict[int, Dataset]:
+    """Find the one dataset matching `filters` for each vintage.
+
+    Arguments:
+    ---------
+      * datasets: the datasets to search, e.g. `Catalog.dataset`.
+      * vintages: the vintages wanted.
+      * filters: passed to `filter_datasets`, e.g. `title`; they must
+        narrow each vintage to a single dataset.
+
+    Returns a mapping of each vintage to its dataset, in the order of
+    `vintages`.
+
+    """
+    vintages = list(vintages)
+    matches: dict[int, list[Dataset]] = {vintage: [] for vintage in vintages}
+    for dataset in filter_datasets(datasets, vintages=vintages, **filters):
+        matches[dataset.c_vintage].append(dataset)
+    if missing := [vintage for vintage, found in matches.items() if not found]:
+        raise ValueError(f'No dataset found for vintages {missing}')
+    if ambiguous := {vintage: found for vintage, found in matches.items() if len(found) > 1}:
+        raise ValueError(f'Several datasets found for vintages: {ambiguous}')
+    return {vintage: found[0] for vintage, found in matches.items()}
+
+
+def _available_fields(dataset: Dataset, fields: Sequence[str]) -> list[str]:
+    variables = dataset.variables
+    return [field for field in fields
+            if _base_field(field) in variables or field in variables]
+
+
+def _panel_queries(datasets: Mapping[int, Dataset],
+                   fields: Sequence[str],
+                   geo_for: str | None,
+                   geo_for_values: Sequence[str],
+                   geo_in: GeoIn | None,
+                   predicates: Mapping[str, Sequence[Any]] | None,
+                   on_missing: OnMissing) -> dict[int, CompiledQuery]:
+    available = {vintage: _available_fields(dataset, fields)
+                 for vintage, dataset in datasets.items()}
+    # Report every missing field before issuing any query.
+    missing = {vintage: [field for field in fields if field not in found]
+               for vintage, found in available.items()
+               if len(found) < len(fields)}
+    if missing:
+        if on_missing == 'raise':
+            raise ValueError(f'Fields not available in vintages: {missing}')
+        _logger.info('Dropping fields not available in vintages: %s', missing)
+
+    queries = {}
+    for vintage, dataset in datasets.items():
+        if not available[vintage]:
+            _logger.warning('No requested fields available in vintage %s', vintage)
+            continue
+        builder = QueryBuilder(dataset).set_fields(*available[vintage])
+        if geo_for:
+            builder.set_geo_for(geo_for, *geo_for_values)
+        for level, values in (geo_in or {}).items():
+            builder.add_geo_in(level, *values)
+        for field, values in (predicates or {}).items():
+            builder.add_predicate(field, *values)
+        queries[vintage] = builder.compile()
+    return queries
+
+
+def _combine(frames: Mapping[int, pd.DataFrame],
+             fields: Sequence[str],
+             shape: PanelShape) -> pd.DataFrame:
+    # Columns numeric in any vintage are made numeric in all, so that
+    # e.g. a field missing from one vintage becomes NaN rather than
+    # turning the column into objects.
+    numeric = {column for frame in frames.values()
+               for column in frame.columns
+               if pd.api.types.is_numeric_dtype(frame[column])}
+    ret = pd.concat([frame.assign(**{VINTAGE: vintage})
+                     for vintage, frame in frames.items()],
+                    ignore_index=True)
+    for column in ret.columns:
+        if column in numeric and not pd.api.types.is_numeric_dtype(ret[column]):
+            ret[column] = pd.to_numeric(ret[column], errors='coerce')
+    fields = [field for field in fields if field in ret.columns]
+    others = [column for column in ret.columns
+              if column not in fields and column != VINTAGE]
+    if shape == 'long':
+        return ret[[VINTAGE, *fields, *others]]
+    # Everything but the fields (i.e. the geography) identifies a row.
+    if ret.duplicated([*others, VINTAGE]).any():
+        raise ValueError('Cannot make a wide panel: several rows share a '
+                         'geography and vintage; use shape="long"')
+    if not others:
+        # A single row, e.g. for the dataset's default geography.
+        return ret.set_index(VINTAGE)[fields].unstack().to_frame().T.infer_objects()
+    return ret.pivot(index=others, columns=VINTAGE, values=fields)
+
+
+def _check_args(shape: str, kwargs: Mapping[str, Any]) -> None:
+    if shape not in ('long', 'wide'):
+        raise ValueError(f'Unknown panel shape "{shape}"')
+    if kwargs.get('return_exceptions'):
+        raise ValueError('Panel queries do not support return_exceptions')
+
+
+def panel_query(datasets: Mapping[int, Dataset],
+                fields: Sequence[str],
+                *,
+                geo_for: str | None = None,
+                geo_for_values: Sequence[str] = ('*',),
+                geo_in: GeoIn | None = None,
+                predicates: Mapping[str, Sequence[Any]] | None = None,
+                on_missing: OnMissing = 'raise',
+                shape: PanelShape = 'long',
+                **kwargs: Any) -> pd.DataFrame:
+    """Query `fields` for the same geography in each vintage.
+
+    Arguments:
+    ---------
+      * datasets: the dataset for each vintage, as returned by
+        `resolve_vintages`.
+      * fields: the variables to request.
+      * geo_for, geo_for_values, geo_in: the geography, as for
+        `QueryBuilder.set_geo_for` and `add_geo_in`; the dataset's
+        default geography if `geo_for` is not given.
+      * predicates: predicate values by field, as for
+        `QueryBuilder.add_predicate`.
+      * on_missing: `raise` to fail if a field is missing from any
+        vintage, or `drop` to not request it there, leaving its
+        values missing.
+      * shape: `long` for one row per geography and vintage with a
+        `vintage` column, or `wide` for one row per geography with
+        (field, vintage) columns.
+      * kwargs: passed to `run_queries`, e.g. `concurrency` or `cache`;
+        `return_exceptions` is not supported.
+
+    A `wide` panel needs a single row per geography and vintage.
+
+    """
+    _check_args(shape, kwargs)
+    queries = _panel_queries(datasets, fields, geo_for, geo_for_values, geo_in,
+                             predicates, on_missing)
+    vintages = {id(compiled): vintage for vintage, compiled in queries.items()}
+    # Failures are raised, as return_exceptions is rejected.
+    results = {vintages[id(compiled)]: cast(pd.DataFrame, frame)
+               for compiled, frame in run_queries(queries.values(), **kwargs)}
+    return _combine({vintage: results[vintage] for vintage in queries}, fields, shape)
+
+
+async def _awarm(dataset: Dataset) -> None:
+    # Query builders validate against the synchronous properties, so
+    # fill them from the async ones.
+    if isinstance(dataset.client, httpx.AsyncClient):
+        for field in ('variables', 'geography'):
+            if field not in dataset.__dict__:
+                dataset.__dict__.setdefault(field, await getattr(dataset, f'a{field}'))
+
+
+async def apanel_query(datasets: Mapping[int, Dataset],
+                       fields: Sequence[str],
+                       *,
+                       geo_for: str | None = None,
+                       geo_for_values: Sequence[str] = ('*',),
+                       geo_in: GeoIn | None = None,
+                       predicates: Mapping[str, Sequence[Any]] | None = None,
+                       on_missing: OnMissing = 'raise',
+                       shape: PanelShape = 'long',
+                       **kwargs: Any) -> pd.DataFrame:
+    """Async version of `panel_query`.
+
+    The metadata of each vintage is fetched concurrently if not
+    already cached.
+
+    """
+    _check_args(shape, kwargs)
+    await asyncio.gather(*(_awarm(dataset) for dataset in datasets.values()))
+    queries = _panel_queries(datasets, fields, geo_for, geo_for_values, geo_in,
+                             predicates, on_missing)
+    vintages = {id(compiled): vintage for vintage, compiled in queries.items()}
+    results = {vintages[id(compiled)]: cast(pd.DataFrame, frame)
+               async for compiled, frame in arun_queries(queries.values(), **kwargs)}
+    return _combine({vintage: results[vintage] for vintage in queries}, fields, shape)
@@ -0,0 +1,71 @@
+"""Parquet output for query results.
+
+Requires the `pyarrow` package.
+"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from uscensus.incremental.batch import QueryLike, ResultSink
+from uscensus.util.errors import CensusError
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+
+class ParquetSink(ResultSink):
+    """Append query results to a single Parquet file, one row group
+    per result, so that memory use doesn't grow with the number of
+    results.
+
+    All results must have the same columns; the schema is taken from
+    the first result, and later results are converted to it. Query
+    results with MultiIndex columns (e.g. from
+    `TabulationQueryBuilder`) must be flattened first.
+
+    Arguments:
+    ---------
+      * path: the Parquet file to write.
+      * preserve_index: whether to store the DataFrame index.
+      * writer_args: passed to `pyarrow.parquet.ParquetWriter`, e.g.
+        `compression`.
+
+    """
+
+    def __init__(self,
+                 path: str,
+                 *,
+                 preserve_index: bool = False,
+                 **writer_args: Any) -> None:
+        self.path = path
+        self.preserve_index = preserve_index
+        self._writer_args = {'compression': 'zstd'} | writer_args
+        self._writer: pq.ParquetWriter | None = None
+        self.rows = 0
+
+    def write(self, query: QueryLike, frame: pd.DataFrame) -> None:
+        if self._writer is None:
+            table = pa.Table.from_pandas(frame, preserve_index=self.preserve_index)
+            self._writer = pq.ParquetWriter(self.path, table.schema, **self._writer_args)
+        else:
+            try:
+                table = pa.Table.from_pandas(frame,
+                                             schema=self._writer.schema,
+                                             preserve_index=self.preserve_index)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, KeyError) as e:
+                raise CensusError(
+                    f'Result of {query!r} does not match the Parquet schema') from e
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            _logger.debug('Wrote %d rows to %s', self.rows, self.path)
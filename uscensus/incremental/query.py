@@ -1,23 +1,31 @@
 from __future__ import annotations
 
-import json
 import logging
 import re
 from abc import ABC, abstractmethod
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from functools import partial
+from types import MappingProxyType
 from typing import TYPE_CHECKING
 
+import httpx
+import numpy as np
 import pandas as pd
 
 from uscensus.incremental.model import USCensusBaseModel
+from uscensus.util.requestkey import canonical_fields
 from uscensus.util.webcache import afetch, fetch
 
 if TYPE_CHECKING:
     from uscensus.incremental.model import GeographyLevel, Variable
+    from uscensus.incremental.resultcache import ResultCache
     from uscensus.incremental.wrappers import Dataset
 
 _logger = logging.getLogger(__name__)
 
+# The name of the cell value column of tidy tabulation results.
+TIDY_VALUE = 'value'
+
 
 def _base_field(field_name: str) -> str:
     if field_name[-1] == 'A':
@@ -66,6 +74,305 @@ def _all_string(values: Iterable[PredicateScalarValue]) -> bool:
     return all(type(value) in [str, int, float] for value in values)
 
 
+GeoIn = Mapping[str, Sequence[str]]
+
+
+def _validate_geo(dataset: Dataset,
+                  geo_for_level: str,
+                  geo_for_values: Sequence[str],
+                  geo_in: GeoIn) -> GeographyLevel | None:
+    """Ensure that all required geographic information has been
+    set and is consistent, and return the matching geography level,
+    if any.
+
+    """
+    # Is `for` required but missing?
+    if not geo_for_values and not dataset.geography.has_default:
+        raise ValueError('Geography is required')
+    # Is `for` using a default?
+    if not geo_for_level:
+        return None
+
+    geo_level = _determine_geo_level(dataset, geo_for_level, geo_for_values, geo_in)
+
+    # Check invariants for values for `in` constraints that don't
+    # depend on order.
+    for level_id, values in geo_in.items():
+        if level_id not in geo_level.requires:
+            raise ValueError(f'Unexpected "in" geography "{level_id}"')
+        if '*' in values and level_id not in geo_level.wildcard:
+            raise ValueError(
+                f'Unexpected wildcard in "in" geography "{level_id}"')
+        if len(values) > 1 and list(geo_for_values) != ['*']:
+            raise ValueError(
+                'Multiple "in" geographies with non-wildcard "for"')
+
+    # Validate that multi-valued `in` items don't violate
+    # constraints implied by geo level ordering. Note that we
+    # can't determine this until both `in` and `for` are set.
+    if len(geo_level.requires) > 1:
+        # Get the in constraints in required geo order
+        ordered_values = [list(geo_in[level_id])
+                          for level_id in geo_level.requires
+                          if level_id in geo_in]
+        for idx, cur_level_values in enumerate(ordered_values):
+            following_level_values = ordered_values[idx+1:]
+            if following_level_values:
+                if (len(cur_level_values) > 1 and
+                    not all(x == ['*'] for x in following_level_values)):
+                    raise ValueError(
+                        'Cannot specify non-wildcard "in" constraint '
+                        'below multi-valued level')
+                if ('*' in cur_level_values and
+                    not all(x == ['*'] for x in following_level_values)):
+                    raise ValueError(
+                        'Cannot specify non-wildcard "in" constraint below '
+                        'level with wildcard')
+    return geo_level
+
+
+def _order_geo_in(geo_in: GeoIn, geo_level: GeographyLevel | None) -> dict[str, Sequence[str]]:
+    """Order the "in" geographies as `geo_level` requires them, so
+    that equivalent queries have identical parameters.
+    """
+    if geo_level is None:
+        return dict(geo_in)
+    order = {level_id: pos for pos, level_id in enumerate(geo_level.requires)}
+    return dict(sorted(geo_in.items(), key=lambda item: order.get(item[0], len(order))))
+
+
+def _determine_geo_level(dataset: Dataset,
+                         geo_for_level: str,
+                         geo_for_values: Sequence[str],
+                         geo_in: GeoIn) -> GeographyLevel:
+    # Find this `for` geography's level descriptor
+    errors: list[ValueError] = []
+    geo_levels = dataset.geography.levels.get(geo_for_level)
+    if not geo_levels:
+        raise ValueError(f'No levels found for geography {geo_for_level}')
+    for geo_level in geo_levels:
+        try:
+            _validate_geo_level(geo_level, geo_for_values, geo_in)
+            return geo_level
+        except ValueError as e:
+            errors.append(e)
+    raise ExceptionGroup('No matching geo level', errors)
+
+
+def _validate_geo_level(geo_level: GeographyLevel,
+                        geo_for_values: Sequence[str],
+                        geo_in: GeoIn) -> None:
+    # Does it have any required `in` geographies?
+    for level_id in geo_level.requires:
+        # Are they missing?
+        if level_id not in geo_in:
+            # Are they optional when `for` is a wildcard?
+            if ('*' in geo_for_values and
+                geo_level.optionalWithWCFor == level_id):
+                continue
+            raise ValueError(
+                f'Missing required "in" geography "{level_id}" for '
+                f'level {geo_level}')
+
+
+def _geo_values_shape(values: Sequence[str]) -> str:
+    if not values:
+        return ''
+    if '*' in values:
+        return '*'
+    return 'many' if len(values) > 1 else 'one'
+
+
+def _geo_shape(geo_for_values: Sequence[str], geo_in: GeoIn) -> tuple:
+    """Summarize the geography values as far as `_validate_geo`
+    depends on them, so that values with the same shape needn't be
+    validated again.
+    """
+    return (_geo_values_shape(geo_for_values),
+            tuple((level, _geo_values_shape(values))
+                  for level, values in geo_in.items()))
+
+
+def _make_geo_params(geo_for_level: str,
+                     geo_for_values: Sequence[str],
+                     geo_in: GeoIn) -> dict[str, str]:
+    params = {
+        'for': f'{geo_for_level}:{",".join(geo_for_values)}',
+    }
+    if geo_in:
+        params['in'] = ' '.join((f'{level}:{",".join(values)}'
+                                 for level, values in geo_in.items()))
+    return params
+
+
+DataFrameMaker = Callable[[list], pd.DataFrame]
+FrameArranger = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+class CompiledQuery:
+    """An immutable, validated query, as returned by
+    `QueryBuilderBase.compile`.
+
+    The request parameters and result conversion are computed once,
+    so a compiled query can be issued repeatedly at little cost, and
+    `bind` derives a query for other geography values without
+    rebuilding it.
+
+    """
+
+    __slots__ = ('_arrange', '_base_params', '_dataset', '_geo_for_level',
+                 '_geo_for_values', '_geo_in', '_make_dataframe', '_params', '_shape')
+
+    def __init__(self,
+                 dataset: Dataset,
+                 geo_for_level: str,
+                 geo_for_values: Sequence[str],
+                 geo_in: GeoIn,
+                 params: Mapping[str, str],
+                 make_dataframe: DataFrameMaker,
+                 arrange: FrameArranger | None = None) -> None:
+        """Arguments:
+        ---------
+          * dataset: the dataset to query.
+          * geo_for_level, geo_for_values, geo_in: the validated
+            geography.
+          * params: the other request query parameters.
+          * make_dataframe: converts the API JSON response into a
+            DataFrame.
+          * arrange: puts the columns (or index levels) of a result
+            for an equivalent query in the order this query requested
+            them.
+
+        """
+        self._dataset = dataset
+        self._geo_for_level = geo_for_level
+        self._geo_for_values = tuple(geo_for_values)
+        self._geo_in = MappingProxyType(
+            {level: tuple(values) for level, values in geo_in.items()})
+        self._shape = _geo_shape(self._geo_for_values, self._geo_in)
+        self._base_params = MappingProxyType(dict(params))
+        # Geography first, as in the parameters built by the query
+        # builders.
+        self._params = MappingProxyType(
+            _make_geo_params(geo_for_level, self._geo_for_values, self._geo_in)
+            | self._base_params)
+        self._make_dataframe = make_dataframe
+        self._arrange = arrange
+
+    @property
+    def dataset(self) -> Dataset:
+        return self._dataset
+
+    @property
+    def url(self) -> str:
+        return self._dataset.api_url
+
+    @property
+    def client(self) -> httpx.AsyncClient | httpx.Client:
+        return self._dataset.client
+
+    @property
+    def params(self) -> Mapping[str, str]:
+        """The request query parameters."""
+        return self._params
+
+    @property
+    def geo_for_values(self) -> tuple[str, ...]:
+        return self._geo_for_values
+
+    @property
+    def geo_in(self) -> Mapping[str, tuple[str, ...]]:
+        return self._geo_in
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} {self.url} {dict(self._params)}>'
+
+    def arrange(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Return `frame`, the result of this or an equivalent query
+        (e.g. from a cache), with its columns in the requested order.
+        """
+        return frame if self._arrange is None else self._arrange(frame)
+
+    def bind(self,
+             geo_for_values: Sequence[str] | None = None,
+             geo_in: GeoIn | None = None) -> CompiledQuery:
+        """Return a copy of this query for other geography values.
+
+        Arguments:
+        ---------
+          * geo_for_values: new values for the "for" geography level,
+            or None to keep the current ones.
+          * geo_in: new values for some of the "in" geography levels,
+            which are merged with the current ones.
+
+        The geography is only validated again if the new values differ
+        in shape (e.g. wildcard or multiple values instead of a single
+        one) from the current ones.
+
+        """
+        new_for = (self._geo_for_values if geo_for_values is None
+                   else tuple(geo_for_values))
+        new_in: dict[str, Sequence[str]] = dict(self._geo_in)
+        if geo_in:
+            new_in.update(geo_in)
+        if '*' in new_for and len(new_for) > 1:
+            raise ValueError(
+                'Cannot specify wildcard "for" geography with other values')
+        for values in new_in.values():
+            if '*' in values and len(values) > 1:
+                raise ValueError(
+                    'Cannot specify wildcard "in" predicate with other values')
+        if _geo_shape(new_for, new_in) != self._shape:
+            geo_level = _validate_geo(self._dataset, self._geo_for_level, new_for, new_in)
+            new_in = _order_geo_in(new_in, geo_level)
+        return CompiledQuery(self._dataset, self._geo_for_level, new_for, new_in,
+                             self._base_params, self._make_dataframe, self._arrange)
+
+    def query(self, *, cache: ResultCache | None = None) -> pd.DataFrame:
+        """Issue the query and return the results as a pandas
+        DataFrame.
+
+        If `cache` is given, the result is looked up in and added to
+        it.
+
+        """
+        if cache is not None:
+            return cache.query(self)
+        return self.arrange(self.fetch_frame())
+
+    async def aquery(self, *, cache: ResultCache | None = None) -> pd.DataFrame:
+        """Issue the query and return the results as a pandas
+        DataFrame.
+
+        If `cache` is given, the result is looked up in and added to
+        it.
+
+        """
+        if cache is not None:
+            return await cache.aquery(self)
+        return self.arrange(await self.afetch_frame())
+
+    def fetch_frame(self) -> pd.DataFrame:
+        """Issue the query and return the result as converted from
+        the response, before `arrange`. This is the form results are
+        cached in.
+        """
+        client = self.client
+        if not isinstance(client, httpx.Client):
+            raise TypeError('Synchronous queries need an httpx.Client')
+        resp = fetch(self.url, client, params=self._params)
+        return self._make_dataframe(resp.json())
+
+    async def afetch_frame(self) -> pd.DataFrame:
+        """Async version of `fetch_frame`."""
+        client = self.client
+        if not isinstance(client, httpx.AsyncClient):
+            raise TypeError('Asynchronous queries need an httpx.AsyncClient')
+        resp = await afetch(self.url, client, params=self._params)
+        resp.raise_for_status()
+        return self._make_dataframe(resp.json())
+
+
 class QueryBuilderBase(ABC):
     def __init__(self, dataset: Dataset) -> None:
         if not dataset.api_url:
@@ -83,8 +390,22 @@ class QueryBuilderBase(ABC):
 
         """
     @abstractmethod
-    def _make_dataframe(self, data: dict) -> pd.DataFrame:
+    def _dataframe_maker(self) -> DataFrameMaker:
+        """Return a function converting the API JSON response into a
+        DataFrame, independent of later changes to the builder.
+
+        """
+
+    def _dataframe_arranger(self) -> FrameArranger | None:
+        """Return a function putting the columns of a result in the
+        order requested, or None if there is nothing to rearrange.
+
+        """
+        return None
+
+    def _make_dataframe(self, data: list) -> pd.DataFrame:
         """Convert the API JSON response into a DataFrame."""
+        return self._dataframe_maker()(data)
 
     def set_geo_for(self, geo_for: str, *values: str) -> QueryBuilderBase:
         """Set the Census geographies for which to retrieve data."""
@@ -147,123 +468,53 @@ class QueryBuilderBase(ABC):
         self.predicates[field] = list(values)
         return self
 
-    def _validate_geo(self) -> None:
+    def _canonical_geo_in(self) -> dict[str, Sequence[str]]:
         """Ensure that all required geographic information has been
-        set and is consistent.
+        set and is consistent, and return the "in" geographies in
+        canonical order.
 
         """
-        # Is `for` required but missing?
-        if not self.geo_for_values and not self.dataset.geography.has_default:
-            raise ValueError('Geography is required')
-        # Is `for` using a default?
-        if not self.geo_for_level:
-            return
-
-        geo_level = self._determine_geo_level()
-
-        # Check invariants for values for `in` constraints that don't
-        # depend on order.
-        for level_id, values in self.geo_in.items():
-            if level_id not in geo_level.requires:
-                raise ValueError(f'Unexpected "in" geography "{level_id}"')
-            if '*' in values and level_id not in geo_level.wildcard:
-                raise ValueError(
-                    f'Unexpected wildcard in "in" geography "{level_id}"')
-            if len(values) > 1 and self.geo_for_values != ['*']:
-                raise ValueError(
-                    'Multiple "in" geographies with non-wildcard "for"')
-
-        # Validate that multi-valued `in` items don't violate
-        # constraints implied by geo level ordering. Note that we
-        # can't determine this until both `in` and `for` are set.
-        if len(geo_level.requires) > 1:
-            # Get the in constraints in required geo order
-            ordered_values = [self.geo_in[level_id]
-                              for level_id in geo_level.requires
-                              if level_id in self.geo_in]
-            for idx, cur_level_values in enumerate(ordered_values):
-                following_level_values = ordered_values[idx+1:]
-                if following_level_values:
-                    if (len(cur_level_values) > 1 and
-                        not all(x == ['*'] for x in following_level_values)):
-                        raise ValueError(
-                            'Cannot specify non-wildcard "in" constraint '
-                            'below multi-valued level')
-                    if ('*' in cur_level_values and
-                        not all(x == ['*'] for x in following_level_values)):
-                        raise ValueError(
-                            'Cannot specify non-wildcard "in" constraint below '
-                            'level with wildcard')
-
-    def _determine_geo_level(self) -> GeographyLevel:
-        # Find this `for` geography's level descriptor
-        errors: list[ValueError] = []
-        geo_levels = self.dataset.geography.levels.get(self.geo_for_level)
-        if not geo_levels:
-            raise ValueError(f'No levels found for geography {self.geo_for_level}')
-        for geo_level in geo_levels:
-            try:
-                self._validate_geo_level(geo_level)
-                return geo_level
-            except ValueError as e:
-                errors.append(e)
-        raise ExceptionGroup('No matching geo level', errors)
-
-
-    def _validate_geo_level(self, geo_level: GeographyLevel) -> None:
-        # Does it have any required `in` geographies?
-        for level_id in geo_level.requires:
-            # Are they missing?
-            if level_id not in self.geo_in:
-                # Are they optional when `for` is a wildcard?
-                if ('*' in self.geo_for_values and
-                    geo_level.optionalWithWCFor == level_id):
-                    continue
-                raise ValueError(
-                    f'Missing required "in" geography "{level_id}" for '
-                    f'level {geo_level}')
+        geo_level = _validate_geo(self.dataset, self.geo_for_level, self.geo_for_values,
+                                  self.geo_in)
+        return _order_geo_in(self.geo_in, geo_level)
 
-    def _make_common_params(self) -> dict[str, str]:
-        """Assemble the QueryBuilderBase contents into request query
-        parameters.
+    def _make_predicate_params(self) -> dict[str, str]:
+        return {predicate: _format_predicate_values(value)
+                for predicate, value in self.predicates.items()}
 
-        """
-        self._validate_geo()
-        params = {
-            'for': f'{self.geo_for_level}:{",".join(self.geo_for_values)}',
-        }
-        if self.geo_in:
-            params['in'] = ' '.join((f'{level}:{",".join(values)}'
-                                     for level, values in self.geo_in.items()))
-        for predicate, value in self.predicates.items():
-            params[predicate] = _format_predicate_values(value)
-        return params
-
-    def _prepare_fetch_args(self) -> dict:
-        return {
-            'url': self.dataset.api_url,
-            'session':  self.dataset.client,
-            'params': self._make_common_params() | self._make_params(),
-        }
+    def compile(self) -> CompiledQuery:
+        """Validate the query once and return it as an immutable
+        `CompiledQuery`, which can be issued repeatedly and re-bound
+        to other geography values cheaply.
 
-    def query(self) -> pd.DataFrame:
+        """
+        return CompiledQuery(self.dataset,
+                             self.geo_for_level,
+                             self.geo_for_values,
+                             self._canonical_geo_in(),
+                             self._make_predicate_params() | self._make_params(),
+                             self._dataframe_maker(),
+                             self._dataframe_arranger())
+
+    def query(self, *, cache: ResultCache | None = None) -> pd.DataFrame:
         """Issue the query represented by the `QueryBuilderBase` and
         return the results as a pandas DataFrame.
 
+        If `cache` (a `uscensus.incremental.resultcache.ResultCache`)
+        is given, the result is looked up in and added to it.
+
         """
-        resp = fetch(**self._prepare_fetch_args())
-        return self._make_dataframe(resp.json())
+        return self.compile().query(cache=cache)
 
-    async def aquery(self) -> pd.DataFrame:
+    async def aquery(self, *, cache: ResultCache | None = None) -> pd.DataFrame:
         """Issue the query represented by the `QueryBuilderBase` and
         return the results as a pandas DataFrame.
 
-        """
-        self._validate_geo()
-        resp = await afetch(**self._prepare_fetch_args())
-        resp.raise_for_status()
-        return self._make_dataframe(resp.json())
+        If `cache` (a `uscensus.incremental.resultcache.ResultCache`)
+        is given, the result is looked up in and added to it.
 
+        """
+        return await self.compile().aquery(cache=cache)
 
 
 class QueryBuilder(QueryBuilderBase):
@@ -318,25 +569,50 @@ class QueryBuilder(QueryBuilderBase):
         # if missing:
         #     raise ValueError(f'Request missing required variables: {missing}')
         group = [f'group({self.group})'] if self.group else []
+        # Request the fields in canonical order, so that equivalent
+        # queries share cache entries; the result's columns are put
+        # back in the requested order afterwards.
         return {
-            'get': ','.join(self.fields + group),
+            'get': canonical_fields(self.fields + group),
         }
 
-    def _make_dataframe(self, data: dict) -> pd.DataFrame:
-        ret = pd.DataFrame(data=data[1:], columns=data[0])
-
-        # Fix up data types
+    def _dataframe_maker(self) -> DataFrameMaker:
+        # Work out which fields are numeric once, rather than for
+        # every response.
         fields = list(self.fields)
         if self.group:
             group = self.dataset.groups[self.group]
             fields += list(group.variables.keys())
+        numeric_fields = []
         for field in fields:
             base_field = _base_field(field)
             if variable := self.dataset.variables.get(base_field):
                 predicate_type = variable.predicateType
                 if predicate_type in ('int', 'float'):
-                    ret[field] = pd.to_numeric(ret[field], errors='coerce')
-        return ret
+                    numeric_fields.append(field)
+        return partial(_make_query_dataframe, numeric_fields=tuple(numeric_fields))
+
+    def _dataframe_arranger(self) -> FrameArranger:
+        return partial(_arrange_columns, leading=tuple(dict.fromkeys(self.fields)))
+
+
+def _arrange_columns(frame: pd.DataFrame, *, leading: Sequence[str]) -> pd.DataFrame:
+    # The requested fields come first, followed by any others (such as
+    # group members and geography) in their original order.
+    columns = [column for column in leading if column in frame.columns]
+    columns += [column for column in frame.columns if column not in leading]
+    if columns == list(frame.columns):
+        return frame
+    return frame[columns]
+
+
+def _make_query_dataframe(data: list, *, numeric_fields: Sequence[str]) -> pd.DataFrame:
+    ret = pd.DataFrame(data=data[1:], columns=data[0])
+
+    # Fix up data types
+    for field in numeric_fields:
+        ret[field] = pd.to_numeric(ret[field], errors='coerce')
+    return ret
 
 
 class RecodeRange(USCensusBaseModel):
@@ -412,6 +688,7 @@ class TabulationQueryBuilder(QueryBuilderBase):
         self.rows: list[str] = []
         self.cols: list[str] = []
         self.recodes: dict[str, RecodeValue] = {}
+        self.tidy = False
 
     def set_weight(self, weight: str) -> TabulationQueryBuilder:
         """Select the weight variable to use for the tabulation.
@@ -476,6 +753,15 @@ class TabulationQueryBuilder(QueryBuilderBase):
         self.recodes[new_var] = RecodeValue(b=base_var, d=list(category_defs))
         return self
 
+    def set_tidy(self, tidy: bool = True) -> TabulationQueryBuilder:
+        """Return the tabulation in long ("tidy") form: one row per
+        cell, with a column for each row and column variable and a
+        `value` column, instead of a crosstab.
+
+        """
+        self.tidy = tidy
+        return self
+
     def _make_params(self):
         ret = {}
 
@@ -504,36 +790,108 @@ class TabulationQueryBuilder(QueryBuilderBase):
         for new_var, recode in self.recodes.items():
             if new_var not in self.cols and new_var not in self.rows:
                 raise ValueError(f'Unused recode "{new_var}"')
-            ret[f'recode+{new_var}'] = recode.to_json()
+            ret[f'recode+{new_var}'] = recode.model_dump_json()
 
         return ret
 
-    def _make_dataframe(self, data: dict) -> pd.DataFrame:
-        # The returned dataset column headers are the row variable
-        # names along with JSON dictionaries with each combination of
-        # column variables' names and values.
-        #
-        # First let's turn everything into strings.
-        cols = [json.dumps(x)
-                if isinstance(x, dict) else x
-                for x in data[0]]
-        ret = pd.DataFrame(data=data[1:], columns=cols)
-        # And set the row index if rows were specified.
-        if self.rows:
-            ret = ret.set_index(self.rows)
-        # If columns were specified, create a MultiIndex for the
-        # values after turning each combo into a tuple in the order of
-        # self.cols.  We could possibly do something here to show
-        # categorical variable names instead of codes, but there are
-        # quite a few mixed ones (enumerated special values plus a
-        # range),
-        if self.cols:
-            col_headers = ret.columns.map(json.loads)
-            col_tuples = []
-            req_cols = list(self.cols)
-            if self.avg:
-                req_cols.append(self.avg)
-            for header in col_headers:
-                col_tuples.append(tuple(header[col] for col in req_cols))
-            ret.columns = pd.MultiIndex.from_tuples(col_tuples, names=req_cols)
-        return ret
+    def _dataframe_maker(self) -> DataFrameMaker:
+        return partial(_make_tabulation_dataframe,
+                       rows=tuple(self.rows),
+                       cols=tuple(self.cols),
+                       avg=self.avg)
+
+    def _dataframe_arranger(self) -> FrameArranger:
+        # Results (and cached results) are always crosstabs; the tidy
+        # form is derived from them.
+        cols = list(self.cols)
+        if self.avg:
+            cols.append(self.avg)
+        arrange = partial(_arrange_levels, rows=tuple(self.rows), cols=tuple(cols))
+        if not self.tidy:
+            return arrange
+        return partial(_arrange_tidy, arrange=arrange)
+
+
+def _arrange_tidy(frame: pd.DataFrame, *, arrange: FrameArranger) -> pd.DataFrame:
+    return _tidy_tabulation(arrange(frame))
+
+
+def _arrange_levels(frame: pd.DataFrame,
+                    *,
+                    rows: Sequence[str],
+                    cols: Sequence[str]) -> pd.DataFrame:
+    if len(rows) > 1 and list(frame.index.names) != list(rows):
+        frame = frame.reorder_levels(list(rows))
+    if (len(cols) > 1 and isinstance(frame.columns, pd.MultiIndex) and
+            list(frame.columns.names) != list(cols)):
+        frame = frame.reorder_levels(list(cols), axis=1)
+    return frame
+
+
+def _tabulation_values(body: list, positions: Sequence[int], avg: str | None) -> np.ndarray:
+    # Counts are integers; averages, and counts with missing cells,
+    # are floats.
+    cells = [[row[pos] for pos in positions] for row in body]
+    if not avg:
+        try:
+            return np.array(cells, dtype=np.int64).reshape(len(body), len(positions))
+        except (TypeError, ValueError):
+            pass
+    return np.array(cells, dtype=np.float64).reshape(len(body), len(positions))
+
+
+def _make_tabulation_dataframe(data: list,
+                               *,
+                               rows: Sequence[str],
+                               cols: Sequence[str],
+                               avg: str | None) -> pd.DataFrame:
+    # The returned dataset column headers are the row variable
+    # names along with JSON dictionaries with each combination of
+    # column variables' names and values, or a single `tabulate`
+    # value column if no columns were requested. Build the values
+    # as one typed array and each index level from one list, rather
+    # than going through per-column objects.
+    header, body = data[0], data[1:]
+    row_positions = [header.index(row) for row in rows]
+    value_positions = [pos for pos, name in enumerate(header)
+                       if pos not in row_positions]
+    values = _tabulation_values(body, value_positions, avg)
+
+    if rows:
+        index = pd.MultiIndex.from_arrays(
+            [[row[pos] for row in body] for pos in row_positions], names=list(rows))
+        if len(rows) == 1:
+            index = index.get_level_values(0)
+    else:
+        index = None
+    # Each column header becomes a tuple in the order of cols.  We
+    # could possibly do something here to show categorical variable
+    # names instead of codes, but there are quite a few mixed ones
+    # (enumerated special values plus a range),
+    headers = [header[pos] for pos in value_positions]
+    if cols:
+        req_cols = list(cols)
+        if avg:
+            req_cols.append(avg)
+        columns = pd.MultiIndex.from_arrays(
+            [[h[col] for h in headers] for col in req_cols], names=req_cols)
+    else:
+        columns = pd.Index(headers)
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def _tidy_tabulation(frame: pd.DataFrame) -> pd.DataFrame:
+    """Return a tabulation as one row per cell, with a column for
+    each row and column variable and a `value` column.
+
+    """
+    n_rows, n_cols = frame.shape
+    data = {}
+    for level, name in enumerate(frame.index.names):
+        if name is not None:
+            data[name] = np.repeat(frame.index.get_level_values(level).to_numpy(), n_cols)
+    for level, name in enumerate(frame.columns.names):
+        if name is not None:
+            data[name] = np.tile(frame.columns.get_level_values(level).to_numpy(), n_rows)
+    data[TIDY_VALUE] = frame.to_numpy().ravel()
+    return pd.DataFrame(data)
@@ -0,0 +1,108 @@
+"""Apply recodes to microdata tabulations locally.
+
+A tabulation by a recoded variable (see
+`TabulationQueryBuilder.add_recode`) groups the values of its base
+variable into categories. Given a tabulation by the base variable
+itself, the same result can be computed locally by mapping each base
+value to its category and summing, without another request. This
+makes exploring different groupings of the same variable cheap; see
+`uscensus.incremental.resultcache.RecodeResultCache` for serving
+recoded queries from cached tabulations automatically.
+
+Recoded categories are labeled `1`, `2`, ... in the order of their
+definitions, as the API does, and base values not in any category are
+dropped. Only sums (weighted or unweighted counts) can be
+re-tabulated, not averages.
+"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from uscensus.incremental.query import TIDY_VALUE, RecodeRange, _tidy_tabulation
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+
+    from uscensus.incremental.query import RecodeValue
+
+_logger = logging.getLogger(__name__)
+
+
+def _as_number(value: str | int) -> float | None:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _matches(value: str, item: str | int | RecodeRange) -> bool:
+    number = _as_number(value)
+    if isinstance(item, RecodeRange):
+        return number is not None and item.mn <= number <= item.mx
+    if value == str(item):
+        return True
+    # Codes may be zero-padded, e.g. "01" for 1.
+    return number is not None and number == _as_number(item)
+
+
+def recode_categories(values: Iterable[str], recode: RecodeValue) -> dict[str, str]:
+    """Map base variable `values` to the categories of `recode`.
+
+    Values not in any category are left out.
+    """
+    ret = {}
+    for value in values:
+        for pos, category in enumerate(recode.d, 1):
+            if any(_matches(value, item) for item in category):
+                ret[value] = str(pos)
+                break
+    return ret
+
+
+def retabulate(frame: pd.DataFrame,
+               recodes: Mapping[str, RecodeValue],
+               *,
+               rows: Sequence[str],
+               cols: Sequence[str]) -> pd.DataFrame:
+    """Compute a recoded tabulation from a finer one.
+
+    Arguments:
+    ---------
+      * frame: a tabulation (crosstab) by the base variables of
+        `recodes` and any other row and column variables.
+      * recodes: the recodes, by new variable name.
+      * rows: the row variables of the result, including recoded ones.
+      * cols: the column variables of the result, including recoded
+        ones.
+
+    Returns the tabulation as `TabulationQueryBuilder` would return it
+    for the recoded query; crosstab cells without any base values are
+    zero.
+
+    """
+    tidy = _tidy_tabulation(frame)
+    for new_var, recode in recodes.items():
+        if recode.b not in tidy.columns:
+            raise ValueError(f'Base variable "{recode.b}" of "{new_var}" not tabulated')
+        base = tidy[recode.b]
+        tidy[new_var] = base.map(recode_categories(base.unique(), recode))
+    if unknown := [name for name in [*rows, *cols] if name not in tidy.columns]:
+        raise ValueError(f'Variables not tabulated: {unknown}')
+    tidy = tidy.dropna(subset=list(recodes))
+
+    levels = [*rows, *cols]
+    sums = tidy.groupby(levels, sort=True)[TIDY_VALUE].sum()
+    _logger.debug('Retabulated %d cells into %d', len(tidy), len(sums))
+    if not cols:
+        # As in the API response, the single value column.
+        return sums.to_frame(frame.columns[0])
+    if not rows:
+        ret = pd.DataFrame([sums.to_numpy()], columns=sums.index)
+    else:
+        ret = sums.unstack(list(cols), fill_value=0)
+    if not isinstance(ret.columns, pd.MultiIndex):
+        ret.columns = pd.MultiIndex.from_arrays([ret.columns], names=list(cols))
+    return ret
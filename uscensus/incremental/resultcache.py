@@ -0,0 +1,394 @@
+"""A result-level cache for data queries.
+
+The HTTP cache in `uscensus.util.webcache` stores raw JSON responses,
+so every hit still pays for parsing the JSON and building and typing
+the DataFrame. `ResultCache` instead stores the final DataFrame of
+each query as a Parquet file, read back with memory mapping. Entries
+are keyed by the canonical form of the request (see
+`uscensus.util.requestkey`) and the dataset's `modified` date, so
+equivalent spellings of a query share an entry, and entries are
+invalidated when the Census Bureau republishes a dataset.
+`SubsetResultCache` additionally serves queries from cached results of
+broader queries, and `RecodeResultCache` serves recoded tabulations
+from cached tabulations by their base variables.
+
+Requires the `pyarrow` package.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from uscensus.incremental.query import CompiledQuery, RecodeValue
+from uscensus.incremental.recode import retabulate
+from uscensus.util.requestkey import (
+    canonical_params,
+    canonical_url,
+    request_key,
+    split_fields,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from uscensus.incremental.query import QueryBuilderBase
+
+_logger = logging.getLogger(__name__)
+
+_COLUMNS_KEY = b'uscensus:columns'
+
+
+def _compile(query: QueryBuilderBase | CompiledQuery) -> CompiledQuery:
+    return query if isinstance(query, CompiledQuery) else query.compile()
+
+
+def _to_table(frame: pd.DataFrame, metadata: dict[bytes, str]) -> pa.Table:
+    # Parquet only supports string column names, and Arrow's pandas
+    # metadata doesn't restore single-level MultiIndex columns (as
+    # produced by tabulations with one column variable), so store
+    # the columns positionally and keep the real ones in our own
+    # metadata.
+    columns = frame.columns
+    table = pa.Table.from_pandas(
+        frame.set_axis([str(pos) for pos in range(len(columns))], axis=1))
+    return table.replace_schema_metadata(table.schema.metadata | metadata | {
+        _COLUMNS_KEY: json.dumps({
+            'names': list(columns.names),
+            'values': list(columns),
+            'multi': isinstance(columns, pd.MultiIndex),
+        }),
+    })
+
+
+def _from_table(table: pa.Table) -> pd.DataFrame:
+    frame = table.to_pandas()
+    columns = json.loads(table.schema.metadata[_COLUMNS_KEY])
+    if columns['multi']:
+        return frame.set_axis(
+            pd.MultiIndex.from_tuples([tuple(value) for value in columns['values']],
+                                      names=columns['names']),
+            axis=1)
+    return frame.set_axis(pd.Index(columns['values'], name=columns['names'][0]),
+                          axis=1)
+
+
+def _key(query: CompiledQuery, params: Mapping[str, str]) -> str:
+    # The key of a request for `params` to the dataset of `query`.
+    modified = query.dataset.modified
+    document = {
+        'request': request_key(query.url, params),
+        'modified': modified.isoformat() if modified else None,
+    }
+    return hashlib.sha256(json.dumps(document).encode()).hexdigest()
+
+
+class ResultCache:
+    """Cache query result DataFrames as Parquet files in a directory.
+
+    Arguments:
+    ---------
+      * directory: where to store the cached results; it is created
+        if necessary.
+      * max_age: if given, entries older than this are ignored, which
+        bounds staleness for datasets without a `modified` date.
+
+    """
+
+    def __init__(self,
+                 directory: str | os.PathLike,
+                 *,
+                 max_age: datetime.timedelta | None = None) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({str(self.directory)!r})'
+
+    @staticmethod
+    def key(query: CompiledQuery) -> str:
+        """Return the cache key for `query`."""
+        return _key(query, query.params)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.parquet'
+
+    def get(self, query: QueryBuilderBase | CompiledQuery) -> pd.DataFrame | None:
+        """Return the cached result of `query`, or None.
+
+        The result may come from an equivalent query; its columns are
+        put in the order `query` requested.
+        """
+        compiled = _compile(query)
+        path = self._path(self.key(compiled))
+        if (frame := self._read(path)) is None:
+            return None
+        _logger.debug('Result cache hit: %s', path)
+        return compiled.arrange(frame)
+
+    def _read(self, path: Path) -> pd.DataFrame | None:
+        try:
+            if self.max_age is not None:
+                mtime = datetime.datetime.fromtimestamp(path.stat().st_mtime,
+                                                        datetime.UTC)
+                if datetime.datetime.now(datetime.UTC) - mtime > self.max_age:
+                    _logger.debug('Expired result: %s', path)
+                    return None
+            frame = _from_table(pq.read_table(path, memory_map=True))
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, pa.ArrowException) as e:
+            _logger.warning('Ignoring unreadable cached result %s', path, exc_info=e)
+            return None
+        return frame
+
+    def _metadata(self, query: CompiledQuery) -> dict[bytes, str]:
+        """Return extra Parquet metadata to store with the result of
+        `query`.
+        """
+        return {}
+
+    def put(self, query: QueryBuilderBase | CompiledQuery, frame: pd.DataFrame) -> None:
+        """Store `frame` as the result of `query`."""
+        compiled = _compile(query)
+        path = self._path(self.key(compiled))
+        path.parent.mkdir(exist_ok=True)
+        # Write to a temporary file first, so that concurrent readers
+        # never see a partial file.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(_to_table(frame, self._metadata(compiled)), tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def query(self, query: QueryBuilderBase | CompiledQuery) -> pd.DataFrame:
+        """Return the cached result of `query`, issuing it and caching
+        the result on a miss.
+        """
+        compiled = _compile(query)
+        if (frame := self.get(compiled)) is not None:
+            return frame
+        frame = compiled.fetch_frame()
+        self.put(compiled, frame)
+        return compiled.arrange(frame)
+
+    async def aquery(self, query: QueryBuilderBase | CompiledQuery) -> pd.DataFrame:
+        """Async version of `query`."""
+        compiled = _compile(query)
+        if (frame := self.get(compiled)) is not None:
+            return frame
+        frame = await compiled.afetch_frame()
+        self.put(compiled, frame)
+        return compiled.arrange(frame)
+
+
+_QUERY_KEY = b'uscensus:query'
+
+# Parameters describing the shape of a result rather than filtering it.
+_SHAPE_PARAMS = ('get', 'for', 'in')
+
+
+def _parse_geo_clause(clause: str) -> tuple[str, list[str]]:
+    level, _, values = clause.partition(':')
+    return level, values.split(',')
+
+
+def _describe(query: CompiledQuery) -> dict[str, Any] | None:
+    """Describe a query's fields and geography, or return None if
+    subsets of its results can't be served.
+    """
+    params = query.params
+    fields = split_fields(params.get('get', ''))
+    # Group results expand into their member variables, and default
+    # geographies have no geography columns.
+    if not fields or any(field.startswith('group(') for field in fields):
+        return None
+    geo_for = _parse_geo_clause(params.get('for', ''))
+    if not geo_for[0]:
+        return None
+    modified = query.dataset.modified
+    return {
+        'url': canonical_url(query.url),
+        'modified': modified.isoformat() if modified else None,
+        'params': {name: value for name, value in canonical_params(params).items()
+                   if name not in _SHAPE_PARAMS},
+        'fields': fields,
+        'for': geo_for,
+        'in': dict(_parse_geo_clause(clause)
+                   for clause in params.get('in', '').split()),
+    }
+
+
+def _covers(values: list[str], cached: list[str]) -> bool:
+    return cached == ['*'] or (values != ['*'] and set(values) <= set(cached))
+
+
+def _can_serve(cached: dict[str, Any], wanted: dict[str, Any]) -> bool:
+    return (cached['url'] == wanted['url'] and
+            cached['modified'] == wanted['modified'] and
+            cached['params'] == wanted['params'] and
+            set(wanted['fields']) <= set(cached['fields']) and
+            cached['for'][0] == wanted['for'][0] and
+            _covers(wanted['for'][1], cached['for'][1]) and
+            cached['in'].keys() == wanted['in'].keys() and
+            all(_covers(values, cached['in'][level])
+                for level, values in wanted['in'].items()))
+
+
+class SubsetResultCache(ResultCache):
+    """A `ResultCache` that also answers a `QueryBuilder` query from
+    a cached result of a query covering its fields and geography,
+    e.g. one county from a cached `county:*` query in the same state,
+    or fields A and B from a cached query for A, B and C.
+
+    Rows are filtered on the result's geography columns, and columns
+    projected, locally. Only queries for the same dataset, geography
+    level, `in` levels and other parameters (e.g. predicates) are
+    used, and group and tabulation queries are only served from
+    exact matches.
+
+    """
+
+    def __init__(self,
+                 directory: str | os.PathLike,
+                 *,
+                 max_age: datetime.timedelta | None = None) -> None:
+        super().__init__(directory, max_age=max_age)
+        self._entries: dict[str, dict[str, Any]] | None = None
+
+    def _load_entries(self) -> dict[str, dict[str, Any]]:
+        # Descriptions of the cached results, by file path, read from
+        # their Parquet metadata on first use.
+        if self._entries is None:
+            self._entries = {}
+            for path in self.directory.glob('*/*.parquet'):
+                try:
+                    metadata = pq.read_schema(path).metadata or {}
+                except (OSError, pa.ArrowException) as e:
+                    _logger.warning('Ignoring unreadable cached result %s', path, exc_info=e)
+                    continue
+                if _QUERY_KEY in metadata:
+                    self._entries[str(path)] = json.loads(metadata[_QUERY_KEY])
+        return self._entries
+
+    def _metadata(self, query: CompiledQuery) -> dict[bytes, str]:
+        if (description := _describe(query)) is None:
+            return {}
+        return {_QUERY_KEY: json.dumps(description)}
+
+    def put(self, query: QueryBuilderBase | CompiledQuery, frame: pd.DataFrame) -> None:
+        compiled = _compile(query)
+        super().put(compiled, frame)
+        if (description := _describe(compiled)) is not None:
+            self._load_entries()[str(self._path(self.key(compiled)))] = description
+
+    def get(self, query: QueryBuilderBase | CompiledQuery) -> pd.DataFrame | None:
+        """Return the cached result of `query` or, failing that, its
+        subset of a cached result covering it, or None.
+        """
+        compiled = _compile(query)
+        if (frame := super().get(compiled)) is not None:
+            return frame
+        if (wanted := _describe(compiled)) is None:
+            return None
+        for path, cached in self._load_entries().items():
+            if _can_serve(cached, wanted):
+                frame = self._subset(Path(path), cached, wanted)
+                if frame is not None:
+                    _logger.debug('Serving subset of cached result %s', path)
+                    return compiled.arrange(frame)
+        return None
+
+    def _subset(self,
+                path: Path,
+                cached: dict[str, Any],
+                wanted: dict[str, Any]) -> pd.DataFrame | None:
+        if (frame := self._read(path)) is None:
+            return None
+        level, values = wanted['for']
+        for column, column_values in [(level, values), *wanted['in'].items()]:
+            if column_values == ['*']:
+                continue
+            if column not in frame.columns:
+                return None
+            frame = frame[frame[column].isin(column_values)]
+        dropped = set(cached['fields']) - set(wanted['fields'])
+        return frame[[column for column in frame.columns if column not in dropped]] \
+            .reset_index(drop=True)
+
+
+_ROW = 'row+'
+_COL = 'col+'
+_RECODE = 'recode+'
+
+
+def _unrecoded_params(params: Mapping[str, str],
+                      recodes: Mapping[str, RecodeValue]) -> dict[str, str] | None:
+    """Return the parameters of the tabulation by the base variables
+    of `recodes` that `params` recodes, or None if there is none.
+    """
+    ret = {}
+    tabulated = set()
+    for name, value in params.items():
+        if name.startswith(_RECODE):
+            continue
+        if name.startswith((_ROW, _COL)):
+            prefix, var = name[:len(_ROW)], name[len(_ROW):]
+            var = recodes[var].b if var in recodes else var
+            # A base variable also tabulated as itself, or recoded
+            # twice, would need a different tabulation.
+            if var in tabulated:
+                return None
+            tabulated.add(var)
+            name = prefix + var
+        ret[name] = value
+    return ret
+
+
+class RecodeResultCache(ResultCache):
+    """A `ResultCache` that also answers a tabulation with recoded
+    row or column variables by re-tabulating a cached tabulation of
+    the same query by their base variables, e.g. age groups from a
+    cached tabulation by age, rather than requesting it.
+
+    Averages (`set_avg`) can't be re-tabulated and are only served
+    from exact matches.
+
+    """
+
+    def get(self, query: QueryBuilderBase | CompiledQuery) -> pd.DataFrame | None:
+        """Return the cached result of `query` or, failing that, its
+        re-tabulation from a cached tabulation by its base variables,
+        or None.
+        """
+        compiled = _compile(query)
+        if (frame := super().get(compiled)) is not None:
+            return frame
+        params = compiled.params
+        recodes = {name[len(_RECODE):]: RecodeValue.model_validate_json(value)
+                   for name, value in params.items() if name.startswith(_RECODE)}
+        if not recodes or 'avg(' in params.get('tabulate', ''):
+            return None
+        if (base_params := _unrecoded_params(params, recodes)) is None:
+            return None
+        path = self._path(_key(compiled, base_params))
+        if (base := self._read(path)) is None:
+            return None
+        _logger.debug('Re-tabulating cached result %s', path)
+        frame = retabulate(base, recodes,
+                           rows=[name[len(_ROW):] for name in params if name.startswith(_ROW)],
+                           cols=[name[len(_COL):] for name in params if name.startswith(_COL)])
+        return compiled.arrange(frame)
@@ -0,0 +1,187 @@
+"""Export a materialized `wrappers.Catalog` to a compact binary
+snapshot file, and load it back without fetching or re-validating
+anything.
+
+The file holds a MessagePack header with the catalog document and a
+table of contents, followed by one MessagePack blob per linked
+document (variables, groups, tags or geography) of each exported
+dataset, and optionally its variable completions. `load_snapshot`
+memory-maps the file and only decodes a dataset's documents when they
+are first accessed, so loading is cheap and many worker processes can
+share one snapshot through the OS page cache.
+
+Requires the `msgpack` package.
+"""
+from __future__ import annotations
+
+import logging
+import mmap
+import struct
+from functools import cache
+from typing import TYPE_CHECKING, Any
+
+import msgpack
+
+from uscensus.incremental import model
+from uscensus.incremental.wrappers import (
+    PREFETCH_FIELDS,
+    Catalog,
+    Group,
+    _check_prefetch_fields,
+    _wrap_geography,
+)
+from uscensus.util.errors import CensusError
+from uscensus.util.textindex.completionindex import CompletionIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    import httpx
+
+    from uscensus.incremental.wrappers import Dataset, DocumentLoaders
+
+_logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'USCSNAP\x00'
+SNAPSHOT_VERSION = 1
+_PREAMBLE = struct.Struct(f'<{len(SNAPSHOT_MAGIC)}sIQ')
+
+# Derived from the variables rather than fetched, so not prefetched.
+COMPLETIONS = 'completions'
+
+
+def _dump(value: model.USCensusBaseModel) -> dict[str, Any]:
+    return value.model_dump(by_alias=True, mode='json', exclude_defaults=True)
+
+
+def _dump_document(dataset: Dataset, field: str) -> Any:
+    if field == 'variables':
+        return {name: _dump(variable)
+                for name, variable in dataset.variables.items()}
+    if field == 'groups':
+        return [_dump(group._model)
+                for group in dataset.groups.values()]
+    if field == 'tags':
+        return list(dataset.tags)
+    if field == COMPLETIONS:
+        return dataset.completions.to_dict()
+    return _dump(dataset.geography._model)
+
+
+def _load_document(field: str, raw: Any, client: httpx.AsyncClient | httpx.Client) -> Any:
+    if field == 'variables':
+        return {name: model.construct(model.Variable, variable)
+                for name, variable in raw.items()}
+    if field == 'groups':
+        groups = (model.construct(model.Group, group) for group in raw)
+        return {group.name: Group(group, client) for group in groups}
+    if field == 'tags':
+        return raw
+    if field == COMPLETIONS:
+        return CompletionIndex.from_dict(raw)
+    return _wrap_geography(model.construct(model.Geography, raw))
+
+
+def export_snapshot(catalog: Catalog,
+                    path: str,
+                    *,
+                    datasets: Iterable[Dataset] | None = None,
+                    fields: Iterable[str] = PREFETCH_FIELDS,
+                    completions: bool = False) -> None:
+    """Write `catalog` to a snapshot file.
+
+    Arguments:
+    ---------
+      * catalog: the catalog to export.
+      * path: the snapshot file to write.
+      * datasets: the datasets whose linked documents to include;
+        all of the catalog's datasets if omitted.
+      * fields: which of `variables`, `groups`, `tags` and `geography`
+        to include.
+      * completions: whether to include each dataset's
+        `Dataset.completions`, so that loaded datasets can complete
+        variables without building the index.
+
+    Linked documents not yet cached on the datasets are fetched; use
+    `Catalog.prefetch` first to fetch them concurrently. Documents
+    that fail to fetch are logged and omitted from the snapshot.
+
+    """
+    fields = _check_prefetch_fields(fields)
+    if completions:
+        fields.append(COMPLETIONS)
+    if datasets is None:
+        selected = set(range(len(catalog.dataset)))
+    else:
+        wanted = {id(dataset) for dataset in datasets}
+        selected = {pos for pos, dataset in enumerate(catalog.dataset)
+                    if id(dataset) in wanted}
+
+    packer = msgpack.Packer()
+    blobs: list[bytes] = []
+    contents: list[tuple[int, str, int, int]] = []
+    offset = 0
+    for pos in sorted(selected):
+        dataset = catalog.dataset[pos]
+        for field in fields:
+            try:
+                blob = packer.pack(_dump_document(dataset, field))
+            except Exception as e:
+                _logger.warning('Error exporting %s for %r; skipping',
+                                field, dataset, exc_info=e)
+                continue
+            contents.append((pos, field, offset, len(blob)))
+            blobs.append(blob)
+            offset += len(blob)
+
+    header = packer.pack({
+        # Datasets come from the wrappers, as a catalog loaded without
+        # validation keeps them out of its model.
+        'catalog': _dump(catalog._model) | {
+            'dataset': [_dump(dataset._model)
+                        for dataset in catalog.dataset],
+        },
+        'contents': contents,
+    })
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+
+
+def load_snapshot(path: str, client: httpx.AsyncClient | httpx.Client) -> Catalog:
+    """Load a `Catalog` from a snapshot file written by `export_snapshot`.
+
+    The catalog and its models are built without validation. Linked
+    documents included in the snapshot are decoded from the
+    memory-mapped file on first access; any others are fetched with
+    `client` as usual.
+
+    """
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_len = _PREAMBLE.unpack_from(buf)
+    if magic != SNAPSHOT_MAGIC:
+        raise CensusError(f'{path} is not a catalog snapshot')
+    if version != SNAPSHOT_VERSION:
+        raise CensusError(f'Unsupported catalog snapshot version {version}')
+    start = _PREAMBLE.size
+    header = msgpack.unpackb(buf[start:start + header_len])
+    blobs_start = start + header_len
+
+    def make_loader(field: str, offset: int, length: int) -> Callable[[], Any]:
+        @cache
+        def load() -> Any:
+            begin = blobs_start + offset
+            raw = msgpack.unpackb(memoryview(buf)[begin:begin + length])
+            return _load_document(field, raw, client)
+        return load
+
+    catalog_model = model.construct(model.Catalog, header['catalog'])
+    documents: list[dict[str, Callable[[], Any]]] = [
+        {} for _ in catalog_model.dataset]
+    for pos, field, offset, length in header['contents']:
+        documents[pos][field] = make_loader(field, offset, length)
+    loaders: list[DocumentLoaders | None] = list(documents)
+    return Catalog(catalog_model, client, loaders)
@@ -0,0 +1,162 @@
+"""A compact, columnar store for a dataset's variable metadata.
+
+Microdata variable documents hold thousands of variables whose labels,
+concepts, types and value dictionaries repeat within a document and
+across vintages. `VariableTable` keeps each `model.Variable` field in
+its own column instead of one model per variable, and a `VariablePool`
+shared between tables interns strings and value dictionaries, so each
+distinct value is stored once however many vintages are loaded.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from collections.abc import Iterator, Mapping, Sequence
+from typing import Any
+
+from uscensus.incremental import model
+
+_logger = logging.getLogger(__name__)
+
+_FIELDS = tuple(model.Variable.model_fields)
+
+
+class VariablePool:
+    """Shared storage for values repeated across `VariableTable`s.
+
+    Strings are interned, and equal `VariableValues` and
+    `VariableDatetime` models are shared, so tables built with the same
+    pool hold a single copy of each distinct value.
+    """
+
+    __slots__ = ('_datetimes', '_strings', '_values')
+
+    def __init__(self) -> None:
+        self._strings: dict[str, str] = {}
+        self._values: dict[int, list[model.VariableValues]] = {}
+        self._datetimes: dict[model.VariableDatetime, model.VariableDatetime] = {}
+
+    def __len__(self) -> int:
+        return (len(self._strings)
+                + sum(map(len, self._values.values()))
+                + len(self._datetimes))
+
+    def __repr__(self) -> str:
+        return (f'{type(self).__name__}({len(self._strings)} strings, '
+                f'{sum(map(len, self._values.values()))} value sets)')
+
+    def string(self, value: str) -> str:
+        return self._strings.setdefault(value, value)
+
+    def values(self, values: model.VariableValues) -> model.VariableValues:
+        # Bucket by hash rather than keying on the contents, which
+        # would keep a second copy of every value dictionary.
+        key = hash((
+            None if values.item is None else tuple(values.item.items()),
+            None if values.range is None else tuple(values.range),
+        ))
+        bucket = self._values.setdefault(key, [])
+        for shared in bucket:
+            if shared == values:
+                return shared
+        if values.item is not None:
+            # Share the code and label strings themselves, too.
+            values = values.model_copy(update={
+                'item': {self.string(code): self.string(label)
+                         for code, label in values.item.items()},
+            })
+        bucket.append(values)
+        return values
+
+    def datetime(self, value: model.VariableDatetime) -> model.VariableDatetime:
+        return self._datetimes.setdefault(value, value)
+
+    def intern(self, value: Any) -> Any:
+        """Return the pooled equivalent of a `model.Variable` field value."""
+        if isinstance(value, str):
+            return self.string(value)
+        if isinstance(value, model.VariableValues):
+            return self.values(value)
+        if isinstance(value, model.VariableDatetime):
+            return self.datetime(value)
+        return value
+
+
+class VariableTable(Mapping[str, model.Variable]):
+    """A read-only mapping of variable names to `model.Variable`,
+    stored column by column.
+
+    Variables are rebuilt (without validation) from their columns on
+    each access, which is cheap but returns a new model every time;
+    use `column` to scan one field of every variable without building
+    any models.
+
+    Arguments:
+    ---------
+      * variables: the variables to store, keyed by name.
+      * pool: the pool to intern values in; share one pool between
+        tables to deduplicate values across datasets.
+
+    """
+
+    __slots__ = ('_columns', '_index', '_pool')
+
+    def __init__(self,
+                 variables: Mapping[str, model.Variable],
+                 pool: VariablePool | None = None) -> None:
+        self._pool = VariablePool() if pool is None else pool
+        intern = self._pool.intern
+        self._index: dict[str, int] = {}
+        columns: list[list[Any]] = [[] for _ in _FIELDS]
+        for name, variable in variables.items():
+            self._index[self._pool.string(name)] = len(self._index)
+            for column, field in zip(columns, _FIELDS, strict=True):
+                column.append(intern(getattr(variable, field)))
+        self._columns = dict(zip(_FIELDS, (tuple(column) for column in columns),
+                                 strict=True))
+        _logger.debug('Stored %d variables', len(self._index))
+
+    @classmethod
+    def from_json(cls,
+                  content: bytes | str,
+                  pool: VariablePool | None = None,
+                  *,
+                  validate: bool = True) -> VariableTable:
+        """Build a table from a variables document.
+
+        If `validate` is False, the document is trusted and each
+        variable is built with `model.construct` instead of being
+        validated.
+        """
+        if validate:
+            return cls(model.Variables.model_validate_json(content).variables, pool)
+        raw = json.loads(content)['variables']
+        return cls(model.LazyModelMap(raw, model.Variable, validate=False), pool)
+
+    @property
+    def pool(self) -> VariablePool:
+        return self._pool
+
+    def column(self, field: str) -> Sequence[Any]:
+        """Return the values of `field` for every variable, in order."""
+        try:
+            return self._columns[field]
+        except KeyError:
+            raise KeyError(f'Unknown variable field: {field}') from None
+
+    def __getitem__(self, name: str) -> model.Variable:
+        pos = self._index[name]
+        return model.Variable.model_construct(
+            **{field: column[pos] for field, column in self._columns.items()})
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._index
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({len(self)} variables)'
@@ -4,15 +4,23 @@ the dataclasses in the `model` module.
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+from collections.abc import Iterable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
-from typing import Callable, TypeVar, cast
+from typing import Any, Callable, Self, TypeVar, cast
 
 import httpx
 from async_property import async_cached_property
+from pydantic import PrivateAttr
 
 from uscensus.incremental import model
+from uscensus.incremental.variabletable import VariablePool, VariableTable
+from uscensus.util.requestkey import canonical_url
+from uscensus.util.textindex import VariableFields
+from uscensus.util.textindex.completionindex import CompletionIndex
 from uscensus.util.webcache import afetch, fetch
 
 _logger = logging.getLogger(__name__)
@@ -52,27 +60,45 @@ async def _fetch_bytes(url: str, client: httpx.AsyncClient | httpx.Client) -> by
 
 
 def _filter_variables(
-    variables: dict[str, model.Variable],
+    variables: Mapping[str, model.Variable],
     predicate: Callable[[model.Variable], bool],
 ) -> dict[str, model.Variable]:
     return {name: v for name, v in variables.items() if predicate(v)}
 
 
+Variables = Mapping[str, model.Variable]
+
+
+def _parse_variables(content: bytes,
+                     validate: bool,
+                     pool: VariablePool | None = None) -> Variables:
+    if pool is not None:
+        return VariableTable.from_json(content, pool, validate=validate)
+    if validate:
+        return model.Variables.model_validate_json(content).variables
+    return model.LazyModelMap(json.loads(content)['variables'], model.Variable,
+                              validate=False)
+
+
 class Geography(model.USCensusBaseModel):
-    _model: model.Geography
+    _model: model.Geography = PrivateAttr()
     levels: dict[str, list[model.GeographyLevel]]
     has_default: bool = False
 
 
-_EMPTY_GEOGRAPHY = Geography(
-    _model=model.Geography(fips=[], default=[]),
-    levels={},
-    has_default=False,
-)
+def _parse_geography(content: bytes, validate: bool = True) -> Geography:
+    if validate:
+        return _wrap_geography(model.Geography.model_validate_json(content))
+    return _wrap_geography(model.construct(model.Geography, json.loads(content)))
+
+
+def _parse_tags(content: bytes, validate: bool) -> list[str]:
+    if validate:
+        return model.Tags.model_validate_json(content).tags
+    return json.loads(content)['tags']
 
 
-def _parse_geography(content: bytes) -> Geography:
-    geography = model.Geography.model_validate_json(content)
+def _wrap_geography(geography: model.Geography) -> Geography:
     levels: dict[str, list[model.GeographyLevel]] = {}
     for level in geography.fips:
         levels.setdefault(level.name, []).append(level)
@@ -82,7 +108,13 @@ def _parse_geography(content: bytes) -> Geography:
     has_default = bool(
         geography.default and any(x.isDefault == 'true' for x in geography.default)
     )
-    return Geography(_model=geography, levels=levels, has_default=has_default)
+    wrapped = Geography(levels=levels, has_default=has_default)
+    # Private attributes are not set by the constructor.
+    wrapped._model = geography
+    return wrapped
+
+
+_EMPTY_GEOGRAPHY = _wrap_geography(model.Geography(fips=[], default=[]))
 
 
 # ---------------------------------------------------------------------------
@@ -94,37 +126,109 @@ class Group(_ModelDelegate):
 
     _model: model.Group
 
-    def __init__(self, model: model.Group, client: httpx.AsyncClient | httpx.Client) -> None:
+    def __init__(self,
+                 model: model.Group,
+                 client: httpx.AsyncClient | httpx.Client,
+                 *,
+                 validate: bool = True,
+                 variable_pool: VariablePool | None = None) -> None:
         self._model = model
         self.client = client
+        self._validate = validate
+        self._variable_pool = variable_pool
 
     @cached_property
-    def variables(self) -> dict[str, model.Variable]:
+    def variables(self) -> Variables:
         if not self._model.variables:
             return {}
-        url = self._model.variables.replace('http:', 'https:')
+        url = canonical_url(self._model.variables)
         content = fetch(url, cast(httpx.Client, self.client)).content
-        return model.Variables.model_validate_json(content).variables
+        return _parse_variables(content, self._validate, self._variable_pool)
 
     @async_cached_property
-    async def avariables(self) -> dict[str, model.Variable]:
+    async def avariables(self) -> Variables:
         if not self._model.variables:
             return {}
-        url = self._model.variables.replace('http:', 'https:')
+        url = canonical_url(self._model.variables)
         content = await _fetch_bytes(url, self.client)
-        return model.Variables.model_validate_json(content).variables
+        return _parse_variables(content, self._validate, self._variable_pool)
 
 
 # ---------------------------------------------------------------------------
 # Dataset
 # ---------------------------------------------------------------------------
 
+DocumentLoaders = Mapping[str, Callable[[], Any]]
+
+
 class Dataset(_ModelDelegate):
     _model: model.Dataset
 
-    def __init__(self, model: model.Dataset, client: httpx.AsyncClient | httpx.Client) -> None:
-        self._model = model
+    def __init__(self,
+                 model: model.Dataset | Mapping[str, Any],
+                 client: httpx.AsyncClient | httpx.Client,
+                 documents: DocumentLoaders | None = None,
+                 *,
+                 validate: bool = True,
+                 variable_pool: VariablePool | None = None) -> None:
+        """Wrap a dataset model.
+
+        Arguments:
+        ---------
+          * model: the dataset's catalog entry, either as a model or as
+            its raw parsed JSON, in which case the model is built on
+            first access.
+          * client: httpx client used to fetch linked documents.
+          * documents: optional callables returning already-processed
+            `variables`, `groups`, `tags`, `geography` or
+            `completions` values (e.g. from a snapshot), used instead
+            of fetching or building them.
+          * validate: if False, trust the catalog entry and linked
+            documents: build models without validation, and build
+            variables lazily on access.
+          * variable_pool: if given, store variables in a compact
+            `VariableTable` interning values in this pool.
+
+        """
+        if isinstance(model, Mapping):
+            self._raw = model
+        else:
+            self._model = model
         self.client = client
+        self._documents = documents or {}
+        self._validate = validate
+        self._variable_pool = variable_pool
+
+    def _build_model(self) -> model.Dataset:
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            # Another thread may have built the model meanwhile.
+            if (built := self.__dict__.get('_model')) is not None:
+                return built
+            raise AttributeError('_model')
+        built = (model.Dataset.model_validate(raw) if self._validate
+                 else model.construct(model.Dataset, raw))
+        # Prefetch threads may build the model concurrently; keep the
+        # first one stored so they all share it, then drop the raw
+        # entry, which the model replaces.
+        built = self.__dict__.setdefault('_model', built)
+        self.__dict__.pop('_raw', None)
+        return built
+
+    def __getattr__(self, attr: str):
+        if attr == '_model':
+            return self._build_model()
+        # Until the model is built, read plain (e.g. str or int)
+        # fields of a trusted raw catalog entry directly, so that
+        # filtering on them doesn't build every dataset's model.
+        raw = self.__dict__.get('_raw')
+        if raw is not None and not self._validate:
+            fields = model.scalar_fields(model.Dataset)
+            if attr in fields:
+                alias, default, convert = fields[attr]
+                value = raw.get(alias, default)
+                return value if convert is None or value is None else convert(value)
+        return super().__getattr__(attr)
 
     def __repr__(self) -> str:
         return f'<{self._model.title}:{self._model.c_vintage}:{self._model.c_dataset}>'
@@ -134,56 +238,71 @@ class Dataset(_ModelDelegate):
     @cached_property
     def geography(self) -> Geography:
         """Retrieve and process the geography link, if any."""
+        if 'geography' in self._documents:
+            return self._documents['geography']()
         if not self._model.c_geographyLink:
             return _EMPTY_GEOGRAPHY
-        url = self._model.c_geographyLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_geographyLink)
         _logger.debug('Fetching geographies: %s', url)
         content = fetch(url, cast(httpx.Client, self.client)).content
-        return _parse_geography(content)
+        return _parse_geography(content, self._validate)
 
     @async_cached_property
     async def ageography(self) -> Geography:
         """Retrieve and process the geography link, if any."""
+        if 'geography' in self._documents:
+            return self._documents['geography']()
         if not self._model.c_geographyLink:
             return _EMPTY_GEOGRAPHY
-        url = self._model.c_geographyLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_geographyLink)
         _logger.debug('Fetching geographies: %s', url)
         content = await _fetch_bytes(url, self.client)
-        return _parse_geography(content)
+        return _parse_geography(content, self._validate)
 
     # -- tags ------------------------------------------------------------
 
     @cached_property
     def tags(self) -> list[str]:
         """Retrieve and process the tags link, if any."""
+        if 'tags' in self._documents:
+            return self._documents['tags']()
         if not self._model.c_tagsLink:
             return []
-        url = self._model.c_tagsLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_tagsLink)
         _logger.debug('Fetching tags: %s', url)
         content = fetch(url, cast(httpx.Client, self.client)).content
-        return model.Tags.model_validate_json(content).tags
+        return _parse_tags(content, self._validate)
 
     @async_cached_property
     async def atags(self) -> list[str]:
         """Retrieve and process the tags link, if any."""
+        if 'tags' in self._documents:
+            return self._documents['tags']()
         if not self._model.c_tagsLink:
             return []
-        url = self._model.c_tagsLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_tagsLink)
         _logger.debug('Fetching tags: %s', url)
         content = await _fetch_bytes(url, self.client)
-        return model.Tags.model_validate_json(content).tags
+        return _parse_tags(content, self._validate)
 
     # -- groups ------------------------------------------------------------
 
     @staticmethod
-    def _parse_groups(content: bytes, client: httpx.AsyncClient | httpx.Client) -> dict[str, Group]:
+    def _parse_groups(content: bytes,
+                      client: httpx.AsyncClient | httpx.Client,
+                      validate: bool = True,
+                      variable_pool: VariablePool | None = None) -> dict[str, Group]:
+        make_group = model.Group.model_validate if validate else (
+            lambda data: model.construct(model.Group, data))
         # The field name "universe" has a trailing space in the census data.
         return {
             group_dict['name']: Group(
-                model.Group.model_validate(
+                make_group(
                     {key.strip(): value for key, value in group_dict.items()}
                 ),
                 client,
+                validate=validate,
+                variable_pool=variable_pool,
             )
             for group_dict in json.loads(content)['groups']
         }
@@ -191,44 +310,80 @@ class Dataset(_ModelDelegate):
     @cached_property
     def groups(self) -> dict[str, Group]:
         """Retrieve and process the variable groups link, if any."""
+        if 'groups' in self._documents:
+            return self._documents['groups']()
         if not self._model.c_groupsLink:
             return {}
-        url = self._model.c_groupsLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_groupsLink)
         _logger.debug('Fetching groups: %s', url)
         content = fetch(url, cast(httpx.Client, self.client)).content
-        return self._parse_groups(content, self.client)
+        return self._parse_groups(content, self.client, self._validate,
+                                  self._variable_pool)
 
     @async_cached_property
     async def agroups(self) -> dict[str, Group]:
         """Retrieve and process the variable groups link, if any."""
+        if 'groups' in self._documents:
+            return self._documents['groups']()
         if not self._model.c_groupsLink:
             return {}
-        url = self._model.c_groupsLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_groupsLink)
         _logger.debug('Fetching groups: %s', url)
         content = await _fetch_bytes(url, self.client)
-        return self._parse_groups(content, self.client)
+        return self._parse_groups(content, self.client, self._validate,
+                                  self._variable_pool)
 
     # -- variables -----------------------------------------------------
 
     @cached_property
-    def variables(self) -> dict[str, model.Variable]:
+    def variables(self) -> Variables:
         """Retrieve and process the variables link, if any."""
+        if 'variables' in self._documents:
+            return self._documents['variables']()
         if not self._model.c_variablesLink:
             return {}
-        url = self._model.c_variablesLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_variablesLink)
         _logger.debug('Fetching variables: %s', url)
         content = fetch(url, cast(httpx.Client, self.client)).content
-        return model.Variables.model_validate_json(content).variables
+        return _parse_variables(content, self._validate, self._variable_pool)
 
     @async_cached_property
-    async def avariables(self) -> dict[str, model.Variable]:
+    async def avariables(self) -> Variables:
         """Retrieve and process the variables link, if any."""
+        if 'variables' in self._documents:
+            return self._documents['variables']()
         if not self._model.c_variablesLink:
             return {}
-        url = self._model.c_variablesLink.replace('http:', 'https:')
+        url = canonical_url(self._model.c_variablesLink)
         _logger.debug('Fetching variables: %s', url)
         content = await _fetch_bytes(url, self.client)
-        return model.Variables.model_validate_json(content).variables
+        return _parse_variables(content, self._validate, self._variable_pool)
+
+    # -- completions -----------------------------------------------------
+
+    @staticmethod
+    def _make_completions(variables: Variables) -> CompletionIndex:
+        return CompletionIndex.from_rows(
+            VariableFields(dataset_id='',
+                           variable=name,
+                           group=variable.group,
+                           label=variable.label,
+                           concept=variable.concept)
+            for name, variable in variables.items())
+
+    @cached_property
+    def completions(self) -> CompletionIndex:
+        """Prefix completions of the variables and their groups."""
+        if 'completions' in self._documents:
+            return self._documents['completions']()
+        return self._make_completions(self.variables)
+
+    @async_cached_property
+    async def acompletions(self) -> CompletionIndex:
+        """Prefix completions of the variables and their groups."""
+        if 'completions' in self._documents:
+            return self._documents['completions']()
+        return self._make_completions(await self.avariables)
 
     # -- derived, non-fetching properties -------------------------------
 
@@ -238,7 +393,7 @@ class Dataset(_ModelDelegate):
         for distribution in self._model.distribution:
             if (distribution.format == 'API' and
                     distribution.mediaType == 'application/json'):
-                return distribution.accessURL.replace('http:', 'https:')
+                return canonical_url(distribution.accessURL)
         return ''
 
     @cached_property
@@ -268,6 +423,49 @@ class Dataset(_ModelDelegate):
 
 CAT = TypeVar('CAT', bound='Catalog')
 
+PREFETCH_FIELDS = ('variables', 'groups', 'tags', 'geography')
+
+
+def _check_prefetch_fields(fields: Iterable[str]) -> list[str]:
+    fields = list(fields)
+    unknown = set(fields) - set(PREFETCH_FIELDS)
+    if unknown:
+        raise ValueError(f'Cannot prefetch fields: {sorted(unknown)}')
+    return fields
+
+
+def _prefetch_one(dataset: Dataset, field: str) -> None:
+    """Populate a Dataset's synchronous cached_property `field`.
+
+    This calls the property's function directly rather than going
+    through the descriptor, since on Python 3.11 `cached_property`
+    serializes computation across all instances.
+    """
+    if field in dataset.__dict__:
+        return
+    try:
+        value = getattr(Dataset, field).func(dataset)
+    except Exception as e:
+        _logger.warning('Error prefetching %s for %r', field, dataset, exc_info=e)
+        return
+    dataset.__dict__.setdefault(field, value)
+
+
+async def _aprefetch_one(dataset: Dataset, field: str, semaphore: asyncio.Semaphore) -> None:
+    """Await a Dataset's async property for `field` and also use the
+    result to populate the matching synchronous cached_property, so
+    that synchronous consumers like `filter_datasets` don't refetch.
+    """
+    if field in dataset.__dict__:
+        return
+    async with semaphore:
+        try:
+            value = await getattr(dataset, f'a{field}')
+        except Exception as e:
+            _logger.warning('Error prefetching %s for %r', field, dataset, exc_info=e)
+            return
+    dataset.__dict__.setdefault(field, value)
+
 
 class Catalog(_ModelDelegate):
     _model: model.Catalog
@@ -284,14 +482,21 @@ class Catalog(_ModelDelegate):
         client: httpx.Client,
         *,
         catalog_subpath: str = '',
+        validate: bool = True,
+        variable_pool: VariablePool | None = None,
     ) -> Catalog:
         """Retrieve and process the root or subpath data catalog
         document from the Census API server.
+
+        If `validate` is False, the documents are trusted: models are
+        built without validation, and each dataset's model is built on
+        first access. If `variable_pool` is given, datasets store their
+        variables in `VariableTable`s sharing it.
         """
         url = cls._catalog_url(catalog_subpath)
         _logger.debug('Fetching catalog: %s', url)
         content = fetch(url, client).content
-        return cls(model=model.Catalog.model_validate_json(content), client=client)
+        return cls._from_content(content, client, validate, variable_pool)
 
     @classmethod
     async def aget_catalog(
@@ -299,22 +504,123 @@ class Catalog(_ModelDelegate):
         client: httpx.AsyncClient,
         *,
         catalog_subpath: str = '',
+        validate: bool = True,
+        variable_pool: VariablePool | None = None,
     ) -> Catalog:
         """Retrieve and process the root or subpath data catalog
         document from the Census API server.
+
+        If `validate` is False, the documents are trusted: models are
+        built without validation, and each dataset's model is built on
+        first access. If `variable_pool` is given, datasets store their
+        variables in `VariableTable`s sharing it.
         """
         url = cls._catalog_url(catalog_subpath)
         _logger.debug('Fetching catalog: %s', url)
         content = (await afetch(url, client)).content
-        return cls(model=model.Catalog.model_validate_json(content), client=client)
+        return cls._from_content(content, client, validate, variable_pool)
+
+    @classmethod
+    def _from_content(
+        cls,
+        content: bytes,
+        client: httpx.AsyncClient | httpx.Client,
+        validate: bool,
+        variable_pool: VariablePool | None,
+    ) -> Self:
+        if validate:
+            return cls(model.Catalog.model_validate_json(content), client,
+                       variable_pool=variable_pool)
+        raw = json.loads(content)
+        datasets = raw.pop('dataset')
+        return cls(model.construct(model.Catalog, raw | {'dataset': []}), client,
+                   raw_datasets=datasets, validate=False, variable_pool=variable_pool)
+
+    def __init__(self,
+                 model: model.Catalog,
+                 client: httpx.AsyncClient | httpx.Client,
+                 documents: Sequence[DocumentLoaders | None] | None = None,
+                 *,
+                 raw_datasets: Sequence[Mapping[str, Any]] | None = None,
+                 validate: bool = True,
+                 variable_pool: VariablePool | None = None) -> None:
+        """Wrap a catalog model.
+
+        Arguments:
+        ---------
+          * model: the catalog document.
+          * client: httpx client used to fetch linked documents.
+          * documents: optional per-dataset document loaders, parallel
+            to the datasets; see `Dataset`.
+          * raw_datasets: if given, the raw parsed JSON datasets to use
+            instead of `model.dataset`.
+          * validate, variable_pool: passed to each `Dataset`.
 
-    def __init__(self, model: model.Catalog, client: httpx.AsyncClient | httpx.Client) -> None:
+        """
         self._model = model
         self.client = client
+        self._documents = documents
+        self._raw_datasets = raw_datasets
+        self._validate = validate
+        self._variable_pool = variable_pool
 
     @cached_property
     def dataset(self) -> list[Dataset]:
         """Return wrapped Dataset instances for each dataset in the
         catalog.
         """
-        return [Dataset(dataset, self.client) for dataset in self._model.dataset]
+        datasets: Sequence[model.Dataset | Mapping[str, Any]] = (
+            self._model.dataset if self._raw_datasets is None
+            else self._raw_datasets)
+        documents: Iterable[DocumentLoaders | None] = (
+            [None] * len(datasets) if self._documents is None
+            else self._documents)
+        return [Dataset(dataset, self.client, dataset_documents,
+                        validate=self._validate, variable_pool=self._variable_pool)
+                for dataset, dataset_documents in zip(datasets, documents, strict=True)]
+
+    def prefetch(self,
+                 fields: Iterable[str] = PREFETCH_FIELDS,
+                 *,
+                 concurrency: int = 10) -> None:
+        """Fetch the linked metadata documents for every dataset
+        using a pool of `concurrency` threads, so that later
+        attribute accesses (e.g. in `filter_datasets`) hit the cache.
+
+        Arguments:
+        ---------
+          * fields: any of `variables`, `groups`, `tags` and `geography`.
+          * concurrency: the maximum number of requests in flight.
+
+        Datasets whose documents can't be fetched are logged and
+        skipped.
+
+        """
+        if isinstance(self.client, httpx.AsyncClient):
+            raise TypeError('Use aprefetch with an async httpx client')
+        fields = _check_prefetch_fields(fields)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(_prefetch_one, dataset, field)
+                           for dataset in self.dataset
+                           for field in fields]:
+                future.result()
+
+    async def aprefetch(self,
+                        fields: Iterable[str] = PREFETCH_FIELDS,
+                        *,
+                        concurrency: int = 10) -> None:
+        """Async version of `prefetch`.
+
+        This warms both the async (`avariables`, etc.) and sync
+        (`variables`, etc.) cached properties.
+
+        """
+        if not isinstance(self.client, httpx.AsyncClient):
+            await asyncio.to_thread(self.prefetch, fields, concurrency=concurrency)
+            return
+        fields = _check_prefetch_fields(fields)
+        semaphore = asyncio.Semaphore(concurrency)
+        async with asyncio.TaskGroup() as tg:
+            for dataset in self.dataset:
+                for field in fields:
+                    tg.create_task(_aprefetch_one(dataset, field, semaphore))
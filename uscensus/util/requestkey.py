@@ -0,0 +1,75 @@
+"""Canonical forms of Census API requests, for use as cache keys.
+
+The same logical request can be spelled many ways: `get` fields in any
+order, `http:` or `https:` links, `in` clauses in any order, with or
+without an API key. These helpers map all such spellings to one key.
+Reordering `get` fields changes the column order of a response, so
+callers serving a cached result must rearrange its columns to match
+the request.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+# Parameters that don't affect the response.
+IGNORED_PARAMS = frozenset({'key'})
+
+
+def canonical_url(url: str) -> str:
+    """Return `url` with an `https` scheme and a lower-case host."""
+    parts = urlsplit(url)
+    scheme = 'https' if parts.scheme in ('http', 'https') else parts.scheme
+    return urlunsplit(parts._replace(scheme=scheme, netloc=parts.netloc.lower()))
+
+
+def split_fields(get: str) -> list[str]:
+    """Split a `get` parameter into its fields."""
+    return [field for field in get.split(',') if field]
+
+
+def canonical_fields(fields: Iterable[str]) -> str:
+    """Return a `get` parameter for `fields`, sorted and without
+    duplicates.
+    """
+    return ','.join(sorted(set(fields)))
+
+
+def _canonical_geo_clause(clause: str) -> str:
+    level, _, values = clause.partition(':')
+    return f'{level}:{",".join(sorted(values.split(",")))}'
+
+
+def canonical_geo_in(geo_in: str) -> str:
+    """Return an `in` parameter with its clauses ordered by level
+    name and the values of each sorted.
+    """
+    return ' '.join(sorted(_canonical_geo_clause(clause)
+                           for clause in geo_in.split()))
+
+
+def canonical_params(params: Mapping[str, str]) -> dict[str, str]:
+    """Return `params` in canonical form, sorted by name, without an
+    API key.
+
+    Row order is not part of the canonical form: values in `for` and
+    `in` clauses are sorted.
+    """
+    ret = {}
+    for name, value in sorted(params.items()):
+        if name in IGNORED_PARAMS:
+            continue
+        if name == 'get':
+            value = canonical_fields(split_fields(value))
+        elif name == 'for':
+            value = _canonical_geo_clause(value)
+        elif name == 'in':
+            value = canonical_geo_in(value)
+        ret[name] = value
+    return ret
+
+
+def request_key(url: str, params: Mapping[str, str]) -> str:
+    """Return the canonical string form of a request."""
+    query = urlencode(canonical_params(params))
+    return f'{canonical_url(url)}?{query}' if query else canonical_url(url)
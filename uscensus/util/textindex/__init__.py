@@ -1,8 +1,17 @@
-from .textindex import DatasetFields, FieldSet, TextIndex, VariableFields
+from .textindex import (
+    AsyncTextIndex,
+    DatasetFields,
+    FieldSet,
+    TextIndex,
+    VariableFields,
+)
+from .threadedindex import ThreadedAsyncTextIndex
 
 __all__ = [
+    'AsyncTextIndex',
     'DatasetFields',
     'FieldSet',
     'TextIndex',
+    'ThreadedAsyncTextIndex',
     'VariableFields',
 ]
@@ -0,0 +1,472 @@
+"""Full-text index in NumPy arrays, scored with BM25.
+
+The index keeps, for each field, sorted postings of the documents
+containing each term and the term's frequency in them, and the stored
+field values as UTF-8 blobs. Searching looks terms up by bisection
+and combines their postings with array operations, so it needs no
+query parsing by a database and builds no row objects but for the
+rows returned.
+
+The arrays are written to a single file, which is memory-mapped when
+the index is opened, so an index can be shared by processes and
+opened without reading it.
+
+Changes are kept in memory until the context manager exits, when the
+arrays are rebuilt from all the rows.
+"""
+import json
+import logging
+import os
+import re
+from collections import Counter
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from uscensus.util.errors import CensusError
+from uscensus.util.textindex import DatasetFields, FieldSet, TextIndex, VariableFields
+
+_logger = logging.getLogger(__name__)
+
+# Bump when the layout of the file changes.
+FORMAT_VERSION = 1
+
+_MAGIC = b'USCBM25\x00'
+_ALIGN = 64
+
+# Fields matched as a whole, case-sensitively, as whoosh ID fields.
+ID_FIELDS = frozenset(('dataset_id', 'vintage', 'variable', 'group'))
+
+# Separates the field from the term in the vocabulary.
+_SEP = '\x1f'
+
+_WORD = re.compile(r'\w+')
+# An optional `field:` prefix, then a quoted phrase, a parenthesized
+# group or a word.
+_CLAUSE = re.compile(r'(?:(\w+):\s*)?("[^"]*"|\([^)]*\)|[^\s()"]+)')
+
+Postings = tuple[np.ndarray, np.ndarray]
+
+
+def _tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def _sum_by_doc(docs: np.ndarray, scores: np.ndarray) -> Postings:
+    """Sort documents, summing the scores of repeated ones."""
+    unique, inverse = np.unique(docs, return_inverse=True)
+    return unique, np.bincount(inverse, weights=scores, minlength=len(unique))
+
+
+def _intersect(left: Postings, right: Postings) -> Postings:
+    docs, lpos, rpos = np.intersect1d(left[0], right[0],
+                                      assume_unique=True, return_indices=True)
+    return docs, left[1][lpos] + right[1][rpos]
+
+
+def _union(postings: Sequence[Postings]) -> Postings:
+    if len(postings) == 1:
+        return postings[0]
+    return _sum_by_doc(np.concatenate([docs for docs, _ in postings]),
+                       np.concatenate([scores for _, scores in postings]))
+
+
+def _empty() -> Postings:
+    return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+
+
+class Bm25Index(TextIndex):
+    """Full-text index in NumPy arrays, persisted to a memory-mapped
+    file.
+
+    Queries are whitespace-separated clauses, all of which must match:
+
+      * a word, matching documents with its terms in any one field;
+      * `field:word`, matching documents with its terms in that field;
+      * `word*`, matching terms starting with the word;
+      * `"a phrase"` or `(a group)`, matching as a single word with
+        several terms, without regard to their order.
+
+    ID fields (`dataset_id`, `vintage`, `variable` and `group`) only
+    match their whole value, case-sensitively; other fields match
+    lowercase words. `AND` is ignored; there are no other operators.
+
+    """
+
+    fields: tuple[str, ...]
+    filename: Path | None
+    versions: dict[str, str | None]
+    arrays: dict[str, np.ndarray]
+
+    def __init__(self,
+                 fieldset: FieldSet,
+                 name: str,
+                 path: str | None = None,
+                 *,
+                 k1: float = 1.2,
+                 b: float = 0.75) -> None:
+        """Open or create the index.
+
+        Arguments:
+        ---------
+          * fieldset: the enum FieldSet.DATASET or VARIABLE.
+          * name: the name of the index, and of its file.
+          * path: if specified, the directory of the index file,
+            which is opened if it exists and written when the context
+            manager exits. If not specified, the index is only kept
+            in memory.
+          * k1, b: the BM25 term frequency saturation and document
+            length normalization parameters.
+
+        """
+        if fieldset == FieldSet.DATASET:
+            self.fields = DatasetFields._fields
+        elif fieldset == FieldSet.VARIABLE:
+            self.fields = VariableFields._fields
+        else:
+            raise KeyError(f'"{fieldset}" is not one of DATASET or VARIABLE')
+        self.name = name
+        self.k1 = k1
+        self.b = b
+        self.filename = Path(path) / f'{name}.bm25' if path else None
+        self._rows: dict[str, list[tuple]] | None = None
+        if self.filename and self.filename.exists():
+            self._read()
+        else:
+            self._build({}, {})
+
+    # Building
+
+    def _build(self,
+               rows: Mapping[str, Sequence[tuple]],
+               versions: dict[str, str | None]) -> None:
+        """Build the arrays from the rows of each dataset."""
+        term_ids: dict[str, int] = {}
+        term_docs: list[int] = []
+        doc_ids: list[int] = []
+        freqs: list[int] = []
+        lengths: dict[str, list[int]] = {field: [] for field in self.fields}
+        stored: dict[str, list[bytes]] = {field: [] for field in self.fields}
+        doc = 0
+        for dataset_rows in rows.values():
+            for row in dataset_rows:
+                for field, value in zip(self.fields, row, strict=True):
+                    value = '' if value is None else str(value)
+                    stored[field].append(value.encode())
+                    tokens = ([value] if field in ID_FIELDS and value
+                              else _tokenize(value) if field not in ID_FIELDS
+                              else [])
+                    lengths[field].append(len(tokens))
+                    for term, freq in Counter(tokens).items():
+                        term_docs.append(term_ids.setdefault(f'{field}{_SEP}{term}',
+                                                             len(term_ids)))
+                        doc_ids.append(doc)
+                        freqs.append(freq)
+                doc += 1
+
+        # Order the postings by term, then document, and the terms
+        # for bisection.
+        keys = np.array(list(term_ids) or [''], dtype=np.str_)[:len(term_ids)]
+        key_order = np.argsort(keys, kind='stable')
+        rank = np.empty(len(keys), dtype=np.int64)
+        rank[key_order] = np.arange(len(keys))
+        terms = rank[np.array(term_docs, dtype=np.int64)]
+        order = np.argsort(terms, kind='stable')
+        arrays = {
+            'keys': keys[key_order],
+            'offsets': np.concatenate(
+                ([0], np.cumsum(np.bincount(terms, minlength=len(keys))))).astype(np.int64),
+            'docs': np.array(doc_ids, dtype=np.int32)[order],
+            'freqs': np.array(freqs, dtype=np.int32)[order],
+        }
+        for field in self.fields:
+            arrays[f'{field}.length'] = np.array(lengths[field], dtype=np.int32)
+            arrays[f'{field}.offsets'] = np.concatenate(
+                ([0], np.cumsum([len(value) for value in stored[field]],
+                                dtype=np.int64))).astype(np.int64)
+            arrays[f'{field}.data'] = np.frombuffer(b''.join(stored[field]),
+                                                    dtype=np.uint8)
+        self._load(arrays, doc, versions)
+        _logger.debug('Built index %s of %d rows and %d terms', self.name, doc, len(keys))
+
+    def _load(self,
+              arrays: dict[str, np.ndarray],
+              size: int,
+              versions: dict[str, str | None]) -> None:
+        self.arrays = arrays
+        self.size = size
+        self.versions = versions
+        self.average_lengths = {
+            field: max(float(arrays[f'{field}.length'].mean()) if size else 0.0, 1.0)
+            for field in self.fields}
+
+    # Persistence
+
+    def _require_filename(self) -> Path:
+        if self.filename is None:
+            raise ValueError(f'Index {self.name} has no path')
+        return self.filename
+
+    def _write(self) -> None:
+        """Write the arrays to the index file, replacing it."""
+        filename = self._require_filename()
+        entries: dict[str, dict[str, Any]] = {}
+        offset = 0
+        for key, array in self.arrays.items():
+            entries[key] = {'dtype': array.dtype.str,
+                            'shape': array.shape,
+                            'offset': offset}
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps({'format_version': FORMAT_VERSION,
+                             'fields': self.fields,
+                             'size': self.size,
+                             'versions': self.versions,
+                             'arrays': entries}).encode()
+        start = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a new file, so that readers mapping the old one
+        # are unaffected.
+        temporary = filename.with_suffix('.tmp')
+        with temporary.open('wb') as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for key, array in self.arrays.items():
+                f.seek(start + entries[key]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(start + offset)
+        os.replace(temporary, filename)
+        _logger.debug('Wrote index %s to %s', self.name, filename)
+
+    def _read(self) -> None:
+        """Map the arrays of the index file."""
+        filename = self._require_filename()
+        with filename.open('rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise CensusError(f'{filename} is not an index file')
+            length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(length))
+        if header['format_version'] != FORMAT_VERSION:
+            raise CensusError(f'{filename} has format version '
+                              f'{header["format_version"]}, not {FORMAT_VERSION}')
+        if tuple(header['fields']) != self.fields:
+            raise CensusError(f'{filename} indexes fields {header["fields"]}')
+        start = -(-(len(_MAGIC) + 8 + length) // _ALIGN) * _ALIGN
+        buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+        arrays = {}
+        for key, entry in header['arrays'].items():
+            dtype = np.dtype(entry['dtype'])
+            count = int(np.prod(entry['shape']))
+            begin = start + entry['offset']
+            arrays[key] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                        offset=begin).reshape(entry['shape'])
+        self._load(arrays, header['size'], header['versions'])
+        _logger.debug('Mapped index %s from %s', self.name, filename)
+
+    # Writing
+
+    def _stored(self, field: str, docs: Iterable[int]) -> list[str]:
+        offsets = self.arrays[f'{field}.offsets']
+        data = self.arrays[f'{field}.data']
+        return [data[offsets[doc]:offsets[doc + 1]].tobytes().decode()
+                for doc in docs]
+
+    def __enter__(self):
+        # Materialize the rows, by dataset, to be rebuilt on exit.
+        columns = [self._stored(field, range(self.size)) for field in self.fields]
+        self._rows = {}
+        for row in zip(*columns, strict=True):
+            self._rows.setdefault(row[0], []).append(row)
+        self._pending_versions = dict(self.versions)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        rows, self._rows = self._rows, None
+        if exc_type is None:
+            self._build(rows, self._pending_versions)
+            if self.filename:
+                self._write()
+
+    def _check_writing(self) -> dict[str, list[tuple]]:
+        if self._rows is None:
+            raise CensusError('Text indexer called outside of context manager')
+        return self._rows
+
+    def add(self,
+            iterable: Iterable[DatasetFields | VariableFields],
+            **kwargs) -> None:
+        rows = self._check_writing()
+        for doc in iterable:
+            rows.setdefault(doc.dataset_id, []).append(tuple(doc))
+
+    @property
+    def persistent(self) -> bool:
+        return self.filename is not None
+
+    def indexed_version(self, dataset_id: str) -> str | None:
+        # Include the changes pending in the context manager.
+        versions = self.versions if self._rows is None else self._pending_versions
+        return versions.get(dataset_id)
+
+    def dataset_ids(self) -> set[str]:
+        if self._rows is not None:
+            return {dataset_id for dataset_id, rows in self._rows.items() if rows}
+        return set(self._stored('dataset_id', range(self.size)))
+
+    def delete(self, dataset_id: str) -> bool:
+        rows = self._check_writing()
+        self._pending_versions.pop(dataset_id, None)
+        return bool(rows.pop(dataset_id, None))
+
+    def _replace(self,
+                 dataset_id: str,
+                 rows: Iterable[DatasetFields | VariableFields],
+                 version: str | None) -> None:
+        pending = self._check_writing()
+        pending[dataset_id] = [tuple(doc) for doc in rows]
+        self._pending_versions[dataset_id] = version
+
+    # Searching
+
+    def _postings(self, field: str, term: str, prefix: bool) -> Postings:
+        """Return the documents containing a term of a field, and
+        their BM25 scores for it.
+        """
+        keys = self.arrays['keys']
+        key = f'{field}{_SEP}{term}'
+        # No key is longer than the keys' width; and bisecting for
+        # a wider string would convert all the keys.
+        if len(key) > keys.dtype.itemsize // 4:
+            return _empty()
+        begin = keys.searchsorted(np.array(key, dtype=keys.dtype), side='left')
+        if prefix:
+            # Bisect for the next string after the prefixed ones.
+            successor = key[:-1] + chr(min(ord(key[-1]) + 1, 0x10ffff))
+            end = keys.searchsorted(np.array(successor, dtype=keys.dtype), side='left')
+        else:
+            end = begin + int(begin < len(keys) and keys[begin] == key)
+        if begin == end:
+            return _empty()
+        offsets = self.arrays['offsets']
+        lengths = self.arrays[f'{field}.length']
+        average = self.average_lengths[field]
+        ret = []
+        for pos in range(begin, end):
+            docs = self.arrays['docs'][offsets[pos]:offsets[pos + 1]]
+            freqs = self.arrays['freqs'][offsets[pos]:offsets[pos + 1]]
+            idf = np.log1p((self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / average)
+            ret.append((docs, idf * freqs * (self.k1 + 1) / (freqs + norm)))
+        return _union(ret)
+
+    def _field_clause(self, field: str, word: str) -> Postings | None:
+        """Return the documents matching a word in a field, or None if
+        the word has no terms.
+        """
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        terms = [word] if field in ID_FIELDS else _tokenize(word)
+        if not terms:
+            return None
+        ret = None
+        for term in terms:
+            postings = self._postings(field, term, prefix)
+            ret = postings if ret is None else _intersect(ret, postings)
+        return ret
+
+    def _clause(self, field: str | None, word: str) -> Postings | None:
+        if word[:1] in '"(':
+            word = word[1:-1]
+        if field is not None:
+            return self._field_clause(field, word)
+        matches = [match for match in (self._field_clause(field, word)
+                                       for field in self.fields)
+                   if match is not None]
+        return _union(matches) if matches else None
+
+    def _match(self,
+               querystring: str,
+               constraints: Mapping[str, str]) -> Postings:
+        """Return the documents matching the query and constraints,
+        and their scores.
+        """
+        if unknown := [field for field in constraints if field not in self.fields]:
+            raise ValueError(f'Unknown fields: {unknown}')
+        clauses = []
+        for field, word in _CLAUSE.findall(querystring):
+            if field not in self.fields:
+                # Not a field name, e.g. in "1:2".
+                word = f'{field}:{word}' if field else word
+                field = None
+            if word != 'AND' and (clause := self._clause(field, word)) is not None:
+                clauses.append(clause)
+        for field, value in constraints.items():
+            if (clause := self._field_clause(field, value)) is not None:
+                # Constraints filter without scoring.
+                clauses.append((clause[0], np.zeros(len(clause[0]))))
+        if not clauses:
+            return np.arange(self.size, dtype=np.int32), np.zeros(self.size)
+        ret = clauses[0]
+        for clause in clauses[1:]:
+            ret = _intersect(ret, clause)
+        return ret
+
+    def _rows_for(self,
+                  docs: np.ndarray,
+                  scores: np.ndarray,
+                  columns: Sequence[str] | None) -> Iterator[dict[str, Any]]:
+        if columns is None:
+            columns = self.fields
+        elif unknown := [column for column in columns if column not in self.fields]:
+            raise ValueError(f'Unknown columns: {unknown}')
+        values = [self._stored(column, docs) for column in columns]
+        for score, *row in zip(scores.tolist(), *values, strict=True):
+            yield {'score': score, **dict(zip(columns, row, strict=True))}
+
+    def query(self, querystring: str, **constraints: str) -> list[dict[str, Any]]:
+        """Return the rows matching the query string and per-field
+        constraints, best first, as dicts with a `score`.
+        """
+        return list(self._search(querystring, constraints))
+
+    def search(self,
+               querystring: str,
+               *,
+               columns: Sequence[str] | None = None,
+               limit: int | None = None,
+               offset: int = 0,
+               **constraints: str) -> Iterator[dict[str, Any]]:
+        """Generate the rows matching a query, best first, as dicts
+        with a `score`.
+
+        Arguments:
+        ---------
+          * querystring: the query, as described for the class.
+          * columns: the fields to return besides `score`; by default
+            all of them.
+          * limit: the maximum number of rows to return.
+          * offset: the number of best rows to skip, for pagination.
+          * constraints: words that the named fields must match, as
+            `field:word`, without affecting the scores.
+
+        """
+        yield from self._search(querystring, constraints,
+                                columns=columns, limit=limit, offset=offset)
+
+    def _search(self,
+                querystring: str,
+                constraints: Mapping[str, str],
+                *,
+                columns: Sequence[str] | None = None,
+                limit: int | None = None,
+                offset: int = 0) -> Iterator[dict[str, Any]]:
+        # Constraints are a mapping here, so that query can pass
+        # fields named like the keyword arguments of search.
+        docs, scores = self._match(querystring, constraints)
+        # Best first, then in order of addition.
+        order = np.lexsort((docs, -scores))
+        stop = None if limit is None else offset + limit
+        order = order[offset:stop]
+        return self._rows_for(docs[order], scores[order], columns)
@@ -0,0 +1,218 @@
+"""Prefix completion of variable IDs, group names, labels and concepts.
+
+A full-text query per keystroke is more than autocompletion needs. A
+`CompletionIndex` keeps a sorted list of normalized keys, each
+pointing to a variable or group, and answers a prefix by bisection:
+
+  * variable and group names, e.g. `b19013_` completes `B19013_001E`;
+  * each word-suffix of variable labels, e.g. `household inc` completes
+    `Estimate!!Median household income ...`;
+  * each word-suffix of group concepts.
+
+Keys are normalized to lower-case words separated by single spaces, so
+that label separators (`!!`, `:`) and case don't matter.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any, NamedTuple
+from urllib.parse import quote
+
+from uscensus.util.textindex import VariableFields
+
+_logger = logging.getLogger(__name__)
+
+VARIABLE = 'variable'
+GROUP = 'group'
+
+_WORD = re.compile(r'\w+')
+
+# Group names of variables that belong to none.
+_NO_GROUP = ('', 'N/A')
+
+
+def normalize(text: str) -> str:
+    """Return the lower-case words of `text`, separated by single
+    spaces.
+    """
+    return ' '.join(_WORD.findall(text.lower()))
+
+
+def _suffixes(text: str) -> list[str]:
+    words = normalize(text).split(' ')
+    return [' '.join(words[pos:]) for pos in range(len(words)) if words[pos]]
+
+
+class Completion(NamedTuple):
+    """A completion: a variable or group, with its label or concept."""
+
+    kind: str
+    name: str
+    label: str
+
+
+class CompletionIndex:
+    """Complete prefixes to variables and groups.
+
+    Usage:
+
+        index = CompletionIndex.from_rows(rows)
+        index.complete('B19013_', limit=10)
+
+    """
+
+    kinds: list[str]
+    names: list[str]
+    labels: list[str]
+    keys: list[str]
+    targets: list[int]
+
+    def __init__(self,
+                 kinds: list[str],
+                 names: list[str],
+                 labels: list[str],
+                 keys: list[str],
+                 targets: list[int]) -> None:
+        """Wrap completion data, as from `to_dict`.
+
+        Arguments:
+        ---------
+          * kinds, names, labels: the completions, as parallel lists.
+          * keys: the sorted, normalized keys.
+          * targets: the position of each key's completion.
+
+        """
+        self.kinds = kinds
+        self.names = names
+        self.labels = labels
+        self.keys = keys
+        self.targets = targets
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[VariableFields]) -> 'CompletionIndex':
+        """Build the index from the variable rows of a dataset, as
+        added to its variable `TextIndex`.
+        """
+        kinds: list[str] = []
+        names: list[str] = []
+        labels: list[str] = []
+        entries: list[tuple[str, int]] = []
+        groups: dict[str, int] = {}
+
+        def add(kind: str, name: str, label: str) -> int:
+            pos = len(names)
+            kinds.append(kind)
+            names.append(name)
+            labels.append(label)
+            entries.append((normalize(name), pos))
+            entries.extend((key, pos) for key in _suffixes(label))
+            return pos
+
+        for row in rows:
+            add(VARIABLE, row.variable, row.label or '')
+            if row.group not in _NO_GROUP and row.group not in groups:
+                groups[row.group] = add(GROUP, row.group, row.concept or '')
+        # By key, then in order of addition.
+        entries.sort()
+        _logger.debug('Indexed %d completions under %d keys', len(names), len(entries))
+        return cls(kinds, names, labels,
+                   [key for key, _ in entries],
+                   [pos for _, pos in entries])
+
+    def __len__(self) -> int:
+        """The number of completions."""
+        return len(self.names)
+
+    def complete(self,
+                 prefix: str,
+                 *,
+                 limit: int | None = 10,
+                 kinds: Iterable[str] | None = None) -> list[Completion]:
+        """Return the completions with a key starting with `prefix`.
+
+        Arguments:
+        ---------
+          * prefix: the text typed so far; normalized like the keys.
+          * limit: the maximum number of completions to return, or
+            None for all.
+          * kinds: if given, only return completions of these kinds,
+            `variable` or `group`.
+
+        Completions are ordered by their first matching key.
+
+        """
+        prefix = normalize(prefix)
+        kinds = None if kinds is None else frozenset(kinds)
+        seen: set[int] = set()
+        ret: list[Completion] = []
+        keys = self.keys
+        for idx in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if limit is not None and len(ret) >= limit:
+                break
+            if not keys[idx].startswith(prefix):
+                break
+            pos = self.targets[idx]
+            if pos in seen or (kinds is not None and self.kinds[pos] not in kinds):
+                continue
+            seen.add(pos)
+            ret.append(Completion(self.kinds[pos], self.names[pos], self.labels[pos]))
+        return ret
+
+    def to_dict(self) -> dict[str, list[Any]]:
+        """Return the index as a dict of lists, e.g. to serialize."""
+        return {'kinds': self.kinds,
+                'names': self.names,
+                'labels': self.labels,
+                'keys': self.keys,
+                'targets': self.targets}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, list[Any]]) -> 'CompletionIndex':
+        """Rebuild the index from `to_dict`'s result."""
+        return cls(**data)
+
+
+class CompletionStore:
+    """Keep the completion indexes of datasets in a directory, e.g.
+    next to a persistent variable index, so that they are only built
+    again when a dataset changes.
+
+    Each dataset's index is a JSON file, recorded with the version
+    (e.g. the dataset's `modified` date) it was built from.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Arguments:
+        ---------
+          * path: the directory of the index files; created if it
+            doesn't exist.
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _filename(self, dataset_id: str) -> Path:
+        return self.path / f'{quote(dataset_id, safe="")}.json'
+
+    def get(self, dataset_id: str, version: str | None) -> CompletionIndex | None:
+        """Return the stored index of a dataset, or None if there is
+        none for `version`. Unversioned indexes are never reused.
+        """
+        filename = self._filename(dataset_id)
+        if version is None or not filename.exists():
+            return None
+        data = json.loads(filename.read_text())
+        if data['version'] != version:
+            return None
+        return CompletionIndex.from_dict(data['completions'])
+
+    def put(self, dataset_id: str, version: str | None, index: CompletionIndex) -> None:
+        """Store the index of a dataset at `version`."""
+        filename = self._filename(dataset_id)
+        temporary = filename.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'version': version,
+                                         'completions': index.to_dict()}))
+        os.replace(temporary, filename)
@@ -0,0 +1,259 @@
+"""Index each distinct variable once, however many datasets share it.
+
+The same variable (e.g. `B01001_001E`, with the same label, concept
+and group) appears in every vintage and product of a survey. A
+`DedupVariableIndex` stores one document per distinct variable in the
+wrapped `TextIndex`, identified in its `dataset_id` field by a hash of
+its contents, and keeps the list of datasets containing each document
+itself. Searches rank the distinct documents, then expand each to the
+rows of its datasets, or keep it if it belongs to the dataset asked
+for.
+"""
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+from uscensus.util.textindex import DatasetFields, TextIndex, VariableFields
+
+_logger = logging.getLogger(__name__)
+
+# The number of distinct variables to rank at first when searching a
+# dataset's rows without a limit; each further batch doubles it.
+_BATCH = 256
+
+
+def document_key(row: VariableFields) -> str:
+    """Return the key identifying the contents of a variable row,
+    regardless of its dataset.
+    """
+    content = f'{row.variable}\x1f{row.group}\x1f{row.label}\x1f{row.concept}'
+    return hashlib.blake2b(content.encode(), digest_size=12).hexdigest()
+
+
+class DedupVariableIndex(TextIndex):
+    """Variable index storing each distinct variable once.
+
+    Usage:
+
+        index = DedupVariableIndex(SqliteFts5Index(FieldSet.VARIABLE, 'variables'))
+        with index:
+            index.upsert('acs/acs5', rows)
+        index.search('income', dataset_id='acs/acs5')
+
+    """
+
+    index: TextIndex
+    filename: Path | None
+    contents: dict[str, list[str]]
+    versions: dict[str, str | None]
+    postings: dict[str, dict[str, None]]
+
+    def __init__(self, index: TextIndex, path: str | None = None) -> None:
+        """Wrap a variable index.
+
+        Arguments:
+        ---------
+          * index: the index of the distinct variables, for
+            FieldSet.VARIABLE.
+          * path: if specified, the file in which to keep which
+            datasets contain which variables, read if it exists and
+            written when the context manager exits. A persistent
+            `index` needs one, and vice versa.
+
+        """
+        if index.persistent and not path:
+            raise ValueError('Deduplicating a persistent index requires a path')
+        self.index = index
+        self.filename = Path(path) if path else None
+        self._read()
+
+    def _read(self) -> None:
+        if self.filename and self.filename.exists():
+            data = json.loads(self.filename.read_text())
+        else:
+            data = {'contents': {}, 'versions': {}}
+        # The document keys of each dataset, and its version.
+        self.contents = data['contents']
+        self.versions = data['versions']
+        # The datasets of each document key, as ordered sets.
+        self.postings = {}
+        for dataset_id, keys in self.contents.items():
+            for key in keys:
+                self.postings.setdefault(key, {})[dataset_id] = None
+
+    def _write(self, filename: Path) -> None:
+        temporary = filename.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'contents': self.contents,
+                                         'versions': self.versions}))
+        os.replace(temporary, filename)
+
+    def __enter__(self):
+        self.index.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ret = self.index.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            if self.filename:
+                self._write(self.filename)
+        else:
+            # Forget the changes the index has abandoned.
+            self._read()
+        return ret
+
+    @staticmethod
+    def _by_dataset(
+            iterable: Iterable[DatasetFields | VariableFields],
+    ) -> dict[str, dict[str, VariableFields]]:
+        ret: dict[str, dict[str, VariableFields]] = {}
+        for row in iterable:
+            if not isinstance(row, VariableFields):
+                raise TypeError(f'Only variable rows can be deduplicated, not {row!r}')
+            ret.setdefault(row.dataset_id, {}).setdefault(document_key(row), row)
+        return ret
+
+    def _link(self,
+              dataset_id: str,
+              rows: dict[str, VariableFields],
+              new_documents: list[VariableFields]) -> None:
+        """Add a dataset to the postings of its documents, collecting
+        the documents not yet indexed.
+        """
+        known = set(self.contents.get(dataset_id, ()))
+        for key, row in rows.items():
+            if key in known:
+                continue
+            datasets = self.postings.setdefault(key, {})
+            if not datasets:
+                new_documents.append(row._replace(dataset_id=key))
+            datasets[dataset_id] = None
+        self.contents[dataset_id] = [*self.contents.get(dataset_id, ()),
+                                     *(key for key in rows if key not in known)]
+
+    def add(self,
+            iterable: Iterable[DatasetFields | VariableFields],
+            **kwargs) -> None:
+        new_documents: list[VariableFields] = []
+        for dataset_id, rows in self._by_dataset(iterable).items():
+            self._link(dataset_id, rows, new_documents)
+        self.index.add(new_documents)
+
+    @property
+    def persistent(self) -> bool:
+        return self.filename is not None
+
+    def indexed_version(self, dataset_id: str) -> str | None:
+        return self.versions.get(dataset_id)
+
+    def dataset_ids(self) -> set[str]:
+        return set(self.contents)
+
+    def _unlink(self, dataset_id: str, keep: Mapping[str, VariableFields]) -> None:
+        """Remove a dataset from the postings of its documents but
+        those in `keep`, removing documents no longer in any dataset
+        from the wrapped index.
+        """
+        kept = []
+        dropped = []
+        for key in self.contents.pop(dataset_id, ()):
+            if key in keep:
+                kept.append(key)
+                continue
+            datasets = self.postings[key]
+            del datasets[dataset_id]
+            if not datasets:
+                del self.postings[key]
+                dropped.append(key)
+        if kept:
+            self.contents[dataset_id] = kept
+        for key in dropped:
+            self.index.delete(key)
+        _logger.debug('Unlinked %s: %d dropped documents', dataset_id, len(dropped))
+
+    def delete(self, dataset_id: str) -> bool:
+        found = dataset_id in self.contents
+        self._unlink(dataset_id, {})
+        self.versions.pop(dataset_id, None)
+        return found
+
+    def _replace(self,
+                 dataset_id: str,
+                 rows: Iterable[DatasetFields | VariableFields],
+                 version: str | None) -> None:
+        documents = self._by_dataset(rows).get(dataset_id, {})
+        self._unlink(dataset_id, documents)
+        new_documents: list[VariableFields] = []
+        self._link(dataset_id, documents, new_documents)
+        self.versions[dataset_id] = version
+        self.index.add(new_documents)
+        _logger.debug('Upserted %s: %d new documents', dataset_id, len(new_documents))
+
+    def query(self, querystring: str, **constraints: str) -> list[dict[str, Any]]:
+        """Return the rows matching the query string and per-field
+        constraints, best first.
+        """
+        if reserved := {'columns', 'limit', 'offset'} & constraints.keys():
+            raise ValueError(f'Cannot constrain fields {sorted(reserved)}')
+        field_constraints: dict[str, Any] = constraints
+        return list(self.search(querystring, **field_constraints))
+
+    def search(self,
+               querystring: str,
+               *,
+               limit: int | None = None,
+               offset: int = 0,
+               **constraints: str) -> Iterator[dict[str, Any]]:
+        """Generate the rows matching a query, best first, as dicts.
+
+        The distinct variables are ranked by the wrapped index, then
+        each is expanded to a row for each of its datasets, or for
+        the `dataset_id` constraint only if it contains it. Other
+        constraints are passed to the wrapped index.
+        """
+        dataset_id = constraints.pop('dataset_id', None)
+        stop = None if limit is None else offset + limit
+        if stop is not None and stop <= offset:
+            return
+        count = 0
+        for row in self._documents(querystring, constraints, stop,
+                                   all_rows=dataset_id is None):
+            datasets = self.postings.get(row['dataset_id'], {})
+            if dataset_id is not None:
+                datasets = {dataset_id: None} if dataset_id in datasets else {}
+            for match in datasets:
+                if count >= offset:
+                    yield {**row, 'dataset_id': match}
+                count += 1
+                if count == stop:
+                    return
+
+    def _documents(self,
+                   querystring: str,
+                   constraints: Mapping[str, Any],
+                   stop: int | None,
+                   *,
+                   all_rows: bool) -> Iterator[dict[str, Any]]:
+        """Generate the distinct variables matching a query, best
+        first, ranking only as many as needed for `stop` rows.
+
+        Each variable expands to at least one row if `all_rows`, so
+        `stop` variables are enough; otherwise they are ranked in
+        batches of increasing size, until enough rows are found.
+        """
+        batch = stop if stop is not None or all_rows else _BATCH
+        if batch is None:
+            yield from self.index.search(querystring, **constraints)
+            return
+        fetched = 0
+        while True:
+            rows = list(self.index.search(querystring, limit=batch, offset=fetched,
+                                          **constraints))
+            yield from rows
+            if all_rows or len(rows) < batch:
+                return
+            fetched += batch
+            batch *= 2
@@ -1,16 +1,41 @@
 import logging
-from collections.abc import Iterable
-from typing import Any
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import Any, Literal
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, TEXT, MongoClient
 
 from uscensus.util.textindex import DatasetFields, FieldSet, TextIndex, VariableFields
 
 _logger = logging.getLogger('pymongo')
 
+IndexMode = Literal['create', 'open']
+
+TEXT_INDEX = 'fields_text_index'
+# The wildcard text index of earlier versions; a collection can only
+# have one text index.
+_LEGACY_TEXT_INDEX = 'text_index'
+
+# The fields searched by text queries; the others are only matched
+# by constraints.
+DatasetTextFields = ('title', 'description', 'geographies', 'concepts',
+                     'keywords', 'tags', 'variables')
+VariableTextFields = ('variable', 'group', 'label', 'concept')
+
 
 class MongoIndex(TextIndex):
-    """Census API metadata indexer based on MongoDb."""
+    """Census API metadata indexer based on MongoDb.
+
+    Besides the collection of documents, the index keeps a
+    `<name>_datasets` collection recording the version of each
+    upserted dataset, so that a persistent index can be updated one
+    dataset at a time.
+
+    """
+
+    text_fields: tuple[str, ...]
+    mode: IndexMode
+    batch_size: int
 
     def __init__(self,
                  fieldset: FieldSet,
@@ -18,52 +43,118 @@ class MongoIndex(TextIndex):
                  client: MongoClient = MongoClient(
                      'mongodb://localhost:27017'),
                  db: str = 'varindex',
-                 dflt_query_field: str = 'dataset_id') -> None:
+                 dflt_query_field: str = 'dataset_id',
+                 *,
+                 mode: IndexMode = 'create',
+                 batch_size: int = 1000) -> None:
         """Initialize index specified fields.
 
         Arguments:
         ---------
+        * fieldset: the enum FieldSet.DATASET or VARIABLE, to select
+        the fields to index for text search.
         * name: name of the Collection for the metadata.
         * client: Client connected to MongoDB
         * db: name of the MongoDB DB to use.
         * dflt_query_field: the default field to query.
+        * mode: `create` to build the index from scratch, dropping
+        any existing collection; or `open` to keep an existing one,
+        and its indexes, so that it stays searchable while datasets
+        are upserted.
+        * batch_size: the number of documents to send in each
+        unordered insert.
 
         """
-        client[db].drop_collection(name)
+        if fieldset == FieldSet.DATASET:
+            self.text_fields = DatasetTextFields
+        elif fieldset == FieldSet.VARIABLE:
+            self.text_fields = VariableTextFields
+        else:
+            raise KeyError(f'"{fieldset}" is not one of DATASET or VARIABLE')
+        self.mode = mode
+        self.batch_size = batch_size
+        if mode == 'create':
+            client[db].drop_collection(name)
+            client[db].drop_collection(f'{name}_datasets')
         self.coll = client[db][name]
+        self.datasets = client[db][f'{name}_datasets']
+        self.coll.create_index([('dataset_id', ASCENDING)], name='dataset_id')
+        if mode == 'open':
+            self._create_text_index()
+
+    def _create_text_index(self) -> None:
+        """Create the text index, unless it already exists."""
+        indexes = self.coll.index_information()
+        if TEXT_INDEX in indexes:
+            return
+        if _LEGACY_TEXT_INDEX in indexes:
+            self.coll.drop_index(_LEGACY_TEXT_INDEX)
+        _logger.info(f'Creating text index on {self.coll.name}')
+        self.coll.create_index(
+            [(field, TEXT) for field in self.text_fields],
+            name=TEXT_INDEX,
+            default_language='en')
 
     def __enter__(self):
-        """Context manager that drops the index pre-insertion."""
-        self.coll.drop_index('text_index')
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        """Context manager that indexes the collection
-        post-insertion.
+        """Context manager that indexes the collection after the first
+        insertions, which is faster than indexing as they are made.
         """
-        self.coll.create_index(
-            [('$**', 'text')],
-            name='text_index',
-            default_language='en')
+        if exc_type is None:
+            self._create_text_index()
+
+    def _insert(self, documents: Iterable[DatasetFields | VariableFields]) -> None:
+        # Unordered inserts let the server apply each batch in
+        # parallel, and continue past a failed document.
+        it: Iterator[DatasetFields | VariableFields] = iter(documents)
+        while batch := [doc._asdict() for doc in islice(it, self.batch_size)]:
+            self.coll.insert_many(batch, ordered=False)
 
-    def add(self,  # type: ignore[override]
-            documents: Iterable[DatasetFields] | Iterable[VariableFields],
+    def add(self,
+            iterable: Iterable[DatasetFields | VariableFields],
             **kwargs):
         """Add entries to the index.
 
         Arguments:
         ---------
-          * iteratble: iterator over tuples of field metadata, viz.
+          * iterable: iterator over tuples of field metadata, viz.
             dataset_id, title, description, variables, geographies, concepts,
             keywords, tags, and vintage.
 
         """
-        if documents:
-            self.coll.insert_many([doc._asdict() for doc in documents])
+        self._insert(iterable)
 
-    def query(self, querystring: str, **colqueries):
-        """Find dataset IDs matching querystring."""
-        ret = []
+    @property
+    def persistent(self) -> bool:
+        return self.mode == 'open'
+
+    def indexed_version(self, dataset_id: str) -> str | None:
+        doc = self.datasets.find_one({'_id': dataset_id})
+        return doc['version'] if doc else None
+
+    def dataset_ids(self) -> set[str]:
+        return set(self.coll.distinct('dataset_id'))
+
+    def delete(self, dataset_id: str) -> bool:
+        self.datasets.delete_one({'_id': dataset_id})
+        return self.coll.delete_many({'dataset_id': dataset_id}).deleted_count > 0
+
+    def _replace(self,
+                 dataset_id: str,
+                 rows: Iterable[DatasetFields | VariableFields],
+                 version: str | None) -> None:
+        # Check all the documents before deleting the old ones; the
+        # other datasets stay searchable meanwhile.
+        documents = list(rows)
+        self.delete(dataset_id)
+        self._insert(documents)
+        self.datasets.replace_one({'_id': dataset_id},
+                                  {'_id': dataset_id, 'version': version},
+                                  upsert=True)
+
+    def _find(self, querystring: str, colqueries: dict[str, Any]):
         query = {}
         proj: dict[str, Any] = {'_id': False}
         if querystring:
@@ -75,6 +166,28 @@ class MongoIndex(TextIndex):
         find_op = self.coll.find(query, proj)
         if 'score' in proj:
             find_op = find_op.sort([('score', {'$meta': 'textScore'})])
-        for doc in find_op:
+        return find_op
+
+    def query(self, querystring: str, **colqueries):
+        """Find dataset IDs matching querystring."""
+        ret = []
+        for doc in self._find(querystring, colqueries):
             ret.append(doc)
         return ret
+
+    def search(self,
+               querystring: str,
+               *,
+               limit: int | None = None,
+               offset: int = 0,
+               **colqueries) -> Iterator[dict[str, Any]]:
+        """Stream the documents matching querystring, skipping and
+        limiting on the server.
+        """
+        find_op = self._find(querystring, colqueries).skip(offset)
+        if limit is not None:
+            # A limit of 0 means no limit to MongoDB.
+            if limit == 0:
+                return
+            find_op = find_op.limit(limit)
+        yield from find_op
@@ -1,80 +1,378 @@
 import logging
+import os
 import sqlite3
-from collections.abc import Iterable, Mapping
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any, Literal
 
+import pandas as pd
+
+from uscensus.util.errors import CensusError
 from uscensus.util.textindex import DatasetFields, FieldSet, TextIndex, VariableFields
 
 _logger = logging.getLogger(__name__)
 
+# Bump when the layout of the tables changes, so that indexes written
+# by older versions are rebuilt rather than misread.
+SCHEMA_VERSION = 1
+
+IndexMode = Literal['create', 'open', 'readonly']
+
+# Bulk-load settings: 64 KiB pages (for new databases) and a 256 MiB
+# page cache.
+_BULK_PAGE_SIZE = 65536
+_BULK_CACHE_KIB = 262144
+# FTS5's default automerge level.
+_AUTOMERGE = 16
+
+
+def connect(dbname: str | os.PathLike) -> sqlite3.Connection:
+    """Open a connection to an index database that can be written
+    from a writer thread (see ThreadedAsyncTextIndex) and queried from
+    another; sqlite3 serializes use of the connection.
+    """
+    return sqlite3.connect(dbname, check_same_thread=False)
+
+
+def _fts5_string(text: str) -> str:
+    """Quote text as an FTS5 string, i.e. a phrase."""
+    return '"{}"'.format(text.replace('"', '""'))
+
 
 class SqliteFts5Index(TextIndex):
-    """Full-text index backing to a sqlite DB with FTS5."""
+    """Full-text index backing to a sqlite DB with FTS5.
+
+    Besides the FTS5 table, the index keeps a `<table>_datasets` table
+    recording the rowids and version of each dataset's rows, so that
+    a persistent index can be updated one dataset at a time, and a
+    `<table>_meta` table recording its schema version.
+
+    """
 
     fields: tuple[str, ...]
     quoted_fields: tuple[str, ...]
     table: str
     conn: sqlite3.Connection
-
+    mode: IndexMode
+    bulk: bool
 
     def __init__(self,
                  fieldset: DatasetFields | VariableFields,
                  table: str,
-                 dbname: str = ':memory:') -> None:
+                 dbname: str | sqlite3.Connection = ':memory:',
+                 *,
+                 mode: IndexMode = 'create',
+                 bulk: bool = False) -> None:
+        """Open or create the index.
+
+        Arguments:
+        ---------
+          * fieldset: the enum FieldSet.DATASET or VARIABLE.
+          * table: the name of the FTS5 table.
+          * dbname: the sqlite database file, or a connection to it,
+            which is used as is. Indexes in the same file that are
+            written together (e.g. the dataset and variable indexes of
+            discovery) must share a connection, as sqlite allows only
+            one writer at a time; and a connection written from another
+            thread than the one that opened it must be opened with
+            `connect` (or `check_same_thread=False`).
+          * mode: `create` to build the index from scratch, dropping
+            any existing one; `open` to reuse an existing index with
+            the current schema version, creating (or rebuilding) it
+            otherwise; or `readonly` to query an existing index, which
+            several processes can share.
+          * bulk: tune the database for loading many rows, e.g. when
+            first populating it: use WAL journaling, large pages and
+            a large cache, don't sync to disk or trace statements while
+            adding rows, and defer merging index segments until the
+            final optimize.
+            An operating system crash while adding rows can then
+            corrupt the index, which must be rebuilt.
+
+        """
         if fieldset == FieldSet.DATASET:
             self.fields = DatasetFields._fields
         elif fieldset == FieldSet.VARIABLE:
             self.fields = VariableFields._fields
         else:
             raise KeyError(f'"{fieldset}" is not one of DATASET or VARIABLE')
-        self.quoted_fields = [f'"{field}"' for field in self.fields]
+        self.quoted_fields = tuple(f'"{field}"' for field in self.fields)
         self.table = table
-        self.conn = sqlite3.connect(dbname)
+        self.mode = mode
+        self.bulk = bulk and mode != 'readonly'
+        if isinstance(dbname, sqlite3.Connection):
+            self.conn = dbname
+        elif mode == 'readonly':
+            if dbname == ':memory:':
+                raise ValueError('Cannot open an in-memory index read-only')
+            self.conn = sqlite3.connect(
+                f'{Path(dbname).absolute().as_uri()}?mode=ro', uri=True,
+                check_same_thread=False)
+        else:
+            self.conn = connect(dbname)
         self.conn.row_factory = sqlite3.Row
         self.conn.set_trace_callback(_logger.debug)
+        if self.bulk:
+            # The page size only applies to new databases.
+            self._execute(f'PRAGMA page_size = {_BULK_PAGE_SIZE};')
+            self._execute(f'PRAGMA cache_size = -{_BULK_CACHE_KIB};')
+            self._execute('PRAGMA journal_mode = WAL;')
+        self._synchronous: int | None = None
 
-        self._execute(
-            f'DROP TABLE IF EXISTS {self.table};')
-        self._execute(
-            f'CREATE VIRTUAL TABLE {self.table} USING ' +
-            f'fts5({", ".join(self.quoted_fields)});')
+        if mode == 'readonly':
+            if not self._schema_current():
+                raise CensusError(f'No current index "{table}" in {dbname}')
+        elif mode == 'create' or not self._schema_current():
+            self._create()
+        else:
+            _logger.debug('Reusing index %s in %s', table, dbname)
+
+    def _schema_current(self) -> bool:
+        """Whether the index exists with the current schema."""
+        exists = self._execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;",
+            (f'{self.table}_meta',)).fetchone()
+        if not exists:
+            return False
+        meta = dict(self._execute(
+            f'SELECT key, value FROM {self.table}_meta;').fetchall())
+        return meta == {'schema_version': str(SCHEMA_VERSION),
+                        'fields': ','.join(self.fields)}
+
+    def _create(self) -> None:
+        with self.conn:
+            for suffix in ('', '_datasets', '_meta'):
+                self._execute(
+                    f'DROP TABLE IF EXISTS {self.table}{suffix};')
+            self._execute(
+                f'CREATE VIRTUAL TABLE {self.table} USING ' +
+                f'fts5({", ".join(self.quoted_fields)});')
+            self._set_automerge(_AUTOMERGE)
+            self._execute(
+                f"""CREATE TABLE {self.table}_datasets(
+                dataset_id TEXT NOT NULL,
+                first_rowid INTEGER NOT NULL,
+                last_rowid INTEGER NOT NULL,
+                version TEXT);""")
+            self._execute(
+                f'CREATE INDEX {self.table}_datasets_id ' +
+                f'ON {self.table}_datasets(dataset_id);')
+            self._execute(
+                f"""CREATE TABLE {self.table}_meta(
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL);""")
+            self._execute_many(
+                f'INSERT INTO {self.table}_meta VALUES (?, ?);',
+                [('schema_version', str(SCHEMA_VERSION)),
+                 ('fields', ','.join(self.fields))])
+
+    def _set_automerge(self, level: int) -> None:
         self._execute(
             f'INSERT INTO {self.table}({self.table}, rank) ' +
-            "VALUES('automerge', 16);")
+            "VALUES('automerge', ?);", (level,))
 
     def __enter__(self):
+        # Another index sharing the connection may have entered first,
+        # and already turned off syncing for its transaction.
+        if self.bulk and not self.conn.in_transaction:
+            self._synchronous = self._execute('PRAGMA synchronous;').fetchone()[0]
+            self._execute('PRAGMA synchronous = OFF;')
+            # Don't trace every inserted row.
+            self.conn.set_trace_callback(None)
         self.conn.__enter__()
+        if self.bulk:
+            # Merge segments once, in the final optimize, rather than
+            # repeatedly while loading.
+            self._set_automerge(0)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if exc_type is None:
-            self.conn.cursor().execute(
-                f"INSERT INTO {self.table}({self.table}) VALUES('optimize');")
-        self.conn.__exit__(exc_type, exc_value, traceback)
+        try:
+            if exc_type is None and self.mode != 'readonly':
+                if self.bulk:
+                    self._set_automerge(_AUTOMERGE)
+                self.conn.cursor().execute(
+                    f"INSERT INTO {self.table}({self.table}) VALUES('optimize');")
+            self.conn.__exit__(exc_type, exc_value, traceback)
+        finally:
+            if self._synchronous is not None:
+                self.conn.set_trace_callback(_logger.debug)
+                self._execute(f'PRAGMA synchronous = {int(self._synchronous)};')
+                self._synchronous = None
+
+    def _check_writable(self) -> None:
+        if self.mode == 'readonly':
+            raise CensusError(f'Index "{self.table}" is read-only')
 
     def add(self,
-            iterable: Iterable[DatasetFields] | Iterable[VariableFields],
+            iterable: Iterable[DatasetFields | VariableFields],
             **kwargs) -> None:
+        self._check_writable()
+        self._insert(iterable, None)
+
+    def _insert(self,
+                iterable: Iterable[DatasetFields | VariableFields],
+                version: str | None) -> None:
+        # Give the rows explicit, consecutive rowids, and record the
+        # range of each run of rows of the same dataset, so that they
+        # can be deleted by rowid later.
+        row = self._execute(
+            f'SELECT rowid FROM {self.table} ORDER BY rowid DESC LIMIT 1;').fetchone()
+        rowid = row[0] + 1 if row else 1
+        ranges: list[list] = []
+
+        def rows() -> Iterator[tuple]:
+            nonlocal rowid
+            for doc in iterable:
+                if ranges and ranges[-1][0] == doc.dataset_id:
+                    ranges[-1][2] = rowid
+                else:
+                    ranges.append([doc.dataset_id, rowid, rowid])
+                yield (rowid, *doc)
+                rowid += 1
+
         self._execute_many(
-            f"""INSERT INTO {self.table}({", ".join(self.quoted_fields)})
-            VALUES (:{", :".join(self.fields)});""",
-            [doc._asdict() for doc in iterable])
+            f"""INSERT INTO {self.table}(rowid, {", ".join(self.quoted_fields)})
+            VALUES (?{", ?" * len(self.fields)});""",
+            rows())
+        self._execute_many(
+            f'INSERT INTO {self.table}_datasets VALUES (?, ?, ?, ?);',
+            [(*dataset_range, version) for dataset_range in ranges])
 
-    def query(self,
-              querystring: str,
-              **constraints: Mapping[str, str]):
+    @property
+    def persistent(self) -> bool:
+        return self.mode != 'create'
+
+    def indexed_version(self, dataset_id: str) -> str | None:
+        row = self._execute(
+            f'SELECT version FROM {self.table}_datasets WHERE dataset_id = ? LIMIT 1;',
+            (dataset_id,)).fetchone()
+        return row[0] if row else None
+
+    def dataset_ids(self) -> set[str]:
+        return {row[0] for row in self._execute(
+            f'SELECT DISTINCT dataset_id FROM {self.table}_datasets;')}
+
+    def delete(self, dataset_id: str) -> bool:
+        self._check_writable()
+        ranges = self._execute(
+            f'SELECT first_rowid, last_rowid FROM {self.table}_datasets ' +
+            'WHERE dataset_id = ?;',
+            (dataset_id,)).fetchall()
+        for first, last in ranges:
+            self._execute(
+                f'DELETE FROM {self.table} WHERE rowid BETWEEN ? AND ?;',
+                (first, last))
+        self._execute(
+            f'DELETE FROM {self.table}_datasets WHERE dataset_id = ?;',
+            (dataset_id,))
+        return bool(ranges)
+
+    def _replace(self,
+                 dataset_id: str,
+                 rows: Iterable[DatasetFields | VariableFields],
+                 version: str | None) -> None:
+        self._check_writable()
+        # Keep the old rows if the new ones fail.
+        self._execute('SAVEPOINT upsert;')
+        try:
+            self.delete(dataset_id)
+            self._insert(rows, version)
+        except BaseException:
+            self._execute('ROLLBACK TO upsert;')
+            raise
+        finally:
+            self._execute('RELEASE upsert;')
+
+    def _match_expression(self,
+                          querystring: str,
+                          constraints: Mapping[str, str]) -> str:
+        """Build an FTS5 MATCH expression for the query string and
+        per-column constraints; phrases are quoted as FTS5 strings.
+        """
+        terms = []
         if querystring:
             if not (querystring.startswith('"') or ':' in querystring):
-                querystring = f'"{querystring}"'
-            if constraints:
-                querystring += ' AND '
-        querystring += ' AND '.join(
-            (f'{field}: "{subquery}"'
-             for field, subquery in constraints.items()))
+                querystring = _fts5_string(querystring)
+            terms.append(querystring)
+        terms.extend(f'{field}: {_fts5_string(subquery)}'
+                     for field, subquery in constraints.items())
+        return ' AND '.join(terms)
+
+    def _select(self, columns: Sequence[str] | None) -> str:
+        if columns is None:
+            return ', '.join(self.quoted_fields)
+        if unknown := [column for column in columns if column not in self.fields]:
+            raise ValueError(f'Unknown columns: {unknown}')
+        return ', '.join(f'"{column}"' for column in columns)
+
+    def _search_cursor(self,
+                       querystring: str,
+                       columns: Sequence[str] | None,
+                       limit: int | None,
+                       offset: int,
+                       constraints: Mapping[str, str]) -> sqlite3.Cursor:
+        # The statement only depends on the columns, so sqlite3's
+        # statement cache reuses its plan across searches.
         return self._execute(
-            f"""SELECT rank as score, {", ".join(self.quoted_fields)}
+            f"""SELECT rank AS score, {self._select(columns)}
             FROM {self.table}
-            WHERE {self.table} MATCH '{querystring}'
-            ORDER BY rank;""")
+            WHERE {self.table} MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?;""",
+            (self._match_expression(querystring, constraints),
+             -1 if limit is None else limit,
+             offset))
+
+    def query(self,
+              querystring: str,
+              **constraints: str):
+        """Return a cursor over the rows matching the query string and
+        per-column constraints, best first.
+        """
+        return self._search_cursor(querystring, None, None, 0, constraints)
+
+    def search(self,
+               querystring: str,
+               *,
+               columns: Sequence[str] | None = None,
+               limit: int | None = None,
+               offset: int = 0,
+               **constraints: str) -> Iterator[dict[str, Any]]:
+        """Generate the rows matching a query, best first, as dicts.
+
+        Arguments:
+        ---------
+          * querystring: an FTS5 query, or a phrase to search for.
+          * columns: the fields to return besides `score`; by default
+            all of them.
+          * limit: the maximum number of rows to return, so that
+            SQLite can stop after the top matches.
+          * offset: the number of best rows to skip, for pagination.
+          * constraints: phrases that the named fields must contain.
+
+        """
+        cursor = self._search_cursor(querystring, columns, limit, offset, constraints)
+        names = [description[0] for description in cursor.description]
+        for row in cursor:
+            yield dict(zip(names, row, strict=True))
+
+    def search_frame(self,
+                     querystring: str,
+                     *,
+                     columns: Sequence[str] | None = None,
+                     limit: int | None = None,
+                     offset: int = 0,
+                     **constraints: str) -> pd.DataFrame:
+        """Return the rows matching a query, best first, as a
+        DataFrame with a `score` column; arguments are as for `search`.
+        """
+        cursor = self._search_cursor(querystring, columns, limit, offset, constraints)
+        # Plain tuples are cheaper than sqlite3.Row here.
+        cursor.row_factory = None
+        return pd.DataFrame.from_records(
+            cursor.fetchall(),
+            columns=[description[0] for description in cursor.description])
 
     def _execute(self, sql, *args, **kwargs):
         _logger.debug(f'Executing: {sql}')
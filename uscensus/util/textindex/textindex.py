@@ -1,7 +1,12 @@
+import logging
 from abc import ABC, abstractmethod
 from collections import namedtuple
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from enum import Enum
+from itertools import islice
+from typing import Any
+
+_logger = logging.getLogger(__name__)
 
 
 class FieldSet(Enum):
@@ -46,7 +51,7 @@ class TextIndex(ABC):
 
     @abstractmethod
     def add(self,
-            iterable: Iterable[DatasetFields] | Iterable[VariableFields],
+            iterable: Iterable[DatasetFields | VariableFields],
             **kwargs):
         """Add many rows to the index."""
 
@@ -54,20 +59,154 @@ class TextIndex(ABC):
     def query(self, querystring: str, **query):
         """Search for matching rows."""
 
+    def search(self,
+               querystring: str,
+               *,
+               limit: int | None = None,
+               offset: int = 0,
+               **constraints) -> Iterator[dict[str, Any]]:
+        """Generate the rows matching a query, best first, as dicts
+        with a `score`.
+
+        Arguments:
+        ---------
+          * querystring: the query, in the backend's syntax.
+          * limit: the maximum number of rows to generate.
+          * offset: the number of best rows to skip, for pagination.
+          * constraints: as for `query`.
+
+        Backends override this to fetch only the rows wanted; this
+        default pages through `query`.
+        """
+        stop = None if limit is None else offset + limit
+        for row in islice(self.query(querystring, **constraints), offset, stop):
+            yield dict(row)
+
+    @property
+    def persistent(self) -> bool:
+        """Whether the index is kept across runs, to be updated with
+        `upsert`. This default is for indexes built from scratch.
+        """
+        return False
+
+    def indexed_version(self, dataset_id: str) -> str | None:
+        """Return the version a dataset was indexed at, or None if it
+        isn't indexed or was indexed without a version.
+
+        This default is for indexes that don't record versions.
+        """
+        return None
+
+    def dataset_ids(self) -> set[str]:
+        """Return the IDs of the indexed datasets.
+
+        Persistent indexes implement this and `delete`, so that
+        datasets no longer published can be removed.
+        """
+        raise NotImplementedError
+
+    def delete(self, dataset_id: str) -> bool:
+        """Remove the rows of a dataset, and return whether there were
+        any.
+        """
+        raise NotImplementedError
+
+    def upsert(self,
+               dataset_id: str,
+               iterable: Iterable[DatasetFields | VariableFields],
+               version: str | None = None) -> bool:
+        """Replace the rows of one dataset, unless it is already
+        indexed at `version` (e.g. the dataset's `modified` date), and
+        return whether the index changed.
+
+        The rows must all be of the dataset.
+        """
+        if version is not None and self.indexed_version(dataset_id) == version:
+            _logger.debug('Dataset %s already indexed at %s', dataset_id, version)
+            return False
+        self._replace(dataset_id, _checked(dataset_id, iterable), version)
+        return True
+
+    def _replace(self,
+                 dataset_id: str,
+                 rows: Iterable[DatasetFields | VariableFields],
+                 version: str | None) -> None:
+        """Replace the rows of one dataset, recording its version.
+
+        Persistent indexes override this; this default, for indexes
+        built from scratch, just adds the rows.
+        """
+        self.add(rows)
+
+
+def _checked(dataset_id: str,
+             iterable: Iterable[DatasetFields | VariableFields],
+             ) -> Iterator[DatasetFields | VariableFields]:
+    """Generate the rows upserted as a dataset, checking that they
+    are of that dataset.
+    """
+    for row in iterable:
+        if row.dataset_id != dataset_id:
+            raise ValueError(
+                f'Row for dataset "{row.dataset_id}" upserted as "{dataset_id}"')
+        yield row
+
 
 class AsyncTextIndex(ABC):
+    """Async counterpart of `TextIndex`, whose methods don't block the
+    event loop.
+
+    Usage:
+
+        async with my_index:
+            await my_index.add(rows)
+    """
+
     @abstractmethod
-    async def __enter__(self):
-        pass
+    async def __aenter__(self):
+        """Prepare the AsyncTextIndex for adding rows."""
 
     @abstractmethod
-    async def __exit__(self, exc_type, exc_value, traceback):
-        pass
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Commit or abandon the added rows."""
 
     @abstractmethod
-    async def add(self, iterator: Iterable, **kwargs):
-        pass
+    async def add(self,
+                  iterable: Iterable[DatasetFields | VariableFields],
+                  **kwargs):
+        """Add many rows to the index."""
 
     @abstractmethod
     async def query(self, querystring: str, **query):
-        pass
+        """Search for matching rows."""
+
+    async def search(self,
+                     querystring: str,
+                     *,
+                     limit: int | None = None,
+                     offset: int = 0,
+                     **constraints) -> list[dict[str, Any]]:
+        """Return the rows matching a query, best first, as for
+        `TextIndex.search`.
+        """
+        stop = None if limit is None else offset + limit
+        return [dict(row) for row in
+                islice(await self.query(querystring, **constraints), offset, stop)]
+
+    async def upsert(self,
+                     dataset_id: str,
+                     iterable: Iterable[DatasetFields | VariableFields],
+                     version: str | None = None) -> bool:
+        """Replace the rows of one dataset, as for `TextIndex.upsert`."""
+        await self.add(iterable)
+        return True
+
+    async def dataset_ids(self) -> set[str]:
+        """Return the IDs of the indexed datasets, as for
+        `TextIndex.dataset_ids`.
+        """
+        raise NotImplementedError
+
+    async def delete(self, dataset_id: str) -> bool:
+        """Remove the rows of a dataset, as for `TextIndex.delete`."""
+        raise NotImplementedError
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, TypeVar
+
+from uscensus.util.textindex.textindex import (
+    AsyncTextIndex,
+    DatasetFields,
+    TextIndex,
+    VariableFields,
+)
+
+_logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class ThreadedAsyncTextIndex(AsyncTextIndex):
+    """Run a synchronous `TextIndex` on a dedicated writer thread, so
+    that adding rows doesn't block the event loop.
+
+    Calls are queued to a single-threaded executor and run in order;
+    awaiting one yields to other tasks (e.g. HTTP fetches) while it
+    runs. Several wrappers can share an executor, so that indexes
+    sharing a database connection are written from one thread.
+
+    This works for any backend: SQLite FTS5 (which releases the GIL
+    while indexing), Whoosh and MongoDB.
+
+    """
+
+    def __init__(self,
+                 index: TextIndex,
+                 executor: ThreadPoolExecutor | None = None) -> None:
+        """Wrap a TextIndex.
+
+        Arguments:
+        ---------
+          * index: the index to run on the writer thread.
+          * executor: the writer thread; it must have a single worker,
+            so that calls run in order. By default a new one, shut down
+            by `close`.
+
+        """
+        self.index = index
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='textindex')
+
+    async def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def __aenter__(self):
+        await self._run(self.index.__enter__)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._run(self.index.__exit__, exc_type, exc_value, traceback)
+
+    async def add(self,
+                  iterable: Iterable[DatasetFields | VariableFields],
+                  **kwargs) -> None:
+        """Add many rows to the index on the writer thread.
+
+        The rows are consumed there, so a generator passed in must not
+        depend on state the caller changes meanwhile.
+        """
+        await self._run(self.index.add, iterable, **kwargs)
+
+    async def upsert(self,
+                     dataset_id: str,
+                     iterable: Iterable[DatasetFields | VariableFields],
+                     version: str | None = None) -> bool:
+        return await self._run(self.index.upsert, dataset_id, iterable, version)
+
+    async def dataset_ids(self) -> set[str]:
+        return await self._run(self.index.dataset_ids)
+
+    async def delete(self, dataset_id: str) -> bool:
+        return await self._run(self.index.delete, dataset_id)
+
+    async def query(self, querystring: str, **query) -> list:
+        return await self._run(lambda: list(self.index.query(querystring, **query)))
+
+    async def search(self,
+                     querystring: str,
+                     *,
+                     limit: int | None = None,
+                     offset: int = 0,
+                     **constraints) -> list[dict[str, Any]]:
+        return await self._run(lambda: list(self.index.search(
+            querystring, limit=limit, offset=offset, **constraints)))
+
+    def close(self) -> None:
+        """Shut down the writer thread, if this wrapper created it."""
+        if self._own_executor:
+            self._executor.shutdown()
@@ -1,16 +1,22 @@
+import json
+import logging
 from collections import OrderedDict
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
+from typing import Any
 
 from whoosh.analysis import KeywordAnalyzer, StandardAnalyzer
 from whoosh.analysis.filters import StopFilter
 from whoosh.fields import ID, KEYWORD, TEXT, FieldType, Schema
 from whoosh.filedb.filestore import FileStorage, RamStorage
 from whoosh.qparser import QueryParser
+from whoosh.query import And, Every, Query, Term
 from whoosh.writing import AsyncWriter
 
 from uscensus.util.errors import CensusError
 from uscensus.util.textindex import DatasetFields, FieldSet, TextIndex, VariableFields
 
+_logger = logging.getLogger(__name__)
+
 KWAnalyzer = KeywordAnalyzer(lowercase=True) | StopFilter()
 Analyzer = StandardAnalyzer()
 
@@ -46,7 +52,11 @@ class WhooshIndex(TextIndex):
                  fieldset: FieldSet,
                  index_name: str,
                  dflt_query_field: str,
-                 path: str | None = None) -> None:
+                 path: str | None = None,
+                 *,
+                 procs: int = 1,
+                 limitmb: int = 1000,
+                 multisegment: bool = False) -> None:
         """Initialize Whoosh index specified fields.
 
         Arguments:
@@ -54,7 +64,15 @@ class WhooshIndex(TextIndex):
         * fieldset: the enum FieldSet.DATASET or VARIABLE, to select a
         schema.
         * path: if specified, the path in which to create a
-        persistent index. If not specified, index to RAM.
+        persistent index, or to open it if it exists. If not
+        specified, index to RAM.
+        * procs: the number of processes indexing documents added in
+        the context manager; more than one requires `path`.
+        * limitmb: the memory, in MB, each process uses to buffer
+        documents before writing them out.
+        * multisegment: with several `procs`, keep the segment each
+        process writes rather than merging them on commit, which
+        commits faster but searches slower until the next merge.
 
         """
         if fieldset == FieldSet.DATASET:
@@ -63,28 +81,54 @@ class WhooshIndex(TextIndex):
             self.schema_fields = VariableSchemaFields
         else:
             raise KeyError(f'"{fieldset}" is not one of DATASET or VARIABLE')
+        if procs > 1 and not path:
+            # Worker processes write their segments to storage.
+            raise ValueError('Indexing with several processes requires a path')
+        self.procs = procs
+        self.limitmb = limitmb
+        self.multisegment = multisegment
         # Initialize index
-        fs = FileStorage(path).create() if path else RamStorage()
-        if fs.index_exists():
-            self.index = fs.open_index(index_name)
-            schema = self.index.schema()
+        self.storage = FileStorage(path).create() if path else RamStorage()
+        self.versions_file = f'{index_name}_versions.json'
+        if self.storage.index_exists(index_name):
+            self.index = self.storage.open_index(index_name)
+            schema = self.index.schema
         else:
             schema = Schema(**self.schema_fields)
-            self.index = fs.create_index(schema, index_name)
+            self.index = self.storage.create_index(schema, index_name)
+        self.schema = schema
         self.qparser = QueryParser(dflt_query_field,
                                    schema=schema)
+        self.versions = self._read_versions()
         self.writer = None
 
+    def _read_versions(self) -> dict[str, str]:
+        if not self.storage.file_exists(self.versions_file):
+            return {}
+        with self.storage.open_file(self.versions_file) as f:
+            return json.loads(f.read())
+
+    def _write_versions(self) -> None:
+        with self.storage.create_file(self.versions_file) as f:
+            f.write(json.dumps(self.versions).encode())
+
     def __enter__(self):
-        self.writer = AsyncWriter(
-            self.index, writerargs={'limitmb': 1000})
+        if self.procs > 1:
+            self.writer = self.index.writer(procs=self.procs,
+                                            limitmb=self.limitmb,
+                                            multisegment=self.multisegment)
+        else:
+            self.writer = AsyncWriter(
+                self.index, writerargs={'limitmb': self.limitmb})
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         if exc_type:
             self.writer.cancel()
+            self.versions = self._read_versions()
         else:
             self.writer.commit()
+            self._write_versions()
         self.writer = None
 
     def add(self, iterable: Iterable[DatasetFields | VariableFields],
@@ -99,10 +143,55 @@ class WhooshIndex(TextIndex):
             vintage.
 
         """
+        writer = self._check_writer()
+        for vals in iterable:
+            writer.add_document(**vals._asdict())
+
+    @property
+    def persistent(self) -> bool:
+        return isinstance(self.storage, FileStorage)
+
+    def indexed_version(self, dataset_id: str) -> str | None:
+        return self.versions.get(dataset_id)
+
+    def dataset_ids(self) -> set[str]:
+        with self.index.searcher() as searcher:
+            return {fields['dataset_id'] for fields in searcher.all_stored_fields()}
+
+    def _check_writer(self):
         if not self.writer:
             raise CensusError('Text indexer called outside of context manager')
-        for vals in iterable:
-            self.writer.add_document(**vals._asdict())
+        return self.writer
+
+    def delete(self, dataset_id: str) -> bool:
+        writer = self._check_writer()
+        with self.index.searcher() as searcher:
+            found = searcher.document_number(dataset_id=dataset_id) is not None
+        writer.delete_by_term('dataset_id', dataset_id)
+        self.versions.pop(dataset_id, None)
+        return found
+
+    def _replace(self,
+                 dataset_id: str,
+                 rows: Iterable[DatasetFields | VariableFields],
+                 version: str | None) -> None:
+        # Rows of the dataset added earlier in the same context aren't
+        # replaced when indexing with several processes.
+        writer = self._check_writer()
+        # Datasets have one document, updated in place by their unique
+        # ID; variables have many, so replace them all.
+        unique = self.schema['dataset_id'].unique
+        if not unique:
+            writer.delete_by_term('dataset_id', dataset_id)
+        for vals in rows:
+            if unique:
+                writer.update_document(**vals._asdict())
+            else:
+                writer.add_document(**vals._asdict())
+        if version is None:
+            self.versions.pop(dataset_id, None)
+        else:
+            self.versions[dataset_id] = version
 
     def query(self, querystring: str, **query_ignored):
         """Find dataset IDs matching querystring."""
@@ -115,3 +204,38 @@ class WhooshIndex(TextIndex):
                 val['score'] = hit.score
                 ret.append(val)
             return ret
+
+    def _constraint(self, field: str, value: str) -> Query:
+        # ID fields are matched exactly, others on all their words.
+        if isinstance(self.schema[field], ID):
+            return Term(field, value)
+        return QueryParser(field, schema=self.schema).parse(value)
+
+    def search(self,
+               querystring: str,
+               *,
+               limit: int | None = None,
+               offset: int = 0,
+               **constraints: str) -> Iterator[dict[str, Any]]:
+        """Generate the stored fields of the best matching documents,
+        with their `score`, stopping after `limit`.
+
+        Unlike `query`, the `constraints` restrict the named fields:
+        ID fields to the exact value, others to documents containing
+        all the words of the value.
+        """
+        if limit == 0:
+            return
+        query = self.qparser.parse(querystring) if querystring else Every()
+        restrict = (And([self._constraint(field, value)
+                         for field, value in constraints.items()])
+                    if constraints else None)
+        with self.index.searcher() as searcher:
+            # Whoosh only scores and sorts the top `offset + limit`.
+            results = searcher.search(query,
+                                      filter=restrict,
+                                      limit=None if limit is None else offset + limit)
+            for hit in results[offset:]:
+                val = dict(hit.items())
+                val['score'] = hit.score
+                yield val
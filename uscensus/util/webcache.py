@@ -1,7 +1,7 @@
 import asyncio
 import logging
 import time
-from collections.abc import Sequence
+from collections.abc import Mapping, Sequence
 from typing import Any, TypedDict, cast
 
 import httpx
@@ -10,6 +10,7 @@ from httpx_caching._heuristics import BaseHeuristic, ExpiresAfterHeuristic
 
 from uscensus.util.datastores.datastore import AsyncDataStore, SyncDataStore
 from uscensus.util.errors import CensusError
+from uscensus.util.requestkey import canonical_url
 
 _logger = logging.getLogger(__name__)
 
@@ -68,6 +69,15 @@ def make_client(*,
         **caching_client_args)
 
 
+def _canonical_request(url: str, kwargs: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """Normalize the URL scheme and parameter order, so that the HTTP
+    cache sees a single spelling of each request.
+    """
+    if isinstance(params := kwargs.get('params'), Mapping):
+        kwargs = kwargs | {'params': dict(sorted(params.items()))}
+    return canonical_url(url), kwargs
+
+
 async def afetch(
         url: str,
         session: httpx.AsyncClient,
@@ -99,6 +109,7 @@ async def afetch(
     if not isinstance(session._transport, AsyncCachingTransport):  # noqa: SLF001
         raise CensusError('Caching not enabled in httpx client')
 
+    url, kwargs = _canonical_request(url, kwargs)
     req = httpx.Request('GET', url, **kwargs)
     r = None
     # Requests fail transiently sometimes. We retry with backoff to
@@ -145,6 +156,7 @@ def fetch(
     if not isinstance(session._transport, SyncCachingTransport):  # noqa: SLF001
         raise CensusError('Caching not enabled in httpx client')
 
+    url, kwargs = _canonical_request(url, kwargs)
     req = httpx.Request('GET', url, **kwargs)
     r = None
     # Requests fail transiently sometimes. We retry with backoff to